@@ -0,0 +1,190 @@
+"""
+Gerador de ambientes (grids) para o simulador.
+
+Cria a pasta datasets/env/<W>x<H>_<N>v com os três arquivos que o Env lê:
+- env_config.txt: BASE, tamanho do grid e da janela, DELAY, STATS_*, HEADLESS
+- env_obst.txt: x,y,valor para cada célula diferente de terreno normal (1):
+  paredes (100) e terrenos graduados (0.75 descida ... 3.0 subida íngreme)
+- env_victims.txt: x,y de cada vítima, na ordem das linhas do data.csv
+
+Paredes e terrenos vêm de ruído suavizado, formando manchas contínuas. Todas
+as células livres que não são alcançáveis a partir da BASE (movimentos nas 8
+direções, como o PhysAgent) viram parede, de modo que toda vítima pode ser
+alcançada. O número de vítimas é o número de linhas do data.csv escolhido.
+
+Exemplo:
+    python data_creation/gerar_dados_vitimas.py 100000 --seed 1
+    python data_creation/gerar_ambiente.py 2000 2000 --vict datasets/vict/100000v --seed 1
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy import ndimage
+
+DATASETS_FOLDER = Path(__file__).resolve().parent.parent / "datasets"
+
+OBST_WALL = 100.0  # mesmos valores de VS.OBST_WALL e VS.OBST_NONE
+OBST_NONE = 1.0
+# multiplicadores dos terrenos graduados, do mais leve ao mais pesado
+TERRENOS = [0.75, 1.25, 1.5, 2.0, 3.0]
+
+# a partir deste tamanho as células ficam pequenas demais para a janela
+MAX_LADO_JANELA = 400
+
+
+def campo_suave(rng, largura, altura, escala):
+    """ Ruído uniforme suavizado: valores próximos em células vizinhas """
+    ruido = rng.random((largura, altura), dtype=np.float32)
+    return ndimage.uniform_filter(ruido, size=escala, mode="wrap")
+
+
+def gerar_obstaculos(rng, largura, altura, base, paredes=0.15, terreno=0.2, escala=7):
+    """
+    Gera o array float32 (largura, altura) de obstáculos indexado por [x, y].
+    paredes: fração aproximada de células com parede
+    terreno: fração aproximada de células com terreno graduado
+    escala: tamanho (em células) das manchas de parede e de terreno
+    """
+    obst = np.full((largura, altura), OBST_NONE, dtype=np.float32)
+
+    # paredes: as células com os maiores valores de um campo suavizado
+    if paredes > 0:
+        campo = campo_suave(rng, largura, altura, escala)
+        obst[campo > np.quantile(campo, 1.0 - paredes)] = OBST_WALL
+
+    # terrenos: as células mais altas de outro campo, em faixas; o centro de
+    # cada mancha fica com o multiplicador mais pesado
+    if terreno > 0:
+        campo = campo_suave(rng, largura, altura, escala)
+        livre = obst != OBST_WALL
+        limites = np.quantile(campo, np.linspace(1.0 - terreno, 1.0, len(TERRENOS) + 1)[:-1])
+        nivel = np.searchsorted(limites, campo, side="right") - 1
+        com_terreno = livre & (nivel >= 0)
+        obst[com_terreno] = np.asarray(TERRENOS, dtype=np.float32)[nivel[com_terreno]]
+
+    # a base e suas vizinhas são sempre livres
+    bx, by = base
+    obst[max(bx - 1, 0):bx + 2, max(by - 1, 0):by + 2] = OBST_NONE
+
+    # células livres inalcançáveis a partir da base viram parede
+    rotulos, _ = ndimage.label(obst != OBST_WALL, structure=np.ones((3, 3)))
+    obst[rotulos != rotulos[bx, by]] = OBST_WALL
+    return obst
+
+
+def posicionar_vitimas(rng, obst, base, n_vitimas):
+    """ Sorteia n_vitimas células livres distintas, fora da base
+    Retorna um array (n_vitimas, 2) com x, y """
+    livres = np.flatnonzero(obst.ravel() != OBST_WALL)
+    livres = livres[livres != np.ravel_multi_index(base, obst.shape)]
+    if n_vitimas > len(livres):
+        raise ValueError(f"{n_vitimas} vítimas não cabem em {len(livres)} células livres")
+    escolhidas = rng.choice(livres, size=n_vitimas, replace=False)
+    return np.column_stack(np.unravel_index(escolhidas, obst.shape))
+
+
+def contar_vitimas(vict_folder):
+    """ Número de vítimas (linhas sem o cabeçalho) do data.csv da pasta """
+    with open(Path(vict_folder) / "data.csv", "rb") as f:
+        linhas = sum(bloco.count(b"\n") for bloco in iter(lambda: f.read(1 << 20), b""))
+        # a última linha pode não terminar em \n
+        f.seek(-1, 2)
+        if f.tell() > 0 and f.read(1) != b"\n":
+            linhas += 1
+    return max(linhas - 1, 0)
+
+
+def gravar_ambiente(pasta, obst, base, vitimas, headless, lote=1 << 20):
+    """ Grava env_config.txt, env_obst.txt e env_victims.txt (fim de linha
+    CRLF, como os ambientes existentes) """
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    largura, altura = obst.shape
+
+    config = [f"BASE {base[0]},{base[1]}",
+              f"GRID_WIDTH {largura}",
+              f"GRID_HEIGHT {altura}",
+              "WINDOW_WIDTH 800",
+              "WINDOW_HEIGHT 700",
+              "DELAY 0.0",
+              "STATS_PER_AG 1",
+              "STATS_ALL_AG 1",
+              f"HEADLESS {1 if headless else 0}"]
+    with open(pasta / "env_config.txt", "w", newline="") as f:
+        f.write("\r\n".join(config) + "\r\n")
+
+    # só as células diferentes de OBST_NONE, em lotes de colunas x
+    colunas = max(1, lote // altura)
+    with open(pasta / "env_obst.txt", "w", newline="") as f:
+        for x0 in range(0, largura, colunas):
+            bloco = obst[x0:x0 + colunas]
+            xs, ys = np.nonzero(bloco != OBST_NONE)
+            linhas = np.column_stack((xs + x0, ys, bloco[xs, ys]))
+            np.savetxt(f, linhas, fmt=["%d", "%d", "%.2f"], delimiter=",", newline="\r\n")
+
+    with open(pasta / "env_victims.txt", "w", newline="") as f:
+        np.savetxt(f, vitimas, fmt="%d", delimiter=",", newline="\r\n")
+
+
+def parse_base(texto):
+    """ 'x,y' -> (x, y) """
+    x, y = (int(v) for v in texto.split(","))
+    return x, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um ambiente (env_config, env_obst e env_victims)")
+    parser.add_argument("largura", type=int, help="GRID_WIDTH")
+    parser.add_argument("altura", type=int, help="GRID_HEIGHT")
+    parser.add_argument("--vict", required=True,
+                        help="pasta com o data.csv dos sinais vitais; define o número de vítimas")
+    parser.add_argument("--vitimas", type=int,
+                        help="usa só as primeiras N vítimas do data.csv")
+    parser.add_argument("--base", type=parse_base, help="x,y da base (padrão: centro do grid)")
+    parser.add_argument("--paredes", type=float, default=0.15,
+                        help="fração aproximada de células com parede")
+    parser.add_argument("--terreno", type=float, default=0.2,
+                        help="fração aproximada de células com terreno graduado")
+    parser.add_argument("--escala", type=int, default=7,
+                        help="tamanho das manchas de parede e de terreno, em células")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--headless", type=int, choices=[0, 1],
+                        help=f"valor de HEADLESS (padrão: 1 se um lado passa de {MAX_LADO_JANELA})")
+    parser.add_argument("--saida", help="pasta de saída (padrão: datasets/env/<W>x<H>_<N>v)")
+    args = parser.parse_args()
+
+    if not (0 <= args.paredes < 1 and 0 <= args.terreno <= 1):
+        parser.error("--paredes deve estar em [0, 1[ e --terreno em [0, 1]")
+
+    n_vitimas = contar_vitimas(args.vict)
+    if args.vitimas is not None:
+        if args.vitimas > n_vitimas:
+            parser.error(f"o data.csv de {args.vict} tem só {n_vitimas} vítimas")
+        n_vitimas = args.vitimas
+
+    base = args.base or (args.largura // 2, args.altura // 2)
+    if not (0 <= base[0] < args.largura and 0 <= base[1] < args.altura):
+        parser.error(f"a base {base} está fora do grid")
+    headless = args.headless
+    if headless is None:
+        headless = max(args.largura, args.altura) > MAX_LADO_JANELA
+    pasta = args.saida or DATASETS_FOLDER / "env" / f"{args.largura}x{args.altura}_{n_vitimas}v"
+
+    inicio = time.perf_counter()
+    rng = np.random.default_rng(args.seed)
+    obst = gerar_obstaculos(rng, args.largura, args.altura, base,
+                            args.paredes, args.terreno, args.escala)
+    vitimas = posicionar_vitimas(rng, obst, base, n_vitimas)
+    gravar_ambiente(pasta, obst, base, vitimas, headless)
+
+    n_paredes = int(np.count_nonzero(obst == OBST_WALL))
+    print(f"Ambiente salvo em {pasta} ({time.perf_counter() - inicio:.1f}s)")
+    print(f"  {args.largura}x{args.altura}, base {base}, {n_vitimas} vítimas, "
+          f"{n_paredes} paredes ({n_paredes / obst.size:.1%})")
+
+
+if __name__ == "__main__":
+    main()
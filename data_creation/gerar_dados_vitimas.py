@@ -1,151 +1,237 @@
-import numpy as np
-import pandas as pd
-import random
-import matplotlib.pyplot as plt
-from collections import Counter
+"""
+Gerador de datasets sintéticos de vítimas (data.csv).
+
+Todas as vítimas de um lote são geradas de uma vez com numpy.random.Generator,
+agrupadas pela classe de triagem real, e o arquivo é gravado em lotes, de modo
+que milhões de vítimas cabem em poucos segundos e em memória limitada.
+
+Exemplo:
+    python data_creation/gerar_dados_vitimas.py 100000 --tipo aereo --seed 1 \\
+        --hist sobr.png
+grava datasets/vict/100000v/data.csv.
+"""
 
-# === Configurações fixas ===
+import argparse
+import time
 from pathlib import Path
-BASE_FOLDER = Path("../datasets/vict/10v")
-OUTPUT_CSV = BASE_FOLDER / "data.csv"
 
+import numpy as np
 
-def gerar_dataset_vitimas(n_vitimas=100, media_idade=35, desvio_idade=5,
-                          tipo_acidente="aereo", nivel_ruido=0.02, seed=None):
+# pasta raiz dos datasets de vítimas, independente do diretório corrente
+VICT_FOLDER = Path(__file__).resolve().parent.parent / "datasets" / "vict"
+
+COLUNAS = ["idade", "fc", "fr", "pas", "spo2", "temp", "pr", "sg", "fx",
+           "queim", "gcs", "avpu", "tri", "sobr"]
+# formato de cada coluna no CSV (todas inteiras, menos temp e sobr)
+FORMATOS = ["%d"] * 5 + ["%.6f"] + ["%d"] * 7 + ["%.2f"]
+
+# porcentual de vitimas por tipo:
+# 0 (verde), 1 (amarelo), 2 (vermelho), 3 (preto)
+DIST_TRI_POR_TIPO = {
+    'aereo': {0: 0.2, 1: 0.3, 2: 0.4, 3: 0.1},
+    'rodoviario': {0: 0.4, 1: 0.3, 2: 0.2, 3: 0.1},
+    'ferroviario': {0: 0.3, 1: 0.3, 2: 0.3, 3: 0.1},
+    'deslizamento': {0: 0.25, 1: 0.25, 2: 0.3, 3: 0.2},
+    'uniforme': {0: 0.25, 1: 0.25, 2: 0.25, 3: 0.25}
+}
+
+# faixas de probabilidade de sobrevivencia em funcao do tipo
+FAIXAS_FUZZY = {0: (0.90, 1.0), 1: (0.75, 0.95), 2: (0.15, 0.8), 3: (0.0, 0.25)}
+
+# faixas de valores ou valores para os atributos em funcao do estado
+# de triagem; faixas inteiras (a, b) excluem b, como em randint
+TRIAGEM_PARAMETROS = {
+    0: {'fc': (60, 100), 'fr': (12, 20), 'pas': (110, 130), 'spo2': (96, 100),
+        'gcs': (15, 15), 'avpu': [0], 'temp': (36.5, 37.4), 'pr': [1],
+        'sg': [0], 'fx': [1], 'queim': [0]},
+    1: {'fc': (100, 120), 'fr': (20, 30), 'pas': (90, 110), 'spo2': (90, 95),
+        'gcs': (13, 14), 'avpu': [0, 1], 'temp': (37.0, 38.5), 'pr': [1, 0],
+        'sg': [1, 2], 'fx': [0, 1], 'queim': [0]*85 + [1]*10 + [2]*5},
+    2: {'fc': (121, 160), 'fr': (31, 45), 'pas': (60, 89), 'spo2': (75, 89),
+        'gcs': (9, 12), 'avpu': [2], 'temp': (34.0, 35.0), 'pr': [0],
+        'sg': [3], 'fx': [1], 'queim': [0]*40 + [2]*30 + [3]*30},
+    3: {'fc': (0, 0), 'fr': (0, 0), 'pas': (0, 0), 'spo2': (0, 74),
+        'gcs': (3, 6), 'avpu': [3], 'temp': (25.0, 34.0), 'pr': [0],
+        'sg': [3], 'fx': [0, 1], 'queim': [0]*50 + [3]*50}
+}
+
+CORES = {0: 'verde', 1: 'amarelo', 2: 'vermelho', 3: 'preto'}
+
+
+def ruido_int(rng, val, min_val, max_val, nivel_ruido):
+    """ Soma a cada valor um inteiro uniforme em [-delta, delta] """
+    delta = int((max_val - min_val + 1) * nivel_ruido)
+    ruido = rng.integers(-delta, delta + 1, size=len(val))
+    return np.clip(val + ruido, min_val, max_val)
+
+
+def ruido_float(rng, val, min_val, max_val, nivel_ruido):
+    """ Soma a cada valor um real uniforme em [-delta, delta] """
+    delta = (max_val - min_val) * nivel_ruido
+    ruido = rng.uniform(-delta, delta, size=len(val))
+    return np.clip(val + ruido, min_val, max_val)
+
+
+def inteiros(rng, faixa, n):
+    """ n inteiros em [a, b[, ou n zeros para a faixa (0, 0) """
+    if faixa == (0, 0):
+        return np.zeros(n, dtype=np.int64)
+    return rng.integers(*faixa, size=n)
+
+
+def gerar_lote(rng, n, media_idade=35, desvio_idade=5, tipo_acidente="aereo",
+               nivel_ruido=0.02):
     """
-    Gera dataset sintético de vítimas com ruído configurável.
+    Gera n vítimas.
     nivel_ruido: float entre 0 e 1 que controla intensidade do ruído.
                  0 -> sem ruído, 1 -> ruído máximo permitido.
                  Também define probabilidade de erro em AVPU e TRI.
+    Retorna um array float64 (n, 14) com as colunas de COLUNAS.
     """
-    if seed is not None:
-        np.random.seed(seed)
-        random.seed(seed)
-
-    # porcentual de vitimas por tipo:
-    # 0 (verde), 1 (amarelo), 2 (vermelho), 3 (preto)
-    dist_tri_por_tipo = {
-        'aereo': {0: 0.2, 1: 0.3, 2: 0.4, 3: 0.1},
-        'rodoviario': {0: 0.4, 1: 0.3, 2: 0.2, 3: 0.1},
-        'ferroviario': {0: 0.3, 1: 0.3, 2: 0.3, 3: 0.1},
-        'deslizamento': {0: 0.25, 1: 0.25, 2: 0.3, 3: 0.2},
-        'uniforme': {0: 0.25, 1: 0.25, 2: 0.25, 3:0.25}
-    }
-
-    # faixas de probabilidade de sobrevivencia em funcao do tipo
-    faixas_fuzzy = {0:(0.90,1.0),1:(0.75,0.95),2:(0.15,0.8),3:(0.0,0.25)}
-
-    # faixas de valores ou valores para os atributos em funcao do estado
-    # de triagem
-    triagem_parametros = {
-        0: {'fc': (60,100), 'fr':(12,20), 'pas':(110,130), 'spo2':(96,100),
-            'gcs':(15,15), 'avpu':[0], 'temp':(36.5,37.4), 'pr':[1],
-            'sg':[0], 'fx':[1], 'queim':[0]},
-        1: {'fc':(100,120), 'fr':(20,30), 'pas':(90,110), 'spo2':(90,95),
-            'gcs':(13,14), 'avpu':[0,1], 'temp':(37.0,38.5), 'pr':[1,0],
-            'sg':[1,2], 'fx':[0,1], 'queim':[0]*85+[1]*10+[2]*5},
-        2: {'fc':(121,160), 'fr':(31,45), 'pas':(60,89), 'spo2':(75,89),
-            'gcs':(9,12), 'avpu':[2], 'temp':(34.0,35.0), 'pr':[0],
-            'sg':[3], 'fx':[1], 'queim':[0]*40+[2]*30+[3]*30},
-        3: {'fc':(0,0), 'fr':(0,0), 'pas':(0,0), 'spo2':(0,74),
-            'gcs':(3,6), 'avpu':[3], 'temp':(25.0,34.0), 'pr':[0],
-            'sg':[3], 'fx':[0,1], 'queim':[0]*50+[3]*50}
-    }
-
-    distrib = dist_tri_por_tipo[tipo_acidente]
-    classificacoes = np.random.choice(list(distrib.keys()), size=n_vitimas, p=list(distrib.values()))
-    idades = np.clip(np.random.normal(media_idade, desvio_idade, n_vitimas), 0, 90).astype(int)
-
-    dados = []
-
-    for i in range(n_vitimas):
-        tri = classificacoes[i]
-        idade = idades[i]
-        params = triagem_parametros[tri]
-        gcs_range = params['gcs']
-        gcs_value = gcs_range[0] if gcs_range[0]==gcs_range[1] else np.random.randint(*gcs_range)
+    distrib = DIST_TRI_POR_TIPO[tipo_acidente]
+    classificacoes = rng.choice(list(distrib.keys()), size=n, p=list(distrib.values()))
+    idades = np.clip(rng.normal(media_idade, desvio_idade, n), 0, 90).astype(np.int64)
 
-        def ruido_int(val, min_val, max_val):
-            delta = int((max_val - min_val + 1) * nivel_ruido)
-            ruido = np.random.randint(-delta, delta+1)
-            return int(np.clip(val + ruido, min_val, max_val))
+    dados = np.empty((n, len(COLUNAS)))
+    col = {nome: i for i, nome in enumerate(COLUNAS)}
+    dados[:, col['idade']] = ruido_int(rng, idades, 1, 90, nivel_ruido)
 
-        def ruido_float(val, min_val, max_val):
-            delta = (max_val - min_val) * nivel_ruido
-            ruido = np.random.uniform(-delta, delta)
-            return float(np.clip(val + ruido, min_val, max_val))
+    # atributos sorteados a partir da classe real de cada vítima
+    for tri, params in TRIAGEM_PARAMETROS.items():
+        idx = np.flatnonzero(classificacoes == tri)
+        k = len(idx)
+        if k == 0:
+            continue
 
         # --- Numéricas ---
-        registro = {
-            'idade': ruido_int(idade, 1, 90),
-            'fc': ruido_int(np.random.randint(*params['fc']) if params['fc']!=(0,0) else 0, 0, 200),
-            'fr': ruido_int(np.random.randint(*params['fr']) if params['fr']!=(0,0) else 0, 0, 50),
-            'pas': ruido_int(np.random.randint(*params['pas']) if params['pas']!=(0,0) else 0, 0, 200),
-            'spo2': ruido_int(np.random.randint(*params['spo2']), 0, 100),
-            'temp': ruido_float(np.random.uniform(*params['temp']), 25.0, 42.0)
-        }
+        dados[idx, col['fc']] = ruido_int(rng, inteiros(rng, params['fc'], k), 0, 200, nivel_ruido)
+        dados[idx, col['fr']] = ruido_int(rng, inteiros(rng, params['fr'], k), 0, 50, nivel_ruido)
+        dados[idx, col['pas']] = ruido_int(rng, inteiros(rng, params['pas'], k), 0, 200, nivel_ruido)
+        dados[idx, col['spo2']] = ruido_int(rng, rng.integers(*params['spo2'], size=k), 0, 100, nivel_ruido)
+        dados[idx, col['temp']] = ruido_float(rng, rng.uniform(*params['temp'], size=k), 25.0, 42.0, nivel_ruido)
+
+        gcs_range = params['gcs']
+        if gcs_range[0] == gcs_range[1]:
+            gcs = np.full(k, gcs_range[0])
+        else:
+            gcs = rng.integers(*gcs_range, size=k)
+        dados[idx, col['gcs']] = ruido_int(rng, gcs, 3, 15, nivel_ruido)
 
         # --- Categóricas ---
         # pr, sg, fx, queim
-        for col in ['pr', 'sg', 'fx', 'queim']:
-            registro[col] = random.choice(params[col])
-
-        registro['gcs'] = ruido_int(gcs_value, 3, 15)
+        for nome in ['pr', 'sg', 'fx', 'queim']:
+            dados[idx, col[nome]] = rng.choice(params[nome], size=k)
 
         # --- Ruído em AVPU ---
-        avpu_val = random.choice(params['avpu'])
-        if random.random() < nivel_ruido:  # com probabilidade nivel_ruido, troca para outro valor
-            outros = [v for v in params['avpu'] if v != avpu_val]
-            if outros:
-                avpu_val = random.choice(outros)
-        registro['avpu'] = avpu_val
-
-        # --- Ruído em TRI ---
-        tri_val = tri
-        if random.random() < nivel_ruido:
-            outros = [v for v in [0,1,2,3] if v != tri_val]
-            tri_val = random.choice(outros)
-        registro['tri'] = tri_val
-
-        registro['sobr'] = round(ruido_float(np.random.uniform(*faixas_fuzzy[tri]),0.0,1.0),2)
-
-        dados.append(registro)
-
-    df = pd.DataFrame(dados)
-    df.to_csv(OUTPUT_CSV, index=False)
-    print(f"\nDataset salvo como {OUTPUT_CSV}")
-
-    cores = {0: 'verde', 1: 'amarelo', 2: 'vermelho', 3: 'preto'}
-    contagem = Counter(df['tri'])
-    print("\nNúmero de vítimas por classificação START:")
-    for k in sorted(contagem.keys()):
-        print(f"  {k} ({cores[k]}): {contagem[k]}")
-
+        # com probabilidade nivel_ruido, troca para outro valor da classe
+        opcoes = params['avpu']
+        avpu = rng.choice(opcoes, size=k)
+        troca = rng.random(k) < nivel_ruido
+        for valor in set(opcoes):
+            outros = [v for v in opcoes if v != valor]
+            sel = troca & (avpu == valor)
+            if outros and sel.any():
+                avpu[sel] = rng.choice(outros, size=int(sel.sum()))
+        dados[idx, col['avpu']] = avpu
+
+        dados[idx, col['sobr']] = np.round(
+            ruido_float(rng, rng.uniform(*FAIXAS_FUZZY[tri], size=k), 0.0, 1.0, nivel_ruido), 2)
+
+    # --- Ruído em TRI ---
+    # com probabilidade nivel_ruido, uma das outras três classes
+    tri = classificacoes.copy()
+    troca = rng.random(n) < nivel_ruido
+    tri[troca] = (tri[troca] + rng.integers(1, 4, size=int(troca.sum()))) % 4
+    dados[:, col['tri']] = tri
+
+    return dados
+
+
+def salvar_histograma(hist, bordas, caminho):
+    """ Grava a distribuição percentual de sobr num arquivo de imagem """
+    import matplotlib
+    matplotlib.use("Agg")  # sem janela
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import PercentFormatter
+
+    total = hist.sum()
     plt.figure(figsize=(8, 5))
-    plt.hist(df['sobr'], bins=10, color='skyblue', edgecolor='black',
-             weights=np.ones(n_vitimas)/n_vitimas)
+    plt.bar(bordas[:-1], hist / total if total else hist, width=np.diff(bordas),
+            align='edge', color='skyblue', edgecolor='black')
     plt.title('Distribuição percentual da probabilidade de sobrevivência')
     plt.xlabel('Probabilidade de Sobrevivência')
     plt.ylabel('% de Vitimas')
-    plt.gca().yaxis.set_major_formatter(plt.matplotlib.ticker.PercentFormatter(1))
+    plt.gca().yaxis.set_major_formatter(PercentFormatter(1))
     plt.grid(True, linestyle='--', alpha=0.6)
     plt.tight_layout()
-    plt.show()
+    plt.savefig(caminho)
+    plt.close()
+
+
+def gerar_dataset_vitimas(saida, n_vitimas=100, media_idade=35, desvio_idade=5,
+                          tipo_acidente="aereo", nivel_ruido=0.02, seed=None,
+                          tam_lote=1_000_000, histograma=None):
+    """
+    Gera o dataset e grava em saida (data.csv) em lotes de tam_lote vítimas.
+    histograma: caminho opcional de uma imagem com a distribuição de sobr.
+    Retorna o número de vítimas por classificação START (tri).
+    """
+    rng = np.random.default_rng(seed)
+    saida = Path(saida)
+    saida.parent.mkdir(parents=True, exist_ok=True)
 
-    return df
+    contagem = np.zeros(4, dtype=np.int64)
+    bordas = np.linspace(0.0, 1.0, 11)
+    hist = np.zeros(10, dtype=np.int64)
+
+    with open(saida, "w", newline="") as f:
+        f.write(",".join(COLUNAS) + "\n")
+        for inicio in range(0, n_vitimas, tam_lote):
+            lote = gerar_lote(rng, min(tam_lote, n_vitimas - inicio), media_idade,
+                              desvio_idade, tipo_acidente, nivel_ruido)
+            np.savetxt(f, lote, fmt=FORMATOS, delimiter=",")
+            contagem += np.bincount(lote[:, COLUNAS.index('tri')].astype(np.int64),
+                                    minlength=4)
+            hist += np.histogram(lote[:, COLUNAS.index('sobr')], bins=bordas)[0]
+
+    if histograma:
+        salvar_histograma(hist, bordas, histograma)
+    return contagem
 
 
 def main():
-    # você pode alterar os parâmetros conforme necessário
-    df = gerar_dataset_vitimas(
-        n_vitimas=10,
-        media_idade=25,
-        desvio_idade=3,
-        tipo_acidente="uniforme",
-        nivel_ruido=0.02
-    )
-    print("\nPrimeiras linhas do dataset gerado:")
-    print(df.head())
+    parser = argparse.ArgumentParser(description="Gera o data.csv de sinais vitais de vítimas sintéticas")
+    parser.add_argument("n_vitimas", type=int, help="número de vítimas")
+    parser.add_argument("--saida", help="arquivo CSV de saída "
+                                        "(padrão: datasets/vict/<n_vitimas>v/data.csv)")
+    parser.add_argument("--tipo", default="uniforme", choices=sorted(DIST_TRI_POR_TIPO),
+                        help="tipo de acidente, define a distribuição das classes de triagem")
+    parser.add_argument("--media-idade", type=float, default=25)
+    parser.add_argument("--desvio-idade", type=float, default=3)
+    parser.add_argument("--ruido", type=float, default=0.02, help="nível de ruído em [0, 1]")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=1_000_000,
+                        help="vítimas geradas e gravadas por vez")
+    parser.add_argument("--hist", metavar="IMAGEM",
+                        help="grava o histograma de sobr nesta imagem (ex.: sobr.png)")
+    args = parser.parse_args()
+    if args.hist:
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            parser.error("--hist requer o matplotlib (pip install matplotlib)")
+
+    saida = args.saida or VICT_FOLDER / f"{args.n_vitimas}v" / "data.csv"
+    inicio = time.perf_counter()
+    contagem = gerar_dataset_vitimas(saida, args.n_vitimas, args.media_idade,
+                                     args.desvio_idade, args.tipo, args.ruido,
+                                     args.seed, args.lote, args.hist)
+    print(f"\nDataset salvo como {saida} ({time.perf_counter() - inicio:.1f}s)")
+
+    print("\nNúmero de vítimas por classificação START:")
+    for k in range(4):
+        if contagem[k]:
+            print(f"  {k} ({CORES[k]}): {contagem[k]}")
 
 
 if __name__ == "__main__":
@@ -1,15 +1,55 @@
 from vs.abstract_agent import AbstAgent
 from vs.constants import VS
-import random
+from vs.pathfinding import GridPathfinder
+from vs.hpa import HierarchicalPathfinder
+from explorer.dstar_lite import DStarLite, INF
+from explorer.frontier import FrontierSet
 import heapq
+import math
 
 class ExplorerAgent(AbstAgent):
     """
-    Agente explorador que usa ONLINE-DFS para explorar e A* para estimar e retornar à base.
+    Agente explorador que usa ONLINE-DFS (ou exploração por fronteiras) para
+    explorar e A* para estimar e retornar à base.
     """
 
-    def __init__(self, env, config_file):
-        super().__init__(env, config_file)
+    ROLE = "explorer"
+
+    # Estratégias de exploração: "dfs" (ONLINE-DFS com retrocesso pela pilha)
+    # ou "frontier" (vai até a melhor célula da fronteira pelo A*)
+    STRATEGIES = ("dfs", "frontier")
+
+    # A partir deste número de células o A* é hierárquico (HPA*)
+    HPA_MIN_CELLS = 500 * 500
+
+    # Número de setores quando o explorador é criado sem sector (um por
+    # arquivo de configuração em explorer/)
+    N_SECTORS = 3
+
+    # Divisão original para três exploradores, mantida para que a execução
+    # padrão continue comparável: (início, largura) em graus de tela do norte
+    # (180°), do sudeste (90°) e do sudoeste (90°)
+    THREE_SECTORS = ((-180.0, 180.0), (0.0, 90.0), (90.0, 90.0))
+
+    def __init__(self, env, config_file, overrides=None, strategy="dfs", sector=None):
+        """
+        sector: (índice, total) do setor do explorador. Com total 3 vale a
+                divisão original (norte, sudeste e sudoeste, THREE_SECTORS);
+                com outro total, o ângulo em volta da base é dividido em total
+                fatias iguais, a primeira centrada no norte. Sem sector, o
+                índice vem do nome (EXPLORER_<índice+1>) e o total é
+                N_SECTORS. O explorador do setor 0 é o chefe.
+        """
+        super().__init__(env, config_file, overrides)
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"unknown exploration strategy: {strategy}")
+        self.strategy = strategy
+        if sector is None:
+            suffix = self.NAME.rpartition("_")[2]
+            sector = (int(suffix) - 1 if suffix.isdigit() else 0, self.N_SECTORS)
+        self.sector, self.n_sectors = sector
+        if not 0 <= self.sector < self.n_sectors:
+            raise ValueError(f"invalid sector {self.sector} of {self.n_sectors}")
 
         self.current_pos = (self._AbstAgent__phy.x, self._AbstAgent__phy.y)
         self.base_pos = (self._AbstAgent__phy.x, self._AbstAgent__phy.y)
@@ -21,7 +61,7 @@ class ExplorerAgent(AbstAgent):
         self.unvisited_neighbors = {}
         self.found_victims = {}
 
-        self.is_chief = (self.NAME == "EXPLORER_1")
+        self.is_chief = (self.sector == 0)
         if self.is_chief:
             print(f"{self.NAME}: Eu sou o Chefe. Coordenarei a transição.")
 
@@ -32,20 +72,51 @@ class ExplorerAgent(AbstAgent):
         self.unified_victims = {}
 
         self.USE_ASTAR = True
+        self.USE_JPS = True         # A* com Jump Point Search nas regiões de terreno uniforme
         self.astar_return_path = []
+        self.return_plan = []       # caminho de volta entregue ao walk_plan
+        self.return_planner = None  # D* Lite do retorno, mantido entre colisões
+        self.backtrack_run = None   # entradas da pilha da DFS entregues ao walk_plan
+        self.astar_expansions = 0  # nós expandidos pelo A* (lido pelo profiler)
+
+        # Campo de distâncias até a base: para cada célula visitada, o custo
+        # real do melhor caminho até a base andando só por células visitadas,
+        # com os fatores de terreno aprendidos ao entrar em cada uma
+        self.terrain = {}           # célula -> fator de terreno aprendido
+        self.max_terrain = 1.0      # maior fator aprendido até agora
+        self.dist_to_base = {self.base_pos: 0.0}
+
+        # Grid de custos do A*: células desconhecidas valem 1.0 (otimista),
+        # as visitadas o fator aprendido e os obstáculos são paredes
+        self.pathfinder = self.new_pathfinder(VS.OBST_NONE)
+
+        # Exploração por fronteiras: as células livres vistas e ainda não
+        # visitadas, e um mapa só com as células conhecidas (visitadas e da
+        # fronteira; o resto é parede) para ir até elas sem colisões
+        self.frontier = FrontierSet()
+        self.frontier_target = None
+        self.known_map = self.new_pathfinder(VS.OBST_WALL) if strategy == "frontier" else None
+        self.SECTOR_WEIGHT = 0.25   # nota por passo de distância até o objetivo do setor
+        self.VICTIM_WEIGHT = 4.0    # bônus (em passos) para regiões com muitas vítimas
         
         # --- LÓGICA DO CONE  ---
 
-        grid_width = self.get_env().dic["GRID_WIDTH"] - 1
-        grid_height = self.get_env().dic["GRID_HEIGHT"] - 1
-        base_x = self.base_pos[0]
-        
-        if "EXPLORER_1" in self.NAME:
-            self.sector_goal = (base_x, 0) # Norte
-        elif "EXPLORER_2" in self.NAME:
-            self.sector_goal = (grid_width, grid_height) # Sudeste
-        else: # EXPLORER_3
-            self.sector_goal = (0, grid_height) # Sudoeste
+        # Setor: fatia em volta da base (ângulos de tela: 0 é leste e cresce
+        # no sentido horário, -90 é o norte)
+        if self.n_sectors == 3:
+            # divisão original, com os objetivos originais: a borda norte
+            # acima da base e os cantos sudeste e sudoeste do grid
+            self.sector_start, self.sector_width = self.THREE_SECTORS[self.sector]
+            env_dic = self.get_env().dic
+            max_x = env_dic["GRID_WIDTH"] - 1
+            max_y = env_dic["GRID_HEIGHT"] - 1
+            self.sector_goal = ((self.base_pos[0], 0), (max_x, max_y), (0, max_y))[self.sector]
+        else:
+            # fatias iguais de 360/n_sectors graus, e o objetivo do setor é a
+            # borda do grid na direção do meio da fatia
+            self.sector_width = 360.0 / self.n_sectors
+            self.sector_start = -90.0 - self.sector_width / 2 + self.sector * self.sector_width
+            self.sector_goal = self.border_cell(self.sector_start + self.sector_width / 2)
 
 
     def deliberate(self) -> bool:
@@ -67,13 +138,23 @@ class ExplorerAgent(AbstAgent):
 
         return False
 
+    def deliberates_alone(self) -> bool:
+        # explorando ou voltando, o agente só usa os próprios mapas e o
+        # próprio corpo; esperar e sincronizar dependem dos outros
+        return self.state == "EXPLORING" or self.state == "RETURNING_TO_BASE"
+
     def handle_exploring_state(self):
-        cost_to_return = self.estimate_astar_cost(self.current_pos, self.base_pos)
+        self.restore_backtrack_run()
+        if self.current_pos not in self.dist_to_base:
+            self.add_to_distance_field(self.current_pos)
+        cost_to_return = self.dist_to_base.get(self.current_pos)
+        if cost_to_return is None:
+            cost_to_return = self.estimate_astar_cost(self.current_pos, self.base_pos)
         current_time = self.get_rtime()
 
         if current_time < (cost_to_return + self.SAFETY_MARGIN):
-            print(f"{self.NAME}: Bateria baixa ({current_time:.1f} < {cost_to_return:.1f} [A* Estimado]). Voltando (A*).")
-            path = self.astar_path(self.current_pos, self.base_pos)
+            print(f"{self.NAME}: Bateria baixa ({current_time:.1f} < {cost_to_return:.1f} [Estimado]). Voltando (A*).")
+            path = self.return_path()
             if path:
                 self.astar_return_path = path
                 self.state = "RETURNING_TO_BASE"
@@ -98,12 +179,21 @@ class ExplorerAgent(AbstAgent):
                     self.found_victims[vic_id] = (self.current_pos[0], self.current_pos[1], signals)
                     self.first_aid()
 
+            if self.strategy == "frontier":
+                self.update_frontier(self.current_pos, vic_id != VS.NO_VICTIM)
+
+        if self.strategy == "frontier":
+            return self.explore_frontier(cost_to_return)
+
         if self.current_pos in self.unvisited_neighbors and self.unvisited_neighbors[self.current_pos]:
             direction = self.unvisited_neighbors[self.current_pos].pop(0)
             dx, dy = self.AC_INCR[direction]
+            rtime = self.get_rtime()
             result = self.walk(dx, dy)
             if result == VS.EXECUTED:
                 self.dfs_path_stack.append((-dx, -dy, 1))
+                self.learn_terrain(self.current_pos[0] + dx, self.current_pos[1] + dy,
+                                   dx, dy, rtime - self.get_rtime())
             return True
 
         if not self.dfs_path_stack:
@@ -117,10 +207,129 @@ class ExplorerAgent(AbstAgent):
                 self.state = "RETURNING_TO_BASE"
                 return True
 
-        dx, dy, _ = self.dfs_path_stack.pop()
-        self.walk(dx, dy)
+        return self.backtrack(cost_to_return)
+
+    def backtrack(self, cost_to_return):
+        """
+        Volta pela pilha da DFS até a primeira célula que ainda tem vizinhos
+        a explorar (ou até a base), num único plano (walk_plan).
+        As células do caminho já foram visitadas e não têm vizinhos pendentes,
+        então a cada passo a única decisão seria a verificação da bateria.
+        O custo de retorno cresce no máximo max_step_cost() por passo a partir
+        de cost_to_return; o plano para se a bateria ficar abaixo desse limite
+        e a verificação volta a ser feita a cada ciclo.
+        """
+        run = []
+        x, y = self.current_pos
+        while self.dfs_path_stack:
+            entry = self.dfs_path_stack.pop()
+            run.append(entry)
+            x, y = x + entry[0], y + entry[1]
+            if self.unvisited_neighbors.get((x, y)):
+                break
+
+        min_rtime = cost_to_return + self.max_step_cost() * len(run) + self.SAFETY_MARGIN
+        self.backtrack_run = run
+        self.walk_plan([(dx, dy) for dx, dy, _ in run], min_rtime)
+        return True
+
+    def update_frontier(self, pos, victim):
+        """
+        A célula recém-visitada sai da fronteira e entra no mapa conhecido;
+        as vizinhas livres ainda não visitadas (as que a DFS visitaria)
+        entram na fronteira.
+        """
+        self.frontier.discard(pos)
+        self.frontier.note_visit(pos, victim)
+        self.known_map.set_cost(pos[0], pos[1], self.terrain.get(pos, VS.OBST_NONE))
+        for direction in self.unvisited_neighbors.get(pos, []):
+            dx, dy = self.AC_INCR[direction]
+            cell = (pos[0] + dx, pos[1] + dy)
+            if cell not in self.frontier:
+                self.frontier.add(cell)
+                self.known_map.set_cost(cell[0], cell[1], VS.OBST_NONE)
+
+    def frontier_score(self, cell):
+        """
+        Nota de uma célula da fronteira (menor é melhor): distância até o
+        agente, um peso para o objetivo do setor e um bônus pela densidade de
+        vítimas já encontradas em volta.
+        """
+        dx = abs(cell[0] - self.current_pos[0])
+        dy = abs(cell[1] - self.current_pos[1])
+        dist = self.COST_DIAG * min(dx, dy) + self.COST_LINE * abs(dx - dy)
+        sector = max(abs(cell[0] - self.sector_goal[0]), abs(cell[1] - self.sector_goal[1]))
+        return (dist + self.SECTOR_WEIGHT * sector
+                - self.VICTIM_WEIGHT * self.frontier.victim_density(cell))
+
+    def explore_frontier(self, cost_to_return):
+        """
+        Vai até a melhor célula da fronteira pelo mapa conhecido. O caminho
+        é cortado na primeira célula não visitada; os passos até a vizinha
+        dela já foram dados antes e vão num único plano (com o mesmo limite
+        de bateria do retrocesso da DFS) e o último passo é um walk, para
+        aprender o terreno da célula nova.
+        """
+        target = self.frontier_target
+        if target is None or target not in self.frontier:
+            target = self.frontier.best(self.current_pos, self.frontier_score,
+                                        min(self.COST_LINE, self.COST_DIAG), self.VICTIM_WEIGHT)
+            if target is None:
+                print(f"{self.NAME}: Exploração completa (fronteira vazia). Voltando à base.")
+                self.state = "RETURNING_TO_BASE"
+                return True
+            self.frontier_target = target
+
+        # sem JPS: no mapa conhecido quase toda célula é vizinha de uma
+        # parede (o desconhecido), e os saltos parariam a cada passo
+        expansions = self.known_map.expansions
+        moves, _ = self.known_map.search(self.current_pos, target)
+        self.astar_expansions += self.known_map.expansions - expansions
+        if not moves:
+            self.frontier.discard(target)
+            self.frontier_target = None
+            return True
+
+        x, y = self.current_pos
+        for i, (dx, dy) in enumerate(moves):
+            x, y = x + dx, y + dy
+            if (x, y) not in self.map_visited:
+                moves = moves[:i + 1]
+                target = (x, y)
+                self.frontier_target = target
+                break
+
+        if len(moves) > 1:
+            min_rtime = cost_to_return + self.max_step_cost() * (len(moves) - 1) + self.SAFETY_MARGIN
+            self.walk_plan(moves[:-1], min_rtime)
+            return True
+
+        dx, dy = moves[0]
+        rtime = self.get_rtime()
+        result = self.walk(dx, dy)
+        if result == VS.EXECUTED:
+            self.learn_terrain(target[0], target[1], dx, dy, rtime - self.get_rtime())
+        elif result == VS.BUMPED:
+            self.map_obstacles[target] = VS.WALL
+            self.pathfinder.block(*target)
+            self.known_map.block(*target)
+            self.frontier.discard(target)
+        self.frontier_target = None
         return True
 
+    def restore_backtrack_run(self):
+        """
+        Devolve à pilha da DFS os passos do último retrocesso que não foram
+        tentados (plano interrompido por colisão ou pela bateria).
+        """
+        if self.backtrack_run is None:
+            return
+        run = self.backtrack_run
+        self.backtrack_run = None
+        _, moves_left = self.plan_outcome()
+        for entry in reversed(run[len(run) - len(moves_left):]):
+            self.dfs_path_stack.append(entry)
+
     def handle_return_state(self):
         if self.current_pos == self.base_pos:
             bateria_restante = self.get_rtime()
@@ -134,17 +343,29 @@ class ExplorerAgent(AbstAgent):
                 self.state = "DONE"
                 return False
 
+        # O plano anterior parou antes da base: um passo colidiu com um
+        # obstáculo desconhecido, então marca e repara o caminho
+        if self.return_plan:
+            plan = self.return_plan
+            self.return_plan = []
+            result, moves_left = self.plan_outcome()
+            if result == VS.BUMPED:
+                dx, dy = plan[len(plan) - len(moves_left) - 1]
+                wall = (self.current_pos[0] + dx, self.current_pos[1] + dy)
+                self.map_obstacles[wall] = VS.WALL
+                self.pathfinder.block(*wall)
+                if self.return_planner is not None:
+                    self.return_planner.block(wall)
+                self.astar_return_path = self.return_path()
+
+        # Segue o caminho inteiro num único plano
         if self.astar_return_path:
-            dx, dy = self.astar_return_path.pop(0)
-            result = self.walk(dx, dy)
-            if result == VS.EXECUTED:
-                return True
-            else:
-                self.map_obstacles[(self.current_pos[0] + dx, self.current_pos[1] + dy)] = VS.WALL
-                self.astar_return_path = self.astar_path(self.current_pos, self.base_pos)
-                return True
+            self.return_plan = self.astar_return_path
+            self.astar_return_path = []
+            self.walk_plan(self.return_plan)
+            return True
 
-        self.astar_return_path = self.astar_path(self.current_pos, self.base_pos)
+        self.astar_return_path = self.return_path()
         if not self.astar_return_path and self.dfs_path_stack:
             dx, dy, _ = self.dfs_path_stack.pop()
             self.walk(dx, dy)
@@ -154,14 +375,14 @@ class ExplorerAgent(AbstAgent):
     def handle_waiting_state(self):
         """
         (APENAS CHEFE) Fica na base e verifica se os outros
-        exploradores terminaram.
+        exploradores terminaram. Enquanto houver algum ativo, bloqueia até
+        o próximo agente terminar, sem ser chamado a cada ciclo.
         """
-        all_agents = self.get_env().agents
-        for phy in all_agents:
-            if "EXPLORER" in phy.mind.NAME and phy.mind.NAME != self.NAME:
+        for phy in self.get_env().get_agents(ExplorerAgent.ROLE):
+            if phy.mind is not self:
                 if phy._state == VS.ACTIVE:
-                    if random.random() < 0.05:
-                         print(f"{self.NAME} (Chefe): Esperando {phy.mind.NAME} terminar...")
+                    print(f"{self.NAME} (Chefe): Esperando {phy.mind.NAME} terminar...")
+                    self.wait_for(VS.EV_AGENT_TERMINATED)
                     return True
 
         print(f"-------------------------------------------------")
@@ -175,54 +396,27 @@ class ExplorerAgent(AbstAgent):
         *** ATUALIZAÇÃO: Lógica de loop removida para unificação/contagem ***
         """
         print(f"--- {self.NAME} (CHEFE): FASE 2 - UNIFICAÇÃO ---")
-        all_agents = self.get_env().agents
-        
-        # --- Dicionários para armazenar dados e contagens ---
-        explorer_minds = {} # Armazena a 'mente' (mind) de cada explorador
-        victim_counts = {}  # Armazena a contagem de vítimas (Ve1, Ve2, Ve3)
-
-        # Encontra os 3 exploradores ---
-        for phy in all_agents:
-            if phy.mind.NAME == "EXPLORER_1" and phy._state != VS.DEAD:
-                explorer_minds['1'] = phy.mind
-            elif phy.mind.NAME == "EXPLORER_2" and phy._state != VS.DEAD:
-                explorer_minds['2'] = phy.mind
-            elif phy.mind.NAME == "EXPLORER_3" and phy._state != VS.DEAD:
-                explorer_minds['3'] = phy.mind
+        env = self.get_env()
+
+        # --- Contagem de vítimas de cada explorador (Ve1, Ve2, ...) ---
+        victim_counts = {}
 
         self.unified_obstacles = {}
         self.unified_victims = {}
         ve_total_soma = 0
-        
-        if '1' in explorer_minds:
-            mind = explorer_minds['1']
-            self.unified_obstacles.update(mind.map_obstacles)
-            self.unified_victims.update(mind.found_victims)
-            victim_counts['1'] = len(mind.found_victims)
-            ve_total_soma += victim_counts['1']
-            print(f"Dados do EXPLORER_1 (Chefe) adicionados.")
-        else:
-            victim_counts['1'] = 0
-            
-        if '2' in explorer_minds:
-            mind = explorer_minds['2']
-            self.unified_obstacles.update(mind.map_obstacles)
-            self.unified_victims.update(mind.found_victims)
-            victim_counts['2'] = len(mind.found_victims)
-            ve_total_soma += victim_counts['2']
-            print(f"Dados do EXPLORER_2 adicionados.")
-        else:
-            victim_counts['2'] = 0
 
-        if '3' in explorer_minds:
-            mind = explorer_minds['3']
+        # Une os mapas dos exploradores vivos, na ordem em que foram criados
+        for phy in env.get_agents(ExplorerAgent.ROLE):
+            mind = phy.mind
+            if phy._state == VS.DEAD:
+                victim_counts[mind.NAME] = 0
+                continue
             self.unified_obstacles.update(mind.map_obstacles)
             self.unified_victims.update(mind.found_victims)
-            victim_counts['3'] = len(mind.found_victims)
-            ve_total_soma += victim_counts['3']
-            print(f"Dados do EXPLORER_3 adicionados.")
-        else:
-            victim_counts['3'] = 0
+            victim_counts[mind.NAME] = len(mind.found_victims)
+            ve_total_soma += victim_counts[mind.NAME]
+            chief = " (Chefe)" if mind is self else ""
+            print(f"Dados do {mind.NAME}{chief} adicionados.")
 
         print(f"-------------------------------------------------")
         print(f"UNIFICAÇÃO CONCLUÍDA:")
@@ -233,13 +427,13 @@ class ExplorerAgent(AbstAgent):
         # --- 3. Cálculo de Sobreposição (separado, como pedido) ---
         print(f"\n--- {self.NAME} (CHEFE): CÁLCULO DE SOBREPOSIÇÃO ---")
         
-        print(f"  > EXPLORER_1 (Ve1): {victim_counts['1']} vítimas")
-        print(f"  > EXPLORER_2 (Ve2): {victim_counts['2']} vítimas")
-        print(f"  > EXPLORER_3 (Ve3): {victim_counts['3']} vítimas")
+        for i, (name, count) in enumerate(victim_counts.items(), start=1):
+            print(f"  > {name} (Ve{i}): {count} vítimas")
 
         if ve_total_unico > 0:
             sobreposicao = (ve_total_soma / ve_total_unico) - 1
-            print(f"  > Soma (Ve1+Ve2+Ve3): {ve_total_soma}")
+            terms = "+".join(f"Ve{i}" for i in range(1, len(victim_counts) + 1))
+            print(f"  > Soma ({terms}): {ve_total_soma}")
             print(f"  > Únicas (Ve): {ve_total_unico}")
             print(f"  > SOBREPOSIÇÃO: ({ve_total_soma} / {ve_total_unico}) - 1 = {sobreposicao:.4f}")
         else:
@@ -248,88 +442,214 @@ class ExplorerAgent(AbstAgent):
         print(f"-------------------------------------------------")
         print(f"--- {self.NAME} (CHEFE): FASE 3 - ATIVAÇÃO DOS SOCORRISTAS ---")
         
-        for phy in all_agents:
-            if "RESCUER" in phy.mind.NAME:
-                if phy._state == VS.IDLE:
-                    print(f"ATIVANDO: {phy.mind.NAME}")
-                    phy._state = VS.ACTIVE
-                
-                if phy.mind.NAME == "RESCUER_1": 
-                    try:
-                        phy.mind.receber_mapas_unificados(self.unified_victims, self.unified_obstacles)
-                        print(f"MAPAS UNIFICADOS ENTREGUES para {phy.mind.NAME}.")
-                    except AttributeError:
-                        print(f"AVISO: {phy.mind.NAME} não tem o método 'receber_mapas_unificados'")
+        for phy in env.get_agents("rescuer"):
+            if phy._state == VS.IDLE:
+                print(f"ATIVANDO: {phy.mind.NAME}")
+                phy._state = VS.ACTIVE
+
+            if phy.mind.NAME == "RESCUER_1":
+                try:
+                    phy.mind.receber_mapas_unificados(self.unified_victims, self.unified_obstacles)
+                    print(f"MAPAS UNIFICADOS ENTREGUES para {phy.mind.NAME}.")
+                except AttributeError:
+                    print(f"AVISO: {phy.mind.NAME} não tem o método 'receber_mapas_unificados'")
+        self.notify(VS.EV_MAPS_UNIFIED)
         
         print(f"-------------------------------------------------")
         self.state = "DONE"
         return False
 
 
-    def estimate_astar_cost(self, start, goal):
-        path = self.astar_path(start, goal)
-        if not path:
-            return self.calculate_dfs_stack_cost()
-        return len(path)*1.5
+    def learn_terrain(self, x, y, dx, dy, cost):
+        """
+        Aprende o fator de terreno da célula (x, y) pelo custo do passo que
+        acabou de entrar nela.
+        """
+        factor = cost / (self.COST_DIAG if dx != 0 and dy != 0 else self.COST_LINE)
+        self.terrain[(x, y)] = factor
+        self.pathfinder.set_cost(x, y, factor)
+        if factor > self.max_terrain:
+            self.max_terrain = factor
+            # o custo de entrar na base (fator desconhecido) subiu: as
+            # distâncias antigas ficaram otimistas
+            self.rebuild_distance_field()
+
+    def step_cost(self, a, b):
+        """
+        Custo de andar da célula a para a vizinha b. O fator da base nunca é
+        observado (o agente não entra nela com walk), então vale o maior
+        fator aprendido.
+        """
+        if b == self.base_pos:
+            factor = self.max_terrain
+        else:
+            factor = self.terrain.get(b, self.max_terrain)
+        if a[0] != b[0] and a[1] != b[1]:
+            return self.COST_DIAG * factor
+        return self.COST_LINE * factor
+
+    def max_step_cost(self):
+        """ Maior custo de um passo entre células conhecidas """
+        return max(self.COST_DIAG, self.COST_LINE) * self.max_terrain
 
-    def astar_neighbors(self, node):
-        neighbors = []
-        x, y = node
+    def add_to_distance_field(self, pos):
+        """
+        Inclui no campo de distâncias uma célula recém-visitada: a distância
+        dela vem das vizinhas já no campo e, como a célula só acrescenta
+        caminhos, as distâncias das outras só podem diminuir; a diminuição é
+        propagada (Dijkstra) apenas enquanto melhora alguma célula.
+        """
+        dist = self.dist_to_base
+        best = None
+        x, y = pos
         for dx, dy in self.AC_INCR.values():
-            nx, ny = x + dx, y + dy
-            npos = (nx, ny)
-            if npos in self.map_obstacles and self.map_obstacles[npos] != VS.CLEAR:
+            npos = (x + dx, y + dy)
+            d = dist.get(npos)
+            if d is not None:
+                d += self.step_cost(pos, npos)
+                if best is None or d < best:
+                    best = d
+        if best is None:
+            return
+        dist[pos] = best
+        self.propagate_distances([(best, pos)])
+        if self.return_planner is not None:
+            # a célula passou a ser atravessável no caminho de volta
+            self.return_planner.update_cell(pos)
+
+    def rebuild_distance_field(self):
+        """ Recalcula todo o campo a partir da base """
+        dist = self.dist_to_base
+        for pos in dist:
+            dist[pos] = float("inf")
+        dist[self.base_pos] = 0.0
+        self.propagate_distances([(0.0, self.base_pos)])
+
+    def propagate_distances(self, heap):
+        """ Dijkstra sobre as células do campo a partir das entradas de heap """
+        dist = self.dist_to_base
+        while heap:
+            d, (x, y) = heapq.heappop(heap)
+            if d > dist[(x, y)]:
                 continue
-            neighbors.append(npos)
-        return neighbors
+            for dx, dy in self.AC_INCR.values():
+                npos = (x + dx, y + dy)
+                old = dist.get(npos)
+                if old is None:
+                    continue
+                nd = d + self.step_cost(npos, (x, y))
+                if nd < old:
+                    dist[npos] = nd
+                    heapq.heappush(heap, (nd, npos))
+
+    def new_pathfinder(self, factor):
+        """
+        Grid de custos do tamanho do ambiente com todas as células valendo
+        factor; em grids muito grandes, o A* hierárquico evita buscas no
+        mapa todo
+        """
+        env_dic = self.get_env().dic
+        width, height = env_dic["GRID_WIDTH"], env_dic["GRID_HEIGHT"]
+        if width * height >= self.HPA_MIN_CELLS:
+            return HierarchicalPathfinder.uniform(width, height, factor,
+                                                  cost_line=self.COST_LINE, cost_diag=self.COST_DIAG)
+        return GridPathfinder.uniform(width, height, factor, self.COST_LINE, self.COST_DIAG)
+
+    def return_path(self):
+        """
+        Caminho da posição atual até a base pelo D* Lite, só por células
+        visitadas (ver return_step_cost). O planejador é criado na primeira
+        chamada e guardado: nas seguintes (depois de passos pela DFS) só a
+        parte afetada da busca é refeita.
+        """
+        planner = self.return_planner
+        if planner is None:
+            env = self.get_env()
+            # o terreno não é aprendido durante o retorno, então o menor
+            # fator conhecido vale para toda a volta
+            min_factor = min(min(self.terrain.values(), default=1.0), self.max_terrain)
+            planner = DStarLite(self.base_pos, self.current_pos,
+                                env.dic["GRID_WIDTH"], env.dic["GRID_HEIGHT"],
+                                self.return_step_cost,
+                                min(self.COST_LINE, self.COST_DIAG) * min_factor)
+            self.return_planner = planner
+        expansions = planner.expansions
+        path = planner.plan(self.current_pos)
+        self.astar_expansions += planner.expansions - expansions
+        return path
+
+    def return_step_cost(self, a, b):
+        """
+        Custo de um passo para o D* Lite. Só as células do campo de
+        distâncias (as visitadas e a base) são atravessáveis, então a volta
+        custa o mesmo que dist_to_base, o valor usado na verificação da
+        bateria, e não passa por paredes ainda desconhecidas.
+        """
+        if b not in self.dist_to_base:
+            return INF
+        return self.step_cost(a, b)
+
+    def estimate_astar_cost(self, start, goal):
+        """ Custo do caminho A* de start até goal (com os fatores de terreno do grid) """
+        moves, cost = self.astar_path(start, goal)
+        if not moves:
+            return self.calculate_dfs_stack_cost()
+        return cost
 
     def astar_heuristic(self, a, b):
         return max(abs(a[0] - b[0]), abs(a[1] - b[1]))*1.5
 
-    def astar_move_cost(self, a, b):
-        if a[0] != b[0] and a[1] != b[1]:
-            return 1.5
-        return 1.0
-
     def astar_path(self, start, goal):
-        if start == goal:
-            return []
-
-        open_set = []
-        heapq.heappush(open_set, (0, start))
-        came_from = {}
-        gscore = {start: 0}
-        fscore = {start: self.astar_heuristic(start, goal)}
-
-        while open_set:
-            _, current = heapq.heappop(open_set)
-            if current == goal:
-                path_positions = [current]
-                while current in came_from:
-                    current = came_from[current]
-                    path_positions.append(current)
-                path_positions.reverse()
-                moves = []
-                for i in range(len(path_positions) - 1):
-                    x0, y0 = path_positions[i]
-                    x1, y1 = path_positions[i + 1]
-                    moves.append((x1 - x0, y1 - y0))
-                return moves
-
-            for neighbor in self.astar_neighbors(current):
-                tentative_g = gscore[current] + self.astar_move_cost(current, neighbor)
-                if neighbor in gscore and tentative_g >= gscore[neighbor]:
-                    continue
-                came_from[neighbor] = current
-                gscore[neighbor] = tentative_g
-                fscore[neighbor] = tentative_g + self.astar_heuristic(neighbor, goal)
-                heapq.heappush(open_set, (fscore[neighbor], neighbor))
-
-        return []
+        """
+        Caminho A* (lista de movimentos e custo) no grid de custos do agente. Com
+        USE_JPS, as regiões de fator 1.0 (quase todo o mapa desconhecido) são
+        atravessadas por Jump Point Search e o A* comum só expande células
+        perto de terrenos diferentes; o custo do caminho é o mesmo.
+        """
+        expansions = self.pathfinder.expansions
+        moves, cost = self.pathfinder.search(start, goal, self.USE_JPS)
+        self.astar_expansions += self.pathfinder.expansions - expansions
+        return moves, cost
 
     def calculate_dfs_stack_cost(self):
         return sum(cost for _, _, cost in self.dfs_path_stack)
 
+    def border_cell(self, angle):
+        """ Célula da borda do grid na direção angle (graus) a partir da base """
+        env_dic = self.get_env().dic
+        max_x = env_dic["GRID_WIDTH"] - 1
+        max_y = env_dic["GRID_HEIGHT"] - 1
+        base_x, base_y = self.base_pos
+        dx = math.cos(math.radians(angle))
+        dy = math.sin(math.radians(angle))
+        t = float("inf")
+        if dx > 1e-9:
+            t = min(t, (max_x - base_x) / dx)
+        elif dx < -1e-9:
+            t = min(t, -base_x / dx)
+        if dy > 1e-9:
+            t = min(t, (max_y - base_y) / dy)
+        elif dy < -1e-9:
+            t = min(t, -base_y / dy)
+        x = min(max(round(base_x + t * dx), 0), max_x)
+        y = min(max(round(base_y + t * dy), 0), max_y)
+        return (x, y)
+
+    def in_sector(self, x, y):
+        """
+        A célula está no setor do explorador? As bordas da fatia (e a base)
+        pertencem aos dois setores vizinhos, como as linhas da base na
+        divisão original em norte, sudeste e sudoeste.
+        """
+        if self.n_sectors == 1:
+            return True
+        dx = x - self.base_pos[0]
+        dy = y - self.base_pos[1]
+        if dx == 0 and dy == 0:
+            return True
+        angle = (math.degrees(math.atan2(dy, dx)) - self.sector_start) % 360.0
+        return angle <= self.sector_width + 1e-9 or angle >= 360.0 - 1e-9
+
     def update_unvisited_neighbors(self, pos):
         """
         LIMITES DA PIZZA
@@ -340,7 +660,6 @@ class ExplorerAgent(AbstAgent):
         obstacles = self.check_walls_and_lim()
         
         scored_directions = []
-        base_x, base_y = self.base_pos # Pega as coordenadas da base
 
         for i in range(8): # Itera por todas as 8 direções
             obs_type = obstacles[i]
@@ -348,36 +667,21 @@ class ExplorerAgent(AbstAgent):
             neighbor_pos = (pos[0] + dx, pos[1] + dy)
             nx, ny = neighbor_pos
             
-            is_allowed = True
-            
-            
-            if "EXPLORER_1" in self.NAME:
-                # Setor Norte (180°)
-                if ny > base_y:
-                    is_allowed = False
-                    
-            elif "EXPLORER_2" in self.NAME:
-                # Setor Sudeste (90°)
-                if ny < base_y or nx < base_x:
-                    is_allowed = False
-                    
-            else: # EXPLORER_3
-                # Setor Sudoeste (90°)
-                if ny < base_y or nx > base_x:
-                    is_allowed = False
-            
+            is_allowed = self.in_sector(nx, ny)
             
             if obs_type != VS.CLEAR:
                 if neighbor_pos not in self.map_obstacles:
                     self.map_obstacles[neighbor_pos] = obs_type
+                    self.pathfinder.block(nx, ny)
             
             elif not is_allowed:
                 if neighbor_pos not in self.map_obstacles:
                     self.map_obstacles[neighbor_pos] = VS.WALL
+                    self.pathfinder.block(nx, ny)
             
             elif neighbor_pos not in self.map_visited:
                 score = self.astar_heuristic(neighbor_pos, self.sector_goal)
-                score += random.random() * 0.1
+                score += self.rng.random() * 0.1
                 scored_directions.append((score, i))
         
         scored_directions.sort()
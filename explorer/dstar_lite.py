@@ -0,0 +1,154 @@
+"""
+D* Lite (Koenig e Likhachev, 2002) para o caminho de volta à base.
+
+A busca é feita a partir do objetivo (a base) em direção ao agente, então,
+quando o agente anda ou descobre uma parede, os valores g e rhs das células
+continuam válidos e só a parte afetada é recalculada: uma colisão no
+caminho de volta custa algumas expansões, e não uma busca inteira.
+"""
+
+import heapq
+
+INF = float("inf")
+
+# os 8 deslocamentos, na ordem de AbstAgent.AC_INCR
+DELTAS = [(0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)]
+
+
+class DStarLite:
+    def __init__(self, goal, start, width, height, step_cost, min_step_cost):
+        """
+        goal: célula objetivo (a base)
+        start: célula onde o agente está
+        width, height: tamanho do grid; células fora dele não existem
+        step_cost(a, b): custo de andar de a para a vizinha b (INF se b é
+                         parede); lido a cada consulta, então mudanças no mapa
+                         valem assim que block() é chamado
+        min_step_cost: menor custo possível de um passo (heurística admissível)
+        """
+        self.goal = goal
+        self.start = start
+        self.width = width
+        self.height = height
+        self.step_cost = step_cost
+        self.min_step_cost = min_step_cost
+        self.km = 0.0
+        self.last = start
+        self.g = {}
+        self.rhs = {goal: 0.0}
+        self.open = {}    # célula -> chave válida na fila
+        self.heap = []    # (k1, k2, célula), com entradas obsoletas
+        self.expansions = 0
+        self.__push(goal)
+
+    def neighbors(self, cell):
+        x, y = cell
+        for dx, dy in DELTAS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                yield (nx, ny)
+
+    def heuristic(self, a, b):
+        """ Distância em passos (Chebyshev) vezes o menor custo de um passo """
+        return max(abs(a[0] - b[0]), abs(a[1] - b[1])) * self.min_step_cost
+
+    def key(self, cell):
+        m = min(self.g.get(cell, INF), self.rhs.get(cell, INF))
+        return (m + self.heuristic(self.start, cell) + self.km, m)
+
+    def __push(self, cell):
+        k = self.key(cell)
+        self.open[cell] = k
+        heapq.heappush(self.heap, (k[0], k[1], cell))
+
+    def __top(self):
+        """ Menor chave válida da fila (descarta as obsoletas) """
+        heap = self.heap
+        while heap:
+            k1, k2, cell = heap[0]
+            if self.open.get(cell) == (k1, k2):
+                return (k1, k2), cell
+            heapq.heappop(heap)
+        return (INF, INF), None
+
+    def update_vertex(self, cell):
+        if cell != self.goal:
+            best = INF
+            g = self.g
+            for n in self.neighbors(cell):
+                gn = g.get(n, INF)
+                if gn < INF:
+                    c = gn + self.step_cost(cell, n)
+                    if c < best:
+                        best = c
+            self.rhs[cell] = best
+        if self.g.get(cell, INF) != self.rhs.get(cell, INF):
+            self.__push(cell)
+        else:
+            self.open.pop(cell, None)
+
+    def compute_shortest_path(self):
+        g = self.g
+        rhs = self.rhs
+        while True:
+            k_old, u = self.__top()
+            start = self.start
+            if u is None or (k_old >= self.key(start) and
+                             rhs.get(start, INF) == g.get(start, INF)):
+                return
+            self.expansions += 1
+            k_new = self.key(u)
+            if k_old < k_new:
+                self.__push(u)
+            elif g.get(u, INF) > rhs.get(u, INF):
+                g[u] = rhs[u]
+                del self.open[u]
+                for p in self.neighbors(u):
+                    self.update_vertex(p)
+            else:
+                g[u] = INF
+                for p in self.neighbors(u):
+                    self.update_vertex(p)
+                self.update_vertex(u)
+
+    def update_cell(self, cell):
+        """ O custo de entrar na célula mudou: só as vizinhas dela são afetadas """
+        for p in self.neighbors(cell):
+            self.update_vertex(p)
+        self.update_vertex(cell)
+
+    def block(self, cell):
+        """ A célula virou parede """
+        self.update_cell(cell)
+
+    def plan(self, start):
+        """
+        Caminho de start até o objetivo com o mapa atual.
+        Retorna a lista de movimentos (dx, dy), vazia se não há caminho.
+        """
+        if start != self.start:
+            self.km += self.heuristic(self.last, start)
+            self.last = start
+            self.start = start
+        self.compute_shortest_path()
+
+        moves = []
+        cell = start
+        g = self.g
+        for _ in range(self.width * self.height):
+            if cell == self.goal:
+                return moves
+            best = INF
+            best_n = None
+            for n in self.neighbors(cell):
+                gn = g.get(n, INF)
+                if gn < INF:
+                    c = gn + self.step_cost(cell, n)
+                    if c < best:
+                        best = c
+                        best_n = n
+            if best_n is None:
+                return []
+            moves.append((best_n[0] - cell[0], best_n[1] - cell[1]))
+            cell = best_n
+        return []
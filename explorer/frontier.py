@@ -0,0 +1,115 @@
+"""
+Conjunto de fronteira para a exploração por fronteiras.
+
+Fronteira: células livres já conhecidas (vistas pelo check_walls_and_lim
+de uma célula visitada) que ainda não foram visitadas. As células ficam em
+baldes quadrados do grid, então a melhor célula perto do agente é achada
+olhando os baldes em anéis a partir do balde do agente, e não o conjunto
+inteiro: um anel só é aberto se alguma célula dele ainda pode ter nota
+melhor que a da melhor já vista.
+"""
+
+
+class FrontierSet:
+    def __init__(self, bucket_size=8):
+        self.bucket_size = bucket_size
+        self.buckets = {}         # (bx, by) -> conjunto de células
+        self.size = 0
+        # por balde: células visitadas e vítimas encontradas nelas, e a
+        # densidade de vítimas em volta (ver victim_density)
+        self.visited = {}
+        self.victims = {}
+        self.density = {}
+
+    def bucket_of(self, cell):
+        return (cell[0] // self.bucket_size, cell[1] // self.bucket_size)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, cell):
+        cells = self.buckets.get(self.bucket_of(cell))
+        return cells is not None and cell in cells
+
+    def add(self, cell):
+        cells = self.buckets.setdefault(self.bucket_of(cell), set())
+        if cell not in cells:
+            cells.add(cell)
+            self.size += 1
+
+    def discard(self, cell):
+        key = self.bucket_of(cell)
+        cells = self.buckets.get(key)
+        if cells is not None and cell in cells:
+            cells.remove(cell)
+            self.size -= 1
+            if not cells:
+                del self.buckets[key]
+
+    def note_visit(self, cell, victim):
+        """
+        Conta uma célula visitada (e se havia vítima) no seu balde e
+        recalcula a densidade dos baldes em volta
+        """
+        bx, by = self.bucket_of(cell)
+        self.visited[(bx, by)] = self.visited.get((bx, by), 0) + 1
+        if victim:
+            self.victims[(bx, by)] = self.victims.get((bx, by), 0) + 1
+        for key in self.__around(bx, by):
+            visited = 0
+            victims = 0
+            for near in self.__around(*key):
+                visited += self.visited.get(near, 0)
+                victims += self.victims.get(near, 0)
+            self.density[key] = victims / visited
+
+    @staticmethod
+    def __around(bx, by):
+        return [(bx + i, by + j) for i in (-1, 0, 1) for j in (-1, 0, 1)]
+
+    def victim_density(self, cell):
+        """
+        Vítimas por célula visitada nos baldes em volta da célula (0 a 1):
+        a estimativa de quantas vítimas a região ainda deve ter.
+        """
+        return self.density.get(self.bucket_of(cell), 0.0)
+
+    def best(self, pos, score, min_step, slack):
+        """
+        Célula da fronteira de menor nota.
+        score(cell): nota de uma célula, que nunca é menor que
+                     min_step * (distância em passos até pos) - slack
+        Retorna a célula, ou None se a fronteira está vazia.
+        """
+        if not self.size:
+            return None
+        bx, by = self.bucket_of(pos)
+        best_cell = None
+        best_score = float("inf")
+        seen = 0
+        ring = 0
+        while seen < self.size:
+            # as células do anel estão a pelo menos (ring - 1) * bucket_size + 1
+            # passos de pos
+            if ring > 0 and min_step * ((ring - 1) * self.bucket_size + 1) - slack > best_score:
+                break
+            if ring == 0:
+                keys = [(bx, by)]
+            else:
+                keys = [(bx + i, by + j) for i in range(-ring, ring + 1)
+                        for j in (-ring, ring)]
+                keys += [(bx + i, by + j) for i in (-ring, ring)
+                         for j in range(-ring + 1, ring)]
+            for key in keys:
+                cells = self.buckets.get(key)
+                if not cells:
+                    continue
+                seen += len(cells)
+                for cell in cells:
+                    s = score(cell)
+                    # desempate pela célula, para não depender da ordem do set
+                    if s < best_score or (s == best_score and cell < best_cell):
+                        best_score = s
+                        best_cell = cell
+            ring += 1
+        return best_cell
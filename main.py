@@ -1,53 +1,124 @@
+import argparse
+
 from vs.environment import Env
 from vs.constants import VS  # <-- Importante para o VS.IDLE
 
 from explorer.Explorer import ExplorerAgent
 from rescuer.Rescuer import RescuerAgent  # <-- 1. IMPORTE A NOVA CLASSE
 
-print("--- Programa Iniciado ---")
-vict_path = "datasets/vict/408v"
-env_path = "datasets/env/94x94_408v"
-env = Env(
-    vict_folder=vict_path,
-    env_folder=env_path
-)
-
-# --- Instancie seus ExplorerAgents ---
-print("Criando exploradores...")
-explorer_1 = ExplorerAgent(env, "explorer/explorer_1.txt")
-explorer_2 = ExplorerAgent(env, "explorer/explorer_2.txt")
-explorer_3 = ExplorerAgent(env, "explorer/explorer_3.txt")
-
-# --- Instancie seus RescuerAgents (Eles começam IDLE) ---
-print("Criando socorristas (inativos)...")
-rescuer_1 = RescuerAgent(env, "rescuer/rescuer_1.txt")
-rescuer_2 = RescuerAgent(env, "rescuer/rescuer_2.txt")
-rescuer_3 = RescuerAgent(env, "rescuer/rescuer_3.txt")
-
-# --- Adicione os agentes ao ambiente ---
-env.add_agent(explorer_1)
-env.add_agent(explorer_2)
-env.add_agent(explorer_3)
-
-# Define o estado inicial dos exploradores como ACTIVE
-explorer_1.set_state(VS.ACTIVE)
-explorer_2.set_state(VS.ACTIVE)
-explorer_3.set_state(VS.ACTIVE)
-
-# <-- 3. DESCOMENTE ESTAS LINHAS
-env.add_agent(rescuer_1)
-env.add_agent(rescuer_2)
-env.add_agent(rescuer_3)
-
-# --- Defina o estado inicial dos socorristas como IDLE ---
-# (O 'phy' só é criado *depois* do add_agent, por isso fazemos aqui)
-# <-- 4. DESCOMENTE ESTAS LINHAS
-rescuer_1.set_state(VS.IDLE)
-rescuer_2.set_state(VS.IDLE)
-rescuer_3.set_state(VS.IDLE)
-
-# --- Inicie a simulação ---
-print("Iniciando simulação...")
-env.run()
-
-print("--- Programa Finalizado ---")
\ No newline at end of file
+# Arquivos de configuração dos agentes
+EXPLORER_CONFIGS = ["explorer/explorer_1.txt",
+                    "explorer/explorer_2.txt",
+                    "explorer/explorer_3.txt"]
+RESCUER_CONFIGS = ["rescuer/rescuer_1.txt",
+                   "rescuer/rescuer_2.txt",
+                   "rescuer/rescuer_3.txt"]
+
+
+def create_agents(env, n_explorers=len(EXPLORER_CONFIGS), overrides=None, strategy="dfs"):
+    """
+    Cria os exploradores (ACTIVE) e os socorristas (IDLE) no ambiente.
+    Com mais exploradores do que arquivos de configuração, os arquivos são
+    reutilizados em ciclo e os nomes seguem EXPLORER_4, EXPLORER_5...
+    Cada explorador recebe um setor em volta da base: com 3 exploradores, a
+    divisão original (norte, sudeste e sudoeste); com outro número, setores
+    iguais. O primeiro explorador é o chefe.
+    overrides: dicionário aplicado sobre a configuração de todos os agentes
+               (ex.: {"TLIM": 800, "COST_DIAG": 1.5})
+    strategy: estratégia de exploração dos exploradores ("dfs" ou "frontier")
+    Retorna (exploradores, socorristas).
+    """
+    overrides = dict(overrides or {})
+
+    # --- Instancie seus ExplorerAgents ---
+    print("Criando exploradores...")
+    explorers = []
+    for i in range(n_explorers):
+        config = EXPLORER_CONFIGS[i % len(EXPLORER_CONFIGS)]
+        ag_overrides = dict(overrides)
+        if i >= len(EXPLORER_CONFIGS):
+            ag_overrides["NAME"] = f"EXPLORER_{i + 1}"
+        explorers.append(ExplorerAgent(env, config, overrides=ag_overrides, strategy=strategy,
+                                        sector=(i, n_explorers)))
+
+    # --- Instancie seus RescuerAgents (Eles começam IDLE) ---
+    print("Criando socorristas (inativos)...")
+    rescuers = [RescuerAgent(env, config, overrides=overrides)
+                for config in RESCUER_CONFIGS]
+
+    # Cada agente já se registra no ambiente ao ser criado (AbstAgent.__init__),
+    # com um único corpo; aqui só se define o estado inicial
+    for explorer in explorers:
+        explorer.set_state(VS.ACTIVE)
+
+    for rescuer in rescuers:
+        rescuer.set_state(VS.IDLE)
+
+    return explorers, rescuers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação de resgate multiagente")
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="executa sem janela (pygame) e sem input() no final; "
+                             "sem a opção vale a chave HEADLESS do env_config.txt")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="semente dos geradores aleatórios (execução reprodutível)")
+    parser.add_argument("--record", metavar="LOG",
+                        help="grava o log binário de ações da execução")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="reexecuta um log gravado, sem deliberação dos agentes")
+    parser.add_argument("--json", metavar="ARQ",
+                        help="grava os resultados (por agente e totais) em JSON")
+    parser.add_argument("--csv", metavar="ARQ",
+                        help="grava os resultados (uma linha por agente e a linha ALL) em CSV")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="mede o tempo de cada turno (deliberate() ou passo de plano) por agente e fase e imprime "
+                             "um resumo no final; sem a opção vale a chave PROFILE do env_config.txt")
+    parser.add_argument("--profile-dump", metavar="ARQ",
+                        help="grava em CSV uma linha por turno de agente (implica --profile)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processos para os deliberate() dos agentes independentes no mesmo "
+                             "ciclo; sem a opção vale a chave WORKERS do env_config.txt. Com N > 1 "
+                             "cada agente sorteia do próprio gerador: com a mesma --seed o resultado "
+                             "não repete o da execução serial")
+    parser.add_argument("--strategy", choices=ExplorerAgent.STRATEGIES, default="dfs",
+                        help="estratégia de exploração: ONLINE-DFS (padrão) ou por fronteiras")
+    args = parser.parse_args()
+
+    print("--- Programa Iniciado ---")
+    vict_path = "datasets/vict/408v"
+    env_path = "datasets/env/94x94_408v"
+    env = Env(
+        vict_folder=vict_path,
+        env_folder=env_path,
+        headless=args.headless,
+        seed=args.seed,
+        profile=args.profile or (True if args.profile_dump else None),
+        workers=args.workers
+    )
+
+    if args.replay:
+        print(f"Reexecutando {args.replay}...")
+        result = env.replay(args.replay)
+    else:
+        create_agents(env, strategy=args.strategy)
+
+        # --- Inicie a simulação ---
+        print("Iniciando simulação...")
+        result = env.run(record=args.record)
+    print(f"Ciclos: {result.cycles}  Tempo de parede: {result.wall_time:.4f}s")
+
+    if args.json:
+        result.write_json(args.json)
+    if args.csv:
+        result.write_csv(args.csv)
+    if args.profile_dump:
+        env.profiler.write_raw(args.profile_dump)
+
+    print("--- Programa Finalizado ---")
+    return result
+
+
+if __name__ == "__main__":
+    main()
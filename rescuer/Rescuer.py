@@ -14,8 +14,13 @@ class RescuerAgent(AbstAgent):
     - Os socorristas não se movem.
     """
 
-    def __init__(self, env, config_file):
-        super().__init__(env, config_file)
+    ROLE = "rescuer"
+
+    # Pasta onde o mestre grava os arquivos cluster_<n>.txt
+    CLUSTERS_DIR = "clusters"
+
+    def __init__(self, env, config_file, overrides=None):
+        super().__init__(env, config_file, overrides)
         
         self.is_master = (self.NAME == "RESCUER_1")
         self.unified_victims = {}
@@ -114,17 +119,23 @@ class RescuerAgent(AbstAgent):
                 self.run_clustering_and_assignment()
                 self.clustering_done = True
                 self.internal_state = "DONE"
+                # acorda os socorristas que esperam a atribuição (mesmo sem clusters)
+                self.notify(VS.EV_ASSIGNMENT)
             
             if self.internal_state == "DONE" or self.internal_state == "ASSIGNED":
                 return False 
             
+            # Espera o chefe entregar os mapas unificados
+            self.wait_for(VS.EV_MAPS_UNIFIED)
             return True
 
         else: # Socorristas não-mestres
             if self.internal_state == "ASSIGNED" or self.internal_state == "DONE":
                 return False 
             
-            return True # Continua ativo, esperando a atribuição
+            # Continua ativo, bloqueado até o mestre distribuir os clusters
+            self.wait_for(VS.EV_ASSIGNMENT)
+            return True
 
 
     def run_clustering_and_assignment(self):
@@ -166,7 +177,9 @@ class RescuerAgent(AbstAgent):
 
         X = np.array(victim_data_points)
         
-        num_rescuers = 3
+        # Um cluster por socorrista, na ordem em que foram criados
+        rescuers = self.get_env().get_agents(RescuerAgent.ROLE)
+        num_rescuers = len(rescuers)
         n_clusters = min(num_rescuers, len(X)) 
         
         if n_clusters <= 0:
@@ -183,17 +196,8 @@ class RescuerAgent(AbstAgent):
             victim_id = victim_ids_in_order[i]
             clusters[label].append(victim_details_map[victim_id])
 
-        # Encontrar os socorristas
-        rescuers_minds = {}
-        for phy in self.get_env().agents:
-            if "RESCUER" in phy.mind.NAME:
-                mind = phy.mind
-                if mind.NAME == "RESCUER_1": rescuers_minds['1'] = mind
-                if mind.NAME == "RESCUER_2": rescuers_minds['2'] = mind
-                if mind.NAME == "RESCUER_3": rescuers_minds['3'] = mind
-        
         # Salvar arquivos
-        output_dir = "clusters"
+        output_dir = self.CLUSTERS_DIR
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
@@ -215,10 +219,5 @@ class RescuerAgent(AbstAgent):
             
             print(f"--- {self.NAME} (Mestre): Cluster {cluster_index + 1} salvo em {file_name} ({len(victim_list)} vítimas).")
 
-            rescuer_num_str = str(cluster_index + 1)
             assignment_data = [v['raw_data'] for v in victim_list_sorted]
-            
-            if rescuer_num_str in rescuers_minds:
-                rescuers_minds[rescuer_num_str].receive_assignment(assignment_data)
-            else:
-                print(f"AVISO: Socorrista {rescuer_num_str} não encontrado para atribuição.")
+            rescuers[cluster_index].mind.receive_assignment(assignment_data)
@@ -0,0 +1,153 @@
+"""
+Varredura de cenários em lote.
+
+Executa a simulação em modo headless para todas as combinações de
+(dataset, seed, overrides de TLIM/COST_*, número de exploradores,
+estratégia de exploração) usando
+um pool de processos, e grava uma linha de resultado por execução (CSV ou
+JSONL, conforme a extensão do arquivo de saída) à medida que terminam.
+
+Exemplo:
+    python sweep.py --dataset datasets/env/94x94_408v datasets/vict/408v \\
+        --seeds 0 1 2 3 --set TLIM=800,1000 --set COST_DIAG=1.5,2.0 \\
+        --explorers 3 4 --strategies dfs frontier --workers 4 --out sweep.csv
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from vs.environment import Env
+from vs.constants import VS
+
+DEFAULT_DATASET = ("datasets/env/94x94_408v", "datasets/vict/408v")
+SWEEPABLE_KEYWORDS = ("TLIM", "COST_LINE", "COST_DIAG", "COST_READ", "COST_FIRST_AID")
+
+# colunas fixas de cada linha de resultado
+RESULT_FIELDS = ["cycles", "wall_time",
+                 "Ve0", "Ve1", "Ve2", "Ve3", "Ve", "Veg", "sobr_e", "pct_sobr_e",
+                 "Vs0", "Vs1", "Vs2", "Vs3", "Vs", "Vsg", "sobr_s", "pct_sobr_s",
+                 "coverage", "consumed", "consumed_max", "dead", "error"]
+
+
+def parse_set(text):
+    """ 'TLIM=800,1000' -> ('TLIM', [800.0, 1000.0]) """
+    key, _, values = text.partition("=")
+    key = key.strip()
+    if key not in SWEEPABLE_KEYWORDS or not values:
+        raise argparse.ArgumentTypeError(
+            f"esperado KEY=v1,v2,... com KEY em {', '.join(SWEEPABLE_KEYWORDS)}")
+    return key, [float(v) for v in values.split(",")]
+
+
+def build_runs(datasets, seeds, params, explorers, strategies=("dfs",)):
+    """ Produto cartesiano da grade: uma lista de dicionários, um por execução """
+    keys = [key for key, _ in params]
+    runs = []
+    for (env_folder, vict_folder), seed, values, n_explorers, strategy in itertools.product(
+            datasets, seeds, itertools.product(*[v for _, v in params]), explorers, strategies):
+        runs.append({"run": len(runs), "env": env_folder, "vict": vict_folder,
+                     "seed": seed, "explorers": n_explorers, "strategy": strategy,
+                     "overrides": dict(zip(keys, values))})
+    return runs
+
+
+def _init_worker(clusters_root):
+    """ Cada processo grava os clusters do socorrista mestre numa pasta
+    própria dentro de clusters_root, para as execuções paralelas não
+    apagarem os arquivos umas das outras """
+    from rescuer.Rescuer import RescuerAgent
+    RescuerAgent.CLUSTERS_DIR = tempfile.mkdtemp(prefix="worker_", dir=clusters_root)
+
+
+def run_one(run):
+    """ Executa uma simulação headless e devolve a linha de resultado """
+    from main import create_agents
+
+    row = {"run": run["run"], "env": run["env"], "vict": run["vict"],
+           "seed": run["seed"], "explorers": run["explorers"], "strategy": run["strategy"]}
+    row.update(run["overrides"])
+    row["error"] = ""
+
+    start = time.perf_counter()
+    try:
+        # a simulação imprime muito; em lote a saída é descartada
+        with contextlib.redirect_stdout(io.StringIO()):
+            env = Env(run["vict"], run["env"], headless=True, seed=run["seed"])
+            create_agents(env, run["explorers"], run["overrides"], run["strategy"])
+            result = env.run()
+    except Exception as e:
+        row["error"] = repr(e)
+        row["wall_time"] = time.perf_counter() - start
+        return row
+
+    totals = result.to_row()
+    for field in RESULT_FIELDS:
+        if field in totals:
+            row[field] = totals[field]
+    row["wall_time"] = time.perf_counter() - start
+    row["consumed_max"] = max((ag.consumed for ag in result.agents), default=0.0)
+    row["dead"] = sum(1 for ag in result.agents if ag.state == VS.DEAD)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura de cenários em lote (headless)")
+    parser.add_argument("--dataset", nargs=2, action="append", metavar=("ENV_FOLDER", "VICT_FOLDER"),
+                        help="pasta do ambiente e pasta dos sinais vitais (repetível)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0],
+                        help="sementes do gerador aleatório")
+    parser.add_argument("--set", dest="params", action="append", type=parse_set, default=[],
+                        metavar="KEY=v1,v2", help="valores de TLIM/COST_* para todos os agentes (repetível)")
+    parser.add_argument("--explorers", nargs="+", type=int, default=[3],
+                        help="números de exploradores")
+    parser.add_argument("--strategies", nargs="+", choices=("dfs", "frontier"), default=["dfs"],
+                        help="estratégias de exploração dos exploradores")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processos em paralelo")
+    parser.add_argument("--out", default="sweep.csv",
+                        help="arquivo de saída (.csv ou .jsonl)")
+    args = parser.parse_args()
+
+    datasets = args.dataset or [DEFAULT_DATASET]
+    runs = build_runs(datasets, args.seeds, args.params, args.explorers, args.strategies)
+    keys = [key for key, _ in args.params]
+    fields = ["run", "env", "vict", "seed", "explorers", "strategy"] + keys + RESULT_FIELDS
+    jsonl = args.out.endswith(".jsonl")
+
+    print(f"{len(runs)} execuções em {args.workers} processos -> {args.out}")
+    start = time.perf_counter()
+    # as pastas dos processos ficam numa pasta temporária apagada no fim
+    # (depois do pool, que é encerrado antes ao sair do with)
+    with tempfile.TemporaryDirectory(prefix="sweep_clusters_") as clusters_root, \
+            open(args.out, "w", newline="") as out, \
+            multiprocessing.Pool(args.workers, initializer=_init_worker,
+                                 initargs=(clusters_root,)) as pool:
+        writer = None
+        if not jsonl:
+            writer = csv.DictWriter(out, fieldnames=fields, restval="")
+            writer.writeheader()
+
+        for done, row in enumerate(pool.imap_unordered(run_one, runs), start=1):
+            if jsonl:
+                out.write(json.dumps(row) + "\n")
+            else:
+                writer.writerow(row)
+            out.flush()
+
+            status = f"ERRO {row['error']}" if row["error"] else f"Ve={row['Ve']} Vs={row['Vs']}"
+            print(f"[{done}/{len(runs)}] run {row['run']} seed {row['seed']}: {status} "
+                  f"({row['wall_time']:.2f}s)")
+
+    print(f"Varredura concluída em {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
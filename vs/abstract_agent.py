@@ -4,6 +4,7 @@
      the environment """
 
 import os
+import random
 from abc import ABC, abstractmethod
 from .constants import VS
 
@@ -25,12 +26,22 @@ class AbstAgent(ABC):
         7: (-1, -1)  # ul: Up left diagonal
     }
 
-    def __init__(self, env, config_file):
+    # Role of the agent in the team (e.g. "explorer", "rescuer"); the
+    # environment indexes the agents by it (see Env.get_agents)
+    ROLE = ""
+
+    # Keywords of the config file (they are also the attribute names)
+    CONFIG_KEYWORDS = ("NAME", "COLOR", "TRACE_COLOR", "TLIM", "COST_LINE",
+                       "COST_DIAG", "COST_READ", "COST_FIRST_AID")
+
+    def __init__(self, env, config_file, overrides=None):
         """
         Any class that inherits from this one will have these attributes
         available.
         @param env referencia o ambiente
         @param config_file: the absolute path to the agent's config file
+        @param overrides: optional dict keyword -> value that replaces the
+        values read from the config file (e.g. {"TLIM": 500.0})
         """
         self.NAME = ""     # public: the name of the agent
         self.TLIM = 0.0    # public: time limit to execute (cannot be exceeded)
@@ -40,6 +51,9 @@ class AbstAgent(ABC):
         self.COST_FIRST_AID = 0.0   # public: basic cost to drop the first aid package to a victim
         self.COLOR = (100, 100, 100)       # public: color of the agent
         self.TRACE_COLOR = (140, 140, 140) # public: color for the visited cells
+        self.rng = random           # public: source of random numbers; the
+                                    # environment gives each agent its own
+                                    # generator in parallel runs
         self.__env = env            # private - ref. to the environment
         self.__phy = None           # private - ref. to the physical part of 
                                     # the agent in the env
@@ -79,6 +93,13 @@ class AbstAgent(ABC):
                 elif keyword == "COST_READ":
                     self.COST_READ = float(words[1])
 
+        # Values given by the caller prevail over the config file
+        if overrides:
+            for keyword, value in overrides.items():
+                if keyword not in self.CONFIG_KEYWORDS:
+                    raise ValueError(f"unknown agent config keyword: {keyword}")
+                setattr(self, keyword, value)
+
         # Register the agent within the environment
         self.__phy = env.add_agent(self)
 
@@ -93,6 +114,17 @@ class AbstAgent(ABC):
 
         pass
 
+    def deliberates_alone(self) -> bool:
+        """ The simulator calls this method before deliberate when it runs
+        the agents in parallel (Env(workers=...)). Return True only when the
+        next deliberate reads and writes nothing but the agent's own data
+        and body: no other agent, no events (wait_for, notify, set_state)
+        and random numbers only from self.rng. The simulator may then run it
+        in a worker process, at the same time as the deliberations of other
+        such agents, so the data of the agent must be picklable.
+        @return False by default: deliberate runs alone, in agent order """
+        return False
+
     # The public methods below, you may use when programming your agent
     def get_rtime(self):
         """ Public method for getting the agent remaining battery time
@@ -108,6 +140,20 @@ class AbstAgent(ABC):
         """ This protected method allows the environment to change
         the state of the agent"""
         self.__phy._state = value
+        if value == VS.ENDED or value == VS.DEAD:
+            self.__env.notify(VS.EV_AGENT_TERMINATED)
+
+    def wait_for(self, event):
+        """ Public method for blocking the agent until event is notified:
+        meanwhile, the simulator does not call deliberate. Call it from
+        deliberate instead of returning True over and over while waiting.
+        @param event: a VS.EV_* constant or any other hashable value """
+        self.__env.block(self.__phy, event)
+
+    def notify(self, event):
+        """ Public method for waking up all the agents waiting for event
+        @return: the number of agents woken up """
+        return self.__env.notify(event)
 
     def get_env(self):
         """ This protected method allows the environment to change
@@ -126,6 +172,26 @@ class AbstAgent(ABC):
         In every case, action's executing time is discounted from time limit"""
         return self.__phy._walk(dx, dy)
 
+    def walk_plan(self, moves, min_rtime=None):
+        """ Public method for walking a sequence of moves with the same cost
+        and bump rules of walk, one move per cycle. The first move is walked
+        now; the simulator walks the next ones in the following cycles
+        without calling deliberate, which is called again only after the
+        cycle of the last move, of a move that does not return VS.EXECUTED,
+        or of the move that leaves less than min_rtime of battery.
+        @param moves: a non-empty list of (dx, dy)
+        @param min_rtime: optional remaining time under which the plan stops
+        @returns the result of the first walk (see walk); plan_outcome tells
+        how the whole plan ended """
+        return self.__phy._start_plan(moves, min_rtime)
+
+    def plan_outcome(self):
+        """ Public method for checking how the last plan ended
+        @returns a tuple (result, moves_left): the result of the last walk of
+        the plan (VS.EXECUTED if it was not interrupted by a bump or by the
+        time limit) and the list of moves that were not tried """
+        return self.__phy._plan_result, self.__phy._plan_left
+
     def check_walls_and_lim(self):
         """ Public method for checking walls and the grid limits in the
         neighborhood of the current position of the agent.
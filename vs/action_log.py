@@ -0,0 +1,122 @@
+""" ACTION LOG
+    Compact binary record of every action that changes the environment:
+    walk, read_vital_signals and first_aid, with their outcomes. Replaying a
+    log re-drives the physical agents without calling any deliberate(), so
+    the final metrics are identical to the recorded run.
+
+    File layout: MAGIC, a little-endian uint32 with the size of a JSON
+    header (agents, folders, seed, final states) and the header itself,
+    followed by fixed-size records (cycle, agent, op, dx, dy, result). """
+
+import json
+import struct
+from .constants import VS
+
+MAGIC = b"VSLOG\x01"
+VERSION = 1
+
+# operations
+OP_WALK = 0
+OP_READ = 1
+OP_FIRST_AID = 2
+
+# cycle (uint32), agent index (uint16), op (uint8), dx, dy, result (int8)
+RECORD = struct.Struct("<IHBbbb")
+HEADER_SIZE = struct.Struct("<I")
+
+
+class ReplayMind:
+    """ Stands for the mind of a recorded agent: it has the attributes the
+    PhysAgent reads (name, costs, colors), but it never deliberates """
+
+    def __init__(self, info):
+        self.NAME = info["NAME"]
+        self.ROLE = info.get("ROLE", "")
+        self.TLIM = info["TLIM"]
+        self.COST_LINE = info["COST_LINE"]
+        self.COST_DIAG = info["COST_DIAG"]
+        self.COST_READ = info["COST_READ"]
+        self.COST_FIRST_AID = info["COST_FIRST_AID"]
+        self.COLOR = tuple(info["COLOR"])
+        self.TRACE_COLOR = tuple(info["TRACE_COLOR"])
+
+
+class ActionRecorder:
+    """ Accumulates the records of a run in memory """
+
+    def __init__(self, env, seed=None):
+        """ @param env: the recorded environment
+        @param seed: seed of the run, kept in the header for reference """
+        self.env = env
+        self.seed = seed
+        self.data = bytearray()
+
+    def record(self, idx, op, dx, dy, result):
+        """ Appends one action executed by agent idx in the current cycle
+        @param result: the outcome, coded as an int between -128 and 127 """
+        self.data += RECORD.pack(self.env.cycle, idx, op, dx, dy, result)
+
+    def __len__(self):
+        return len(self.data) // RECORD.size
+
+    def save(self, path):
+        """ Writes the header (with the current state of the agents as the
+        final states) and the records to path """
+        env = self.env
+        agents = []
+        for phy in env.agents:
+            mind = phy.mind
+            agents.append({"NAME": mind.NAME, "ROLE": getattr(mind, "ROLE", ""),
+                           "TLIM": mind.TLIM,
+                           "COST_LINE": mind.COST_LINE, "COST_DIAG": mind.COST_DIAG,
+                           "COST_READ": mind.COST_READ,
+                           "COST_FIRST_AID": mind.COST_FIRST_AID,
+                           "COLOR": list(mind.COLOR),
+                           "TRACE_COLOR": list(mind.TRACE_COLOR),
+                           "final_state": phy._state})
+
+        header = {"version": VERSION, "env_folder": env.env_folder,
+                  "vict_folder": env.vict_folder, "seed": self.seed,
+                  "grid": [env.width, env.height],
+                  "nb_of_victims": env.nb_of_victims,
+                  "cycles": env.cycle, "records": len(self), "agents": agents}
+        raw = json.dumps(header).encode("utf-8")
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(HEADER_SIZE.pack(len(raw)))
+            f.write(raw)
+            f.write(self.data)
+
+
+def load(path):
+    """ Reads an action log
+    @return a tuple (header dict, records bytes) """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an action log")
+        size, = HEADER_SIZE.unpack(f.read(HEADER_SIZE.size))
+        header = json.loads(f.read(size).decode("utf-8"))
+        data = f.read()
+
+    if header["version"] != VERSION:
+        raise ValueError(f"{path}: unsupported action log version {header['version']}")
+    if len(data) % RECORD.size != 0:
+        raise ValueError(f"{path}: truncated action log")
+    return header, data
+
+
+def encode_read(result):
+    """ Outcome of _read_vital_signals as an int: VS.TIME_EXCEEDED, 0 for
+    no victim, 1 for a successful reading """
+    if result == VS.TIME_EXCEEDED:
+        return VS.TIME_EXCEEDED
+    return 1 if result else 0
+
+
+def encode_first_aid(result):
+    """ Outcome of _first_aid as an int: VS.TIME_EXCEEDED, 0 for no victim,
+    1 for a delivered package """
+    if result == VS.TIME_EXCEEDED:
+        return VS.TIME_EXCEEDED
+    return 1 if result else 0
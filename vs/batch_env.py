@@ -0,0 +1,273 @@
+""" BATCH ENVIRONMENT
+    Many independent copies of one environment, stepped in lockstep. Each
+    copy has the same agents (same base, same grid and victims) and every
+    action is computed for all the agents of all the copies with a handful
+    of NumPy operations, following the rules of PhysAgent: the same costs,
+    the same bump and time limit outcomes and the same DEAD rule of the
+    engine. It has no minds: the caller decides the actions of every agent
+    (e.g. a vectorized strategy or a learned policy) and calls end_cycle
+    once per reasoning cycle.
+
+    Agent arrays have shape (n_envs, n_agents); cell arrays are indexed by
+    [x, y] like Env.obst. """
+
+import numpy as np
+from .constants import VS
+
+# deltas of check_walls_and_lim, in the order of AbstAgent.AC_INCR
+DELTAS = np.array([(0, -1), (1, -1), (1, 0), (1, 1),
+                   (0, 1), (-1, 1), (-1, 0), (-1, -1)])
+
+
+class BatchEnv:
+    def __init__(self, env, n_envs, n_agents=1, tlim=1000.0, cost_line=1.0,
+                 cost_diag=1.5, cost_read=2.0, cost_first_aid=1.0, track_visited=True):
+        """ @param env: the Env whose grid and victims are copied
+        @param n_envs: number of copies
+        @param n_agents: number of agents in each copy
+        @param tlim, cost_*: the agents' parameters, scalars or arrays that
+        broadcast to (n_envs, n_agents), so every copy may use different
+        ones
+        @param track_visited: False does not keep the visited cells (visited
+        is None); marking them is about half of the time of a walk """
+        self.env = env
+        self.n_envs = n_envs
+        self.n_agents = n_agents
+        self.shape = (n_envs, n_agents)
+        self.width = env.width
+        self.height = env.height
+        self.base = tuple(env.dic["BASE"])
+        self.nb_of_victims = env.nb_of_victims
+        n = n_envs * n_agents
+
+        def param(value):
+            return np.broadcast_to(np.asarray(value, dtype=np.float64), self.shape).ravel().copy()
+
+        self.tlim = param(tlim)
+        self.cost_line = param(cost_line)
+        self.cost_diag = param(cost_diag)
+        self.cost_read = param(cost_read)
+        self.cost_first_aid = param(cost_first_aid)
+
+        # base cost of a walk of each agent: __costs[__cost_at + diagonal]
+        self.__costs = np.column_stack((self.cost_line, self.cost_diag)).ravel()
+        self.__cost_at = np.arange(0, 2 * n, 2)
+
+        # grid padded with one cell on each side, flattened: neighbours of
+        # any cell of the grid are valid indexes, without bound checks
+        self.__pad_h = self.height + 2
+        pad = (self.width + 2, self.height + 2)
+        passable = np.zeros(pad, dtype=bool)
+        passable[1:-1, 1:-1] = env.passable
+        self.__passable = passable.ravel()
+        obst = np.ones(pad, dtype=np.float64)
+        obst[1:-1, 1:-1] = env.obst
+        self.__obst = obst.ravel()
+        walls = np.full(pad, VS.END, dtype=np.int8)
+        walls[1:-1, 1:-1] = np.where(env.passable, VS.CLEAR, VS.WALL)
+        self.__walls = walls.ravel()
+        self.__deltas = DELTAS[:, 0] * self.__pad_h + DELTAS[:, 1]
+
+        # id of the victim in each cell (the first one of env_victims.txt,
+        # as in Env.victim_index), VS.NO_VICTIM elsewhere
+        victim_at = np.full((self.width, self.height), VS.NO_VICTIM, dtype=np.int64)
+        for (vx, vy), vid in env.victim_index.items():
+            victim_at[vx, vy] = vid
+        self.__victim_at = victim_at.ravel()
+
+        # agent state, flat (n_envs * n_agents) arrays
+        self._x = np.empty(n, dtype=np.int64)
+        self._y = np.empty(n, dtype=np.int64)
+        self._rtime = np.empty(n, dtype=np.float64)
+        self._state = np.empty(n, dtype=np.int8)
+        self.__scratch = (np.empty(n, dtype=np.int64), np.empty(n, dtype=np.int64),
+                          np.empty(n, dtype=np.int64), np.empty(n, dtype=np.float64),
+                          np.empty(n, dtype=bool), np.empty(n, dtype=bool),
+                          np.empty(n, dtype=bool))
+
+        # visited cells per agent, found/saved victims per agent
+        self.visited = None
+        if track_visited:
+            self.visited = np.zeros((n_envs, n_agents, self.width, self.height), dtype=bool)
+        self.found = np.zeros((n_envs, n_agents, self.nb_of_victims), dtype=bool)
+        self.saved = np.zeros((n_envs, n_agents, self.nb_of_victims), dtype=bool)
+        self.__visited = None if self.visited is None else self.visited.reshape(n, -1)
+        self.__found = self.found.reshape(n, -1)
+        self.__saved = self.saved.reshape(n, -1)
+        self.cycle = 0
+        self.reset()
+
+    @classmethod
+    def like(cls, env, n_envs):
+        """ Creates a batch whose agents have the parameters of the agents
+        already added to env (one batch agent per env agent) """
+        minds = [phy.mind for phy in env.agents]
+        params = {key: [getattr(m, attr) for m in minds]
+                  for key, attr in (("tlim", "TLIM"), ("cost_line", "COST_LINE"),
+                                    ("cost_diag", "COST_DIAG"), ("cost_read", "COST_READ"),
+                                    ("cost_first_aid", "COST_FIRST_AID"))}
+        return cls(env, n_envs, len(minds), **params)
+
+    def reset(self, mask=None):
+        """ Puts the agents back at the base with a full battery, ACTIVE,
+        with no visited cells and no found or saved victims
+        @param mask: optional bool array (n_envs,) of the copies to reset """
+        if mask is None:
+            sel = slice(None)
+            self.cycle = 0
+        else:
+            sel = np.repeat(np.asarray(mask, dtype=bool), self.n_agents)
+        self._x[sel] = self.base[0]
+        self._y[sel] = self.base[1]
+        self._rtime[sel] = self.tlim[sel]
+        self._state[sel] = VS.ACTIVE
+        if self.__visited is not None:
+            self.__visited[sel] = False
+        self.__found[sel] = False
+        self.__saved[sel] = False
+
+    # views (n_envs, n_agents) of the agent state
+    @property
+    def x(self):
+        return self._x.reshape(self.shape)
+
+    @property
+    def y(self):
+        return self._y.reshape(self.shape)
+
+    @property
+    def rtime(self):
+        return self._rtime.reshape(self.shape)
+
+    @property
+    def state(self):
+        return self._state.reshape(self.shape)
+
+    def __acting(self, mask):
+        """ Flat bool array of the ACTIVE agents selected by mask """
+        acting = self._state == VS.ACTIVE
+        if mask is not None:
+            acting &= np.broadcast_to(mask, self.shape).ravel()
+        return acting
+
+    def walk(self, dx, dy, mask=None):
+        """ Every ACTIVE agent (selected by mask, if given) walks one cell,
+        as PhysAgent._walk
+        @param dx, dy: int arrays that broadcast to (n_envs, n_agents) with
+        values in -1, 0, 1
+        @param mask: optional bool array (n_envs, n_agents)
+        @return int8 array (n_envs, n_agents): VS.EXECUTED, VS.BUMPED,
+        VS.TIME_EXCEEDED, or 0 for the agents that did not walk """
+        dx = np.broadcast_to(dx, self.shape).ravel()
+        dy = np.broadcast_to(dy, self.shape).ravel()
+        acting = self.__acting(mask)
+        # scratch buffers: big temporaries cost more than the arithmetic
+        nx, ny, cell, cost, diag, free, moved = self.__scratch
+
+        # computed for every agent, applied only to the acting ones
+        np.multiply(dx, dy, out=cell)
+        np.not_equal(cell, 0, out=diag)
+        np.add(self.__cost_at, diag, out=cell)
+        np.take(self.__costs, cell, out=cost)
+        np.add(self._x, dx, out=nx)
+        np.add(self._y, dy, out=ny)
+        np.multiply(nx, self.__pad_h, out=cell)
+        cell += ny
+        cell += self.__pad_h + 1
+        np.take(self.__passable, cell, out=free)
+
+        # entering a cell costs base * obstacle factor; bumping costs base
+        np.multiply(cost, self.__obst.take(cell), out=cost, where=free)
+        np.subtract(self._rtime, cost, out=self._rtime, where=acting)
+
+        np.greater_equal(self._rtime, 0, out=moved)
+        moved &= free
+        moved &= acting
+        mover = np.flatnonzero(moved)
+        result = np.where(free, np.int8(VS.TIME_EXCEEDED), np.int8(VS.BUMPED))
+        result[mover] = VS.EXECUTED
+        result *= acting
+
+        nx = nx[mover]
+        ny = ny[mover]
+        self._x[mover] = nx
+        self._y[mover] = ny
+        if self.__visited is not None:
+            self.__visited[mover, nx * self.height + ny] = True
+        return result.reshape(self.shape)
+
+    def check_walls_and_lim(self):
+        """ The neighbourhood of every agent, as PhysAgent._check_walls_and_lim
+        @return int8 array (n_envs, n_agents, 8) of VS.CLEAR, VS.WALL, VS.END """
+        cell = (self._x + 1) * self.__pad_h + (self._y + 1)
+        return self.__walls[cell[:, None] + self.__deltas].reshape(self.shape + (8,))
+
+    def check_for_victim(self):
+        """ @return int array (n_envs, n_agents) with the id of the victim at
+        the position of each agent, or VS.NO_VICTIM """
+        return self.__victim_at[self._x * self.height + self._y].reshape(self.shape)
+
+    def __victim_action(self, cost, marks, mask):
+        """ Reading and first aid: consume the cost; without time the
+        result is VS.TIME_EXCEEDED, otherwise the victim (if any) is marked """
+        idx = np.flatnonzero(self.__acting(mask))
+        result = np.zeros(self._x.size, dtype=np.int8)
+        vids = np.full(self._x.size, VS.NO_VICTIM, dtype=np.int64)
+
+        rtime = self._rtime[idx] - cost[idx]
+        self._rtime[idx] = rtime
+        vid = self.__victim_at[self._x[idx] * self.height + self._y[idx]]
+        alive = rtime >= 0
+        hit = alive & (vid != VS.NO_VICTIM)
+        result[idx] = np.where(alive, hit, VS.TIME_EXCEEDED)
+        vids[idx[hit]] = vid[hit]
+        marks[idx[hit], vid[hit]] = True
+        return result.reshape(self.shape), vids.reshape(self.shape)
+
+    def read_vital_signals(self, mask=None):
+        """ Every ACTIVE agent (selected by mask) reads the vital signals at
+        its position, as PhysAgent._read_vital_signals
+        @return a tuple (result, vids) of (n_envs, n_agents) arrays: result is
+        VS.TIME_EXCEEDED, 1 when a victim was read, 0 when there is no victim
+        (or the agent did not act); vids holds the id of the victim read, or
+        VS.NO_VICTIM. The signals are env.signals[vid] without the last two """
+        return self.__victim_action(self.cost_read, self.__found, mask)
+
+    def first_aid(self, mask=None):
+        """ Every ACTIVE agent (selected by mask) drops a first aid package,
+        as PhysAgent._first_aid
+        @return a tuple (result, vids), as in read_vital_signals """
+        return self.__victim_action(self.cost_first_aid, self.__saved, mask)
+
+    def finish(self, mask):
+        """ The selected ACTIVE agents have no more actions to do: they end
+        at the base or die elsewhere, as in Env
+        @param mask: bool array that broadcasts to (n_envs, n_agents) """
+        sel = self.__acting(mask)
+        at_base = (self._x == self.base[0]) & (self._y == self.base[1])
+        self._state[sel & at_base] = VS.ENDED
+        self._state[sel & ~at_base] = VS.DEAD
+
+    def end_cycle(self):
+        """ Closes a reasoning cycle: ACTIVE agents without battery die,
+        as in Env
+        @return bool array (n_envs,): True for the copies that still have
+        ACTIVE agents """
+        self._state[(self._state == VS.ACTIVE) & (self._rtime < 0)] = VS.DEAD
+        self.cycle += 1
+        return (self.state == VS.ACTIVE).any(axis=1)
+
+    def coverage(self):
+        """ @return int array (n_envs, n_agents) of visited cells (needs
+        track_visited) """
+        return self.visited.sum(axis=(2, 3))
+
+    def found_by_any(self):
+        """ @return bool array (n_envs, nb_of_victims) of victims found in
+        each copy """
+        return self.found.any(axis=1)
+
+    def saved_by_any(self):
+        """ @return bool array (n_envs, nb_of_victims) of victims saved in
+        each copy """
+        return self.saved.any(axis=1)
@@ -11,6 +11,12 @@ class VS:
     IDLE = 0    # not active, but alive
     DEAD = -1   # fatal error
 
+    # Events agents can wait for (see AbstAgent.wait_for); agents may also
+    # define their own (any hashable value)
+    EV_AGENT_TERMINATED = "agent_terminated"  # an agent got ENDED or DEAD
+    EV_MAPS_UNIFIED = "maps_unified"          # the chief explorer delivered the unified maps
+    EV_ASSIGNMENT = "assignment"              # the master rescuer distributed the clusters
+
     # Possible results for the walk action
     BUMPED = -1         # agent bumped into a wall or the end of the grid
     TIME_EXCEEDED = -2  # agent reached the time limit - no more battery
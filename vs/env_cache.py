@@ -0,0 +1,185 @@
+""" ENVIRONMENT CACHE
+    Pre-parsed binary copy of an environment: the obstacle array, the
+    victims' coordinates and the vital signals matrix. The first run on a
+    pair (env folder, vict folder) parses the text files once and writes
+    one .npy file per array plus a small JSON header into
+    <env_folder>/.envcache/<key>/, where key is a hash of the contents of
+    the source files. The following runs load the arrays with memory
+    mapping, so sweeps do not re-parse the same files in every worker.
+    Editing any source file changes the key, so a stale cache is never
+    read. """
+
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from .constants import VS
+
+VERSION = 1
+CACHE_DIR = ".envcache"
+
+# columns of data.csv, and which of them are integers and floats
+DATA_COLUMNS = ["idade", "fc", "fr", "pas", "spo2", "temp", "pr", "sg", "fx",
+                "queim", "gcs", "avpu", "tri", "sobr"]
+INT_COLUMNS = ["idade", "fc", "fr", "pas", "spo2", "pr", "sg", "fx", "queim",
+               "gcs", "avpu", "tri"]
+FLOAT_COLUMNS = ["temp", "sobr"]
+# order of the fields of each row of Env.signals
+SIGNAL_FIELDS = ["vid", "idade", "fc", "fr", "pas", "spo2", "temp", "pr", "sg",
+                 "fx", "queim", "gcs", "avpu", "tri", "sobr"]
+
+
+class EnvData:
+    """ The parsed contents of an environment """
+
+    def __init__(self, obst, max_obst, victims, signals_int, signals_float, sum_sobr):
+        self.obst = obst                    # float32 (width, height), walls = VS.OBST_WALL
+        self.max_obst = max_obst            # greatest obstacle value that is not a wall
+        self.victims = victims              # int (nb_of_victims, 2): x, y
+        self.signals_int = signals_int      # int (n, 13): vid + INT_COLUMNS
+        self.signals_float = signals_float  # float (n, 2): FLOAT_COLUMNS
+        self.sum_sobr = sum_sobr            # sum of sobr of all victims
+
+    def signal_rows(self):
+        """ @return the vital signals as lists in the order of SIGNAL_FIELDS,
+        ints and floats as if each field had been cast by int()/float() """
+        cols = self.signals_int.T.tolist()
+        temp, sobr = self.signals_float.T.tolist()
+        return [list(row) for row in zip(*cols[:6], temp, *cols[6:], sobr)]
+
+
+def source_files(env_folder, vict_folder):
+    return [os.path.join(env_folder, "env_config.txt"),
+            os.path.join(env_folder, "env_obst.txt"),
+            os.path.join(env_folder, "env_victims.txt"),
+            os.path.join(vict_folder, "data.csv")]
+
+
+def source_key(env_folder, vict_folder):
+    """ @return a hash of the contents of the source files """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"envcache-{VERSION}".encode())
+    for path in source_files(env_folder, vict_folder):
+        with open(path, "rb") as f:
+            content = f.read()
+        h.update(len(content).to_bytes(8, "little"))
+        h.update(content)
+    return h.hexdigest()
+
+
+def _load_rows(path, ncols, skiprows=0):
+    """ Reads a comma separated file of numbers as a float64 (rows, ncols)
+    array, also when the file has no rows """
+    rows = np.loadtxt(path, delimiter=",", skiprows=skiprows, ndmin=2)
+    if rows.size == 0:
+        return np.empty((0, ncols))
+    return rows
+
+
+def compile_env(env_folder, vict_folder, width, height):
+    """ Parses the text files of an environment
+    @return an EnvData """
+
+    # Set up the obstacles - it's a float32 array indexed by [x, y]
+    # 1 means that there is no obstacle - it is a regular terrain
+    obst = np.full((width, height), VS.OBST_NONE, dtype=np.float32)
+    max_obst = 1
+
+    # each row is x,y,obst
+    rows = _load_rows(os.path.join(env_folder, "env_obst.txt"), 3)
+    if rows.size > 0:
+        xs = rows[:, 0].astype(np.intp)
+        ys = rows[:, 1].astype(np.intp)
+        # absolute multiplying factor representing the degree of
+        # difficulty/facility for the agent to enter the cell
+        # values ]0, 1[ means a descent; 1 = VS.OBST_NONE;
+        # ]1, 100[ = ascent; 100 = VS.OBST_WALL
+        values = rows[:, 2]
+        values[values > 100] = VS.OBST_WALL   # wall
+        values[values <= 0] = VS.OBST_NONE    # no obstacle
+
+        not_wall = values[values != VS.OBST_WALL]
+        if not_wall.size > 0:
+            max_obst = max(max_obst, float(not_wall.max()))
+
+        obst[xs, ys] = values
+
+    # each row is x,y
+    victims = _load_rows(os.path.join(env_folder, "env_victims.txt"), 2)
+    victims = victims.astype(np.int64)
+
+    # vital signals, one victim per row after the header
+    data = _load_rows(os.path.join(vict_folder, "data.csv"), len(DATA_COLUMNS),
+                      skiprows=1)
+    n = len(data)
+    signals_int = np.empty((n, 1 + len(INT_COLUMNS)), dtype=np.int64)
+    signals_int[:, 0] = np.arange(1, n + 1)   # victim id number
+    signals_int[:, 1:] = data[:, [DATA_COLUMNS.index(c) for c in INT_COLUMNS]]
+    signals_float = data[:, [DATA_COLUMNS.index(c) for c in FLOAT_COLUMNS]]
+
+    # summed in the file order, as the original reading loop did
+    sum_sobr = 0
+    for sobr in signals_float[:, 1].tolist():
+        sum_sobr = sum_sobr + sobr
+
+    return EnvData(obst, max_obst, victims, signals_int, signals_float, sum_sobr)
+
+
+def _save(folder, data, key):
+    """ Writes data into folder/key atomically: a concurrent writer (e.g.
+    another sweep worker) either wins or finds the cache already there """
+    os.makedirs(folder, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f"{key}.", dir=folder)
+    np.save(os.path.join(tmp, "obst.npy"), data.obst)
+    np.save(os.path.join(tmp, "victims.npy"), data.victims)
+    np.save(os.path.join(tmp, "signals_int.npy"), data.signals_int)
+    np.save(os.path.join(tmp, "signals_float.npy"), data.signals_float)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"version": VERSION, "max_obst": data.max_obst,
+                   "sum_sobr": data.sum_sobr}, f)
+    try:
+        os.rename(tmp, os.path.join(folder, key))
+    except OSError:
+        # already written by someone else
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+
+def _load(path):
+    """ Maps the arrays of a cache entry (copy-on-write, the files are never
+    modified) """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != VERSION:
+        raise ValueError(f"{path}: unsupported cache version {meta['version']}")
+
+    def array(name):
+        return np.asarray(np.load(os.path.join(path, name), mmap_mode="c"))
+
+    return EnvData(array("obst.npy"), meta["max_obst"], array("victims.npy"),
+                   array("signals_int.npy"), array("signals_float.npy"),
+                   meta["sum_sobr"])
+
+
+def load(env_folder, vict_folder, width, height, use_cache=True):
+    """ Returns the parsed environment, from the cache when it is there
+    @param use_cache: False always parses the text files and writes nothing
+    @return an EnvData """
+    if not use_cache:
+        return compile_env(env_folder, vict_folder, width, height)
+
+    key = source_key(env_folder, vict_folder)
+    folder = os.path.join(env_folder, CACHE_DIR)
+    path = os.path.join(folder, key)
+    if os.path.isdir(path):
+        return _load(path)
+
+    data = compile_env(env_folder, vict_folder, width, height)
+    try:
+        _save(folder, data, key)
+    except OSError as e:
+        # read-only dataset folders still work, only slower
+        print(f"ENV: could not write the environment cache in {folder}: {e}")
+    return data
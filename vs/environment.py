@@ -2,114 +2,134 @@
 # First version  set/2025
 
 import os
-import pygame
-import csv
 import time
-import math
-import colorsys
+import random
+import numpy as np
+from . import action_log
+from . import env_cache
 from .physical_agent import PhysAgent
 from .constants import VS
+from .metrics import Metrics
+from .parallel import ParallelDeliberation
+from .profiler import Profiler
+from .results import RunResult
+from .visited import VisitedMap
 
 
 # Class Environment
 class Env:
-    def __init__(self, vict_folder, env_folder):
+    def __init__(self, vict_folder, env_folder, headless=None, seed=None, profile=None,
+                 use_cache=True, workers=None):
+        """ @param vict_folder: folder containing the vital signals (data.csv)
+        @param env_folder: folder containing env_config.txt, env_obst.txt and
+        env_victims.txt
+        @param headless: True runs without window nor pygame; False opens the
+        window; None (default) follows the HEADLESS key of env_config.txt
+        @param seed: seed of the random generators (random and numpy) set at
+        the beginning of run; None follows the SEED key of env_config.txt,
+        if any, otherwise the generators are not seeded
+        @param profile: True times every deliberate() call (see
+        vs/profiler.py); None follows the PROFILE key of env_config.txt
+        @param use_cache: False parses the text files even if there is a
+        binary cache of them (see vs/env_cache.py)
+        @param workers: number of worker processes for the deliberate()
+        calls of the agents that deliberate alone (see vs/parallel.py); 0 or
+        1 calls them one by one; None follows the WORKERS key of
+        env_config.txt """
         # instance attributes
         self.vict_folder = vict_folder  # folder containing victims' data
         self.env_folder = env_folder    # folder containing env config data
+        self.use_cache = use_cache      # False ignores the binary cache
         self.dic = {}          # configuration of grid and window
         self.agents = []       # list of running agents
-        self.obst = None       # list of obstacles: ]0.0, VS.OBST_WALL] float
+        self.__body_of = {}    # registry: mind -> its only PhysAgent
+        self.__by_name = {}    # registry: NAME -> PhysAgent
+        self.__by_role = {}    # registry: ROLE -> list of PhysAgent, in order
+        self.__waiting = {}    # event -> PhysAgents blocked until it is notified
+        self.obst = None       # array of obstacles: ]0.0, VS.OBST_WALL] float
                                # representing the multiplying factor for the
                                # walk action for an agent to enter into a cell.
                                # explorer agent cannot access this attribute, it has to find!
+        self.passable = None   # bool array: True where obst != VS.OBST_WALL
         self.nb_of_victims = 0  # total number of victims
         self.victims = []       # positional: the coordinates of the victims [(x1,y1), ..., (xn, yn)]
+        self.victim_index = {}  # (x, y) -> id of the victim at that position
         self.tri = []      # positional: the injury tri for each victim (label)
         self.sobr = []     # positional: the injury survival prob. for each victim (float value)
         self.sum_sobr = 0  # sum of all gravity values for peg and psg calculation
         self.signals = []  # positional: the vital signals of the victims [[i,s1,...,s5,g,l],...]
         self.found = [[]]  # positional: Physical agents that found each victim [[ag1] [ag2, ag3], ...] ag1 found vict 0, ag2 and 3, vict 1, ... 
         self.saved = [[]]  # positional: Physical agents that saved each victim
-        self.__max_obst = 0  # max value for obstacle for coloring - to be calculated
-        self.__min_obst = VS.OBST_WALL  # min value for obstacle for coloring - to be calculated
+        self.metrics = None  # incremental counters of found/saved victims
+        self.max_obst = 0  # max value for obstacle for coloring - to be calculated
+        self.min_obst = VS.OBST_WALL  # min value for obstacle for coloring - to be calculated
+        self.dirty_cells = None  # cells to be repainted; a set only while a window is open
+        self.cycle = 0           # current reasoning cycle
+        self.wall_time = 0.0     # elapsed time of the last run/replay (s)
+        self.recorder = None     # ActionRecorder while a run is being recorded
+        self.profiler = None     # Profiler when profiling is enabled
+        self.parallel = None     # ParallelDeliberation while a parallel run runs
 
         # Read the environment config file
         self.__read_config()
         # print(self.dic)
 
-        # Set up the obstacles - it's a list composed of GRID_WIDTH lists.
-        # Each sublist is a column (y=0, 1, ...)
-        # 1 means that there is no obstacle - it is a regular terrain
-        self.obst = [[1 for y in range(self.dic["GRID_HEIGHT"])]
-                     for x in range(self.dic["GRID_WIDTH"])]
-        obst_file = os.path.join(self.env_folder, "env_obst.txt")
-        self.__max_obst = 1
-
-        with open(obst_file, 'r') as csvfile:
-            csvreader = csv.reader(csvfile)
-            for row in csvreader:
-                x = int(row[0])
-                y = int(row[1])
-                # absolute multiplying factor representing the degree of
-                # difficulty/facility for the agent to enter the cell
-                # values ]0, 1[ means a descent; 1 = VS.OBST_NONE;
-                # ]1, 100[ = ascent; 100 = VS.OBST_WALL
-                obst = float(row[2])
-
-                if obst > 100:
-                    obst = VS.OBST_WALL   # wall
-                elif obst <= 0:
-                    obst = VS.OBST_NONE     # no obstacle
-
-                if obst != VS.OBST_WALL and obst > self.__max_obst:
-                    self.__max_obst = obst
-
-                self.obst[x][y] = obst
-                #  print(self.obst)
-
-        print(f"ENV: max_obst = {self.__max_obst} min_obst={self.__min_obst}")
-
-        #  Read and put the victims into the grid
-        victims_file = os.path.join(self.env_folder, "env_victims.txt")
-
-        with open(victims_file, 'r') as csvfile:
-            csvreader = csv.reader(csvfile)
-            for row in csvreader:
-                x = int(row[0])
-                y = int(row[1])
-                self.victims.append((x, y))   # append tuples
+        # headless: no window, no pygame, no delay and no final input()
+        if headless is None:
+            headless = self.dic.get("HEADLESS", 0) == 1
+        self.headless = headless
 
+        # seeded runs are reproducible
+        if seed is None:
+            seed = self.dic.get("SEED")
+        self.seed = seed
+
+        # profiling: timing of deliberate() per agent, phase and cycle
+        if profile is None:
+            profile = self.dic.get("PROFILE", 0) == 1
+        if profile:
+            self.profiler = Profiler()
+
+        # parallel deliberation of independent agents
+        if workers is None:
+            workers = self.dic.get("WORKERS", 0)
+        self.workers = workers
+
+        # Grid size, also kept as attributes for the hot paths of PhysAgent
+        self.width = self.dic["GRID_WIDTH"]
+        self.height = self.dic["GRID_HEIGHT"]
+
+        # Obstacles, victims and vital signals, parsed once and then read
+        # from the binary cache of the folders (see vs/env_cache.py)
+        data = env_cache.load(self.env_folder, self.vict_folder,
+                              self.width, self.height, use_cache)
+
+        # float32 array of obstacles indexed by [x, y]
+        self.obst = data.obst
+        self.max_obst = data.max_obst
+
+        # True where an agent may enter the cell
+        self.passable = self.obst != VS.OBST_WALL
+
+        print(f"ENV: max_obst = {self.max_obst} min_obst={self.min_obst}")
+
+        # the victims into the grid: tuples (x, y)
+        self.victims = list(zip(data.victims[:, 0].tolist(),
+                                data.victims[:, 1].tolist()))
         self.nb_of_victims = len(self.victims)
 
-        # Load the vital signals of the victims
-        vs_file = os.path.join(self.vict_folder, "data.csv")
-
-        with open(vs_file, 'r') as csvfile:
-            csvreader = csv.reader(csvfile)
-            next(csvreader)  # Pula a primeira linha (cabeçalho)
-            vid = 0
-            for row in csvreader:
-                vid = vid + 1   # victim id number
-                idade = int(row[0])
-                fc = int(row[1])    # freq cardiaca
-                fr = int(row[2])    # freq respiratoria
-                pas = int(row[3])   # pressao arterial sistolica
-                spo2 = int(row[4])  # saturacao de oxigenio
-                temp = float(row[5])  # temperatura corporal
-                pr = int(row[6])    # pulso radial (0 ou 1)
-                sg = int(row[7])    # sangramento (0 ou 1
-                fx = int(row[8])    # fratura exposta (0 ou 1)
-                queim = int(row[9])  # queimardura (niveis)
-                gcs = int(row[10])   # Coma - Glasgow scale
-                avpu = int(row[11])  # estado de consciencia
-                tri = int(row[12])  # Triagem START: 0 GRN, 1 YEL, 2 RED, 3 BLK
-                sobr = float(row[13])  # Prob. de sobrevivencia
-                self.signals.append([vid, idade, fc, fr, pas, spo2, temp,
-                                     pr, sg, fx, queim, gcs, avpu, tri, sobr])
-                self.tri.append(tri)
-                self.sobr.append(sobr)
-                self.sum_sobr = self.sum_sobr + sobr
+        # Index position -> victim id for O(1) lookups. When two victims
+        # share a cell, the first one of env_victims.txt is reported
+        self.victim_index = {}
+        for vid, pos in enumerate(self.victims):
+            self.victim_index.setdefault(pos, vid)
+
+        # the vital signals of the victims [vid, idade, fc, fr, pas, spo2,
+        # temp, pr, sg, fx, queim, gcs, avpu, tri, sobr]
+        self.signals = data.signal_rows()
+        self.tri = [row[-2] for row in self.signals]
+        self.sobr = [row[-1] for row in self.signals]
+        self.sum_sobr = data.sum_sobr
 
         if self.nb_of_victims > len(self.signals):
             print("ENV: number of victims of env_victims.txt greater than vital signals")
@@ -123,10 +143,10 @@ class Env:
         # Set up found and saved victims' lists
         self.found = [[] for v in range(self.nb_of_victims)]
         self.saved = [[] for v in range(self.nb_of_victims)]
+        self.metrics = Metrics(self.tri, self.sobr)
 
-        # Stores all the agents have been in the cell
-        self.visited = [[[] for y in range(self.dic["GRID_HEIGHT"])]
-                        for x in range(self.dic["GRID_WIDTH"])]
+        # Stores all the agents have been in the cell: one bit-plane per agent
+        self.visited = VisitedMap(self.width, self.height)
 
     def __read_config(self):
         """ Read the size of the grid and window and
@@ -155,249 +175,411 @@ class Env:
 
     def add_agent(self, ag, state=VS.IDLE):
         """ This public method adds an agent to the simulator.
-        It creates a representation for the agent in the 2D environment
+        It creates a representation for the agent in the 2D environment.
+        Each mind has only one body: adding an agent that is already in the
+        environment returns its body, unchanged.
         @param self: the environment object
         @param ag: an instance of Abstract Agent
         @param state: the state of the agent
         @return: an object that is the agent"""
 
+        phy = self.__body_of.get(ag)
+        if phy is not None:
+            return phy
+        if ag.NAME in self.__by_name:
+            raise ValueError(f"there is already an agent named {ag.NAME}")
+
         phy = PhysAgent(ag, self, self.dic["BASE"][0], self.dic["BASE"][1], state) 
+        phy._idx = self.visited.add_agent()   # same as its index in self.agents
         self.agents.append(phy)
+        self.__body_of[ag] = phy
+        self.__by_name[ag.NAME] = phy
+        self.__by_role.setdefault(getattr(ag, "ROLE", ""), []).append(phy)
+        self.metrics.add_agent(phy)
         return phy
 
-    def __draw(self):
-        """ This private method draw the grid and its items """
-
-        # Set cell width and height
-        cell_w = self.dic["WINDOW_WIDTH"]/self.dic["GRID_WIDTH"]
-        cell_h = self.dic["WINDOW_HEIGHT"]/self.dic["GRID_HEIGHT"]
-
-        # Clear the screen
-        self.screen.fill(VS.WHITE)
-
-        # configuration for obstacles coloring
-        # h,  s,   lc, ld:
-        # 13, 100, 100, 65 red tonalities
-        # 275,100, 100, 65 purple
-        # 90, 35,  100, 40 green tonaliies
-        #  0,  0,  100, 50 gray tonnalitites
-        hue = 0                # Not relevant for grayscale; 0=Red, 120=green, 240=blue till 360
-        saturation = 0         # 40 = Red  0 = Grayscale
-        lightness_clear = 100  # 100 = White
-        lightness_dark = 40    # 0 = Black
-
-        # configuration for ploting the trace marks
-        nb_of_ag = len(self.agents)
-        # print(f"ENV: number of agents {nb_of_ag}")
-        nb_of_rects = math.ceil(math.sqrt(nb_of_ag))
-        mark_radius = min(cell_w/nb_of_rects, cell_h/nb_of_rects) / 2
-
-        # Draw the grid
-        for x in range(self.dic["GRID_WIDTH"]):
-            for y in range(self.dic["GRID_HEIGHT"]):
-                rect = pygame.Rect(x * cell_w, y * cell_h, cell_w, cell_h)
-                pygame.draw.rect(self.screen, (230, 230, 230), rect, 1)
-
-                if self.obst[x][y] == VS.OBST_WALL:
-                    rgb_int = VS.BLACK
-                else:
-                    if self.obst[x][y] == VS.OBST_NONE:
-                        rgb_int = VS.WHITE
-                    else:
-                        perc = self.obst[x][y]/self.__max_obst
-                        lightness = (1 - perc) * lightness_clear + perc * lightness_dark
-
-                        # convert HSL color to RGB
-                        rgb_color = colorsys.hls_to_rgb(hue / 360.0, lightness / 100.0, saturation / 100.0)
-
-                        # Convert RGB values to integers in the range [0, 255]
-                        rgb_int = tuple(int(c * 255) for c in rgb_color)
-
-                obst_rect = pygame.Rect(x * cell_w + 1, y * cell_h + 1, cell_w - 2, cell_h - 2)
-                pygame.draw.rect(self.screen, rgb_int, obst_rect)
-
-                # Trace: plot a dot for each agent who has visited a cell
-                visitors = self.visited[x][y]
-                v = 0
-
-                if visitors:
-                    for i in range(nb_of_rects):
-                        for j in range(nb_of_rects):
-                            if v < len(visitors):
-                                trace_color = visitors[v].mind.TRACE_COLOR
-                                xc = x * cell_w + mark_radius * (i+1)
-                                yc = y * cell_h + mark_radius * (j+1)
-                                pygame.draw.circle(self.screen, trace_color,
-                                                   (xc, yc), 0.7*mark_radius)
-                                v += 1
-
-        # Draw a marker at the base
-        rect = pygame.Rect(self.dic["BASE"][0] * cell_w,
-                           self.dic["BASE"][1] * cell_h, cell_w, cell_h)
-        pygame.draw.rect(self.screen, VS.CYAN, rect, 4)
-
-        # Draw the victims
-        v = 0
-        for victim in self.victims:
-            victim_rect = pygame.Rect(victim[0] * cell_w + 1,
-                                      victim[1] * cell_h + 1,
-                                      cell_w - 1, cell_h - 1)
-            c = self.tri[v]
-            pygame.draw.ellipse(self.screen, VS.VIC_COLOR_LIST[c], victim_rect)
-            if self.saved[v] != []:
-                pygame.draw.ellipse(self.screen, VS.BLUE, victim_rect, 3)
-            elif self.found[v] != []:
-                pygame.draw.ellipse(self.screen, VS.PINK, victim_rect, 3)
-            v = v + 1
-
-        # Draw the physical agents
+    def reset(self, state=VS.ACTIVE):
+        """ Public method for starting over without reading the files again:
+        every agent goes back to the base with a full battery and the given
+        state, and the visited cells, found and saved victims and the cycle
+        counter are cleared. The minds are not touched: resetting their own
+        data is up to the caller.
+        @param state: the state of all the agents after the reset """
+        base_x, base_y = self.dic["BASE"]
+        for phy in self.agents:
+            phy.x = base_x
+            phy.y = base_y
+            phy._rtime = phy.mind.TLIM
+            phy._state = state
+            phy._blocked_on = None
+            phy._plan = None
+            phy._plan_result = None
+            phy._plan_left = []
+        self.__waiting.clear()
+
+        for v in range(self.nb_of_victims):
+            self.found[v].clear()
+            self.saved[v].clear()
+        self.metrics.clear()
+        self.visited.clear()
+        if self.dirty_cells is not None:
+            self.dirty_cells.clear()
+        self.cycle = 0
+
+    def block(self, phy, event):
+        """ Blocks an agent until event is notified (see AbstAgent.wait_for)
+        @param phy: the PhysAgent
+        @param event: a hashable value, usually a VS.EV_* constant """
+        phy._blocked_on = event
+        self.__waiting.setdefault(event, []).append(phy)
+
+    def notify(self, event):
+        """ Public method for waking up the agents waiting for event. They
+        deliberate again from the next turn on (in this same cycle if they
+        come after the notifying agent in self.agents).
+        @return: the number of agents woken up """
+        woken = self.__waiting.pop(event, [])
+        for phy in woken:
+            phy._blocked_on = None
+        return len(woken)
+
+    def get_agent(self, name):
+        """ Public method for finding an agent by its NAME
+        @return: the PhysAgent, or None if there is no agent with this name """
+        return self.__by_name.get(name)
+
+    def get_agents(self, role):
+        """ Public method for finding the agents of a role (e.g.
+        "explorer", "rescuer"), see AbstAgent.ROLE
+        @return: a list of PhysAgent in the order they were added; it must
+        not be modified """
+        return self.__by_role.get(role, [])
+
+    def __step(self):
+        """ Executes one reasoning cycle: asks each ACTIVE agent that is not
+        blocked waiting for an event to deliberate and updates its state
+        accordingly.
+        @return: a tuple (active, idle) telling if at least one agent
+        deliberated and if there was at least one IDLE agent in this cycle """
+
+        active = False
+        idle = False
+        profiler = self.profiler
+        if profiler is not None:
+            start = time.perf_counter()
+
+        # ask each agent to deliberate the next action
+        parallel = self.parallel
+        batch = []   # consecutive agents deliberating alone, not run yet
         for phy in self.agents:
+
+            # Asks the agent to do the next action if it is ACTIVE
             if phy._state == VS.ACTIVE:
-                # ag_rect = pygame.Rect(phy.x * cell_w, phy.y * cell_h, cell_w, cell_h)
-                # pygame.draw.rect(self.screen, phy.mind.COLOR, ag_rect)
-                p_x1 = phy.x * cell_w + 0.2 * cell_w
-                p_x2 = phy.x * cell_w + cell_w/2
-                p_x3 = phy.x * cell_w + 0.8 * cell_w
-                p_y1 = phy.y * cell_h + cell_h/2
-                p_y2 = phy.y * cell_h + 0.2 * cell_h
-                p_y3 = phy.y * cell_h + 0.8 * cell_h
-
-                triangle = [(p_x1, p_y1), (p_x2, p_y2),
-                            (p_x3, p_y1), (p_x2, p_y3)]
-                pygame.draw.polygon(self.screen, phy.mind.COLOR, triangle)
-                # active_idle = True
-
-        # Update the display
-        pygame.display.update()
-
-    def run(self):
-        """ This public method is the engine of the simulator. It calls the
-        deliberate method of each ACTIVE agent situated in the environment.
-        Then, it updates the state of the agents and of the environment"""
+                # the agents of the batch may terminate and wake this one
+                if batch and phy._blocked_on is not None:
+                    self.__run_batch(batch)
+                    batch = []
+
+                # blocked agents only deliberate after their event
+                if phy._blocked_on is not None:
+                    continue
+
+                active = True
+                if parallel is not None and parallel.takes(phy):
+                    batch.append(phy)
+                    continue
+                if batch:
+                    self.__run_batch(batch)
+                    batch = []
+                self.__turn(phy)
+
+            elif phy._state == VS.IDLE:
+                idle = True
+
+        if batch:
+            self.__run_batch(batch)
+
+        if profiler is not None:
+            profiler.end_cycle(time.perf_counter() - start)
+
+        return active, idle
+
+    def __turn(self, phy):
+        """ The turn of one agent: it deliberates or walks its plan """
+        if self.profiler is not None:
+            # the profiler also measures the moves of the plans
+            more_actions_to_do = self.profiler.deliberate(self.cycle, phy)
+        elif phy._plan is not None:
+            # the agent is following a plan: the simulator walks the
+            # next move instead of calling deliberate
+            phy._plan_step()
+            more_actions_to_do = True
+        else:
+            more_actions_to_do = phy.mind.deliberate()
+        self.__end_turn(phy, more_actions_to_do)
+
+    def __run_batch(self, batch):
+        """ Runs the turns of agents that deliberate alone, in the worker
+        processes when there is more than one or when the mind of the agent
+        is already in a worker """
+        if len(batch) == 1 and not self.parallel.is_remote(batch[0]):
+            self.__turn(batch[0])
+            return
+
+        for phy, more_actions_to_do in self.parallel.run(batch, self.cycle):
+            self.__end_turn(phy, more_actions_to_do)
+
+    def __end_turn(self, phy, more_actions_to_do):
+        """ Updates the state of an agent after its deliberation """
+
+        #  if cycle % 50 == 0:
+        #    print(f"ENV: cycle {cycle} {phy.mind.NAME} remaining: {phy.rtime}")
+
+        # Test if the agent exceeded the time limit
+        if phy._end_of_time():
+            phy._state = VS.DEAD
+            print("ENV: " + phy.mind.NAME + ": time limit reached, no batt, it is dead")
+            self.notify(VS.EV_AGENT_TERMINATED)
+        # agent do not have more actions to do
+        elif not more_actions_to_do:
+            if phy._at_base():
+                print("ENV: ag " + phy.mind.NAME + " succesfully terminated, it is at the base")
+                phy._state = VS.ENDED
+            else:
+                print("ENV: ag " + phy.mind.NAME + " is not at the base and asked for termination. Now, it's dead")
+                phy._state = VS.DEAD
+            self.notify(VS.EV_AGENT_TERMINATED)
+
+    def __print_blocked(self):
+        """ Reports the agents left waiting for an event nobody notified """
+        for phy in self.agents:
+            if phy._state == VS.ACTIVE and phy._blocked_on is not None:
+                print(f"ENV: ag {phy.mind.NAME} is still waiting for {phy._blocked_on}")
 
-        cycle = 0
-        # Set up Pygame
-        pygame.init()
+    def __print_stats(self):
+        """ Prints the statistics enabled in the config file """
+        results = self.get_results()
+        if self.dic["STATS_PER_AG"] == 1:
+            print("RESULTS PER AGENT")
+            self.print_results(results)
 
-        # Create the font object
-        self.font = pygame.font.SysFont(None, 24)
+        if self.dic["STATS_ALL_AG"] == 1:
+            print("\n--------------")
+            self.print_acum_results(results)
 
-        # Create the window
-        self.screen = pygame.display.set_mode((self.dic["WINDOW_WIDTH"],
-                                               self.dic["WINDOW_HEIGHT"]))
+        if self.profiler is not None:
+            self.profiler.print_summary()
 
-        # Draw the environment with items
-        self.__draw()
+    def run(self, record=None):
+        """ This public method is the engine of the simulator. It calls the
+        deliberate method of each ACTIVE agent situated in the environment.
+        Then, it updates the state of the agents and of the environment.
+        @param record: optional path of a file where the action log of the
+        run is written (see replay)
+        @return: a RunResult with the outcome of the simulation
+
+        With workers > 1 each mind draws from its own generator (self.rng),
+        seeded by the seed and its NAME, instead of the global random of a
+        serial run: a seeded parallel run is reproducible with any number of
+        workers but does not reproduce the serial run of the same seed """
+
+        if self.seed is not None:
+            random.seed(self.seed)
+            np.random.seed(self.seed)
+
+        if record is not None:
+            self.recorder = action_log.ActionRecorder(self, self.seed)
+
+        if self.workers > 1:
+            # the agents of a cycle draw numbers in different processes:
+            # each agent gets its own generator, so seeded runs stay
+            # reproducible (but differ from the serial run, see above)
+            for phy in self.agents:
+                seed = None if self.seed is None else f"{self.seed}:{phy.mind.NAME}"
+                phy.mind.rng = random.Random(seed)
+            self.parallel = ParallelDeliberation(self, self.workers)
+            self.parallel.start()
+
+        try:
+            if self.headless:
+                result = self.__run_headless()
+            else:
+                result = self.__run_window()
+        finally:
+            if self.parallel is not None:
+                self.parallel.stop()
+                self.parallel = None
+
+        if record is not None:
+            self.recorder.save(record)
+            self.recorder = None
+
+        return result
+
+    def replay(self, log_path):
+        """ Re-executes a recorded run: the walk, read_vital_signals and
+        first_aid actions of the log are applied to new physical agents,
+        in the recorded order, without calling any deliberate(). The
+        environment must have been created from the same folders and must
+        not have agents.
+        @param log_path: file written by run(record=...)
+        @return: a RunResult identical to the recorded one, except for the
+        wall time """
+
+        header, data = action_log.load(log_path)
+        if (header["grid"] != [self.width, self.height] or
+                header["nb_of_victims"] != self.nb_of_victims):
+            raise ValueError(f"{log_path} was recorded in another environment "
+                             f"({header['env_folder']}, {header['vict_folder']})")
+        if self.agents:
+            raise ValueError("replay requires an environment without agents")
+
+        for info in header["agents"]:
+            self.add_agent(action_log.ReplayMind(info), VS.ACTIVE)
+
+        start = time.perf_counter()
+        agents = self.agents
+        for cycle, idx, op, dx, dy, expected in action_log.RECORD.iter_unpack(data):
+            self.cycle = cycle
+            phy = agents[idx]
+            if op == action_log.OP_WALK:
+                result = phy._walk(dx, dy)
+            elif op == action_log.OP_READ:
+                result = action_log.encode_read(phy._read_vital_signals())
+            else:
+                result = action_log.encode_first_aid(phy._first_aid())
+
+            if result != expected:
+                raise RuntimeError(f"replay diverged at cycle {cycle}: agent "
+                                   f"{phy.mind.NAME} op {op} returned {result}, "
+                                   f"recorded {expected}")
+
+        for phy, info in zip(agents, header["agents"]):
+            phy._state = info["final_state"]
+        self.cycle = header["cycles"]
+        self.wall_time = time.perf_counter() - start
+
+        self.__print_stats()
+        return self.get_results()
+
+    def __run_headless(self):
+        """ Runs the same cycles of the window mode without drawing, without
+        delay between cycles and without waiting for the user at the end """
+
+        self.cycle = 0
+        start = time.perf_counter()
+
+        while True:
+            active, idle = self.__step()
+            self.cycle += 1
+
+            if not active:
+                # Only IDLE or blocked agents (or none) are left: nobody
+                # deliberates, so nobody can ever wake them up
+                print("ENV: no active agent scheduled for execution... terminating")
+                self.__print_blocked()
+                break
+
+        self.wall_time = time.perf_counter() - start
+        self.__print_stats()
+        return self.get_results()
+
+    def __run_window(self):
+        """ Runs the simulation drawing the grid in a pygame window """
+        # pygame is only imported here, so the headless mode runs on
+        # machines without a display or without pygame
+        from .renderer import Renderer
+
+        self.cycle = 0
+        start = time.perf_counter()
+
+        # Open the window and draw the environment with items
+        renderer = Renderer(self)
 
         # Create the main loop
         running = True
 
         while running:
             # Handle events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
+            if renderer.quit_requested():
+                running = False
 
             # control whether there are active or idle agents
-            active_or_idle = False
-
-            # ask each agent to deliberate the next action
-            for phy in self.agents:
-
-                # Asks the agent to do the next action if it is ACTIVE
-                if phy._state == VS.ACTIVE:
-                    active_or_idle = True
-                    more_actions_to_do = phy.mind.deliberate()
-
-                    #  if cycle % 50 == 0:
-                    #    print(f"ENV: cycle {cycle} {phy.mind.NAME} remaining: {phy.rtime}")
-
-                    # Test if the agent exceeded the time limit
-                    if phy._end_of_time():
-                        phy._state = VS.DEAD
-                        print("ENV: " + phy.mind.NAME + ": time limit reached, no batt, it is dead")
-                    # agent do not have more actions to do
-                    elif not more_actions_to_do:
-                        if phy._at_base():
-                            print("ENV: ag " + phy.mind.NAME + " succesfully terminated, it is at the base")
-                            phy._state = VS.ENDED
-                        else:
-                            print("ENV: ag " + phy.mind.NAME + " is not at the base and asked for termination. Now, it's dead")
-                            phy._state = VS.DEAD
-
-                elif phy._state == VS.IDLE:
-                    active_or_idle = True
+            active, idle = self.__step()
 
             # Update the grid after the delay
             if self.dic["DELAY"] > 0:
                 time.sleep(self.dic["DELAY"])
 
-            self.__draw()
+            renderer.draw()
 
-            cycle += 1
+            self.cycle += 1
 
-            # Show metrics when there is no more active or idle agents
-            if not active_or_idle:
-                print("ENV: no active or idle agent scheduled for execution... terminating")
-                if self.dic["STATS_PER_AG"] == 1:
-                    print("RESULTS PER AGENT")
-                    self.print_results()
-
-                if self.dic["STATS_ALL_AG"] == 1:
-                    print("\n--------------")
-                    self.print_acum_results()
+            # Show metrics when no agent can deliberate anymore: the IDLE
+            # and the blocked ones could only be woken up by an active agent
+            if not active:
+                print("ENV: no active agent scheduled for execution... terminating")
+                self.__print_blocked()
+                self.__print_stats()
 
                 input("ENV: Tecle qualquer coisa para encerrar >>")
                 running = False
 
+        self.wall_time = time.perf_counter() - start
+
         # Quit Pygame
-        pygame.quit()
+        renderer.close()
+
+        return self.get_results()
+
+    def get_results(self):
+        """ Public method that returns the results so far, per agent and for
+        all agents. It reads the incremental counters, so it may also be
+        called in the middle of a run.
+        @return: a RunResult (see vs/results.py) """
+        return RunResult(self, self.cycle, self.wall_time, self.headless)
 
-    def __print_victims(self, victims, type_str, sub, ident=3):
-        """ Print either the found or the saved victims list
-        @param victims: it is the list to be printed
+    def __print_victims(self, stats, tri_total, type_str, sub, ident=3):
+        """ Print either the found or the saved victims
+        @param stats: VictimStats of the victims to be printed
+        @param tri_total: number of victims in the env per triage class
         @param type_str: it is a string for composing the pring
         @param sub: it is a character representing the metric"""
 
         idents = ' ' * ident
+        total = tri_total
 
-        if len(victims) > 0:
-            tri = []
-            sobr = []
-            tot_sobr = 0        # for peg or psg calculation
-            for v in victims:
-                tri.append(self.tri[v])
-                sobr.append(self.sobr[v])
-                tot_sobr = tot_sobr + self.sobr[v]
+        if len(stats) > 0:
+            tri = stats.tri_count
+            tot_sobr = stats.sum_sobr      # for peg or psg calculation
 
             print(f"\n{idents}{type_str} victims: (ID, Tri, Sobr)")
-            for i in range(len(victims)):
+            for i, v in enumerate(stats.ids):
                 if (i % 4 == 0):
                     print("")
-                print(f"{idents}({victims[i]:d}, {tri[i]:d}, {sobr[i]:.1f})", end=' ')
+                print(f"{idents}({v:d}, {self.tri[v]:d}, {self.sobr[v]:.1f})", end=' ')
 
             print("\n")
-            if self.tri.count(0) > 0:
-                print(f"{idents}Green  {type_str}      (V{sub}0) = {tri.count(0):3d} out of {self.tri.count(0)} ({100*tri.count(0)/self.tri.count(0):.1f})%")
-            if self.tri.count(1) > 0:
-                print(f"{idents}Yellow {type_str}      (V{sub}1) = {tri.count(1):3d} out of {self.tri.count(1)} ({100*tri.count(1)/self.tri.count(1):.1f})%")
-            if self.tri.count(2) > 0:
-                print(f"{idents}Red    {type_str}      (V{sub}2) = {tri.count(2):3d} out of {self.tri.count(2)} ({100*tri.count(2)/self.tri.count(2):.1f})%")
-            if self.tri.count(3) > 0:
-                print(f"{idents}Black  {type_str}      (V{sub}3) = {tri.count(3):3d} out of {self.tri.count(3)} ({100*tri.count(3)/self.tri.count(3):.1f})%")
+            if total[0] > 0:
+                print(f"{idents}Green  {type_str}      (V{sub}0) = {tri[0]:3d} out of {total[0]} ({100*tri[0]/total[0]:.1f})%")
+            if total[1] > 0:
+                print(f"{idents}Yellow {type_str}      (V{sub}1) = {tri[1]:3d} out of {total[1]} ({100*tri[1]/total[1]:.1f})%")
+            if total[2] > 0:
+                print(f"{idents}Red    {type_str}      (V{sub}2) = {tri[2]:3d} out of {total[2]} ({100*tri[2]/total[2]:.1f})%")
+            if total[3] > 0:
+                print(f"{idents}Black  {type_str}      (V{sub}3) = {tri[3]:3d} out of {total[3]} ({100*tri[3]/total[3]:.1f})%")
             print(f"{idents}--------------------------------------")
-            print(f"{idents}Total of {type_str} victims     (V{sub})  = {len(tri):3d} ({100*float(len(tri)/self.nb_of_victims):.2f}%)")
+            print(f"{idents}Total of {type_str} victims     (V{sub})  = {stats.count:3d} ({100*float(stats.count/self.nb_of_victims):.2f}%)")
 
-            weighted = ((3*tri.count(0) + 3*tri.count(1) + 3*tri.count(2) + tri.count(3))/
-                        (3*self.tri.count(0)+3*self.tri.count(1)+3*self.tri.count(2)+self.tri.count(3)))
+            weighted = stats.weighted
 
             print(f"{idents}Weighted {type_str} victims per sobr (V{sub}g) = {weighted:.2f}\n")
             print(f"{idents}Sum of sobr of all {type_str} victims = {tot_sobr:.2f} of a total of {self.sum_sobr:.2f}")
-            print(f"{idents}  % of sobr of all {type_str} victims = {tot_sobr/self.sum_sobr:.2f}")
+            print(f"{idents}  % of sobr of all {type_str} victims = {stats.pct_sobr:.2f}")
             print(f"{idents}--------------------------------------")
             print(f"{idents}CSV of {type_str} victims")
             print(f"{idents}V{sub}0,V{sub}1,V{sub}2,V{sub}3,V{sub}g")
-            print(f"{idents}{tri.count(0)},{tri.count(1)},{tri.count(2)},{tri.count(3)},{weighted}")
+            print(f"{idents}{tri[0]},{tri[1]},{tri[2]},{tri[3]},{weighted}")
         else:
             print(f"{idents}No {type_str} victims")
             print(f"{idents}--------------------------------------")
@@ -405,60 +587,59 @@ class Env:
             print(f"{idents}V{sub}1,V{sub}2,V{sub}3,V{sub}4,V{sub}g")
             print(f"{idents}0,0,0,0,0.0")
 
-    def print_results(self):
+    def print_results(self, results=None):
         """ For each agent, print found victims and saved victims by sobr
         This is what actually happened in the environment. Observe that the
-        beliefs of the agents may be different."""
+        beliefs of the agents may be different.
+        @param results: a RunResult; None computes it with get_results """
+
+        if results is None:
+            results = self.get_results()
 
         print("\n\n*** Final results per agent ***")
-        for phy in self.agents:
-            print(f"\n[ Agent {phy.mind.NAME} ]")
-            if phy._state == VS.DEAD:
+        for ag in results.agents:
+            print(f"\n[ Agent {ag.name} ]")
+            if ag.state == VS.DEAD:
                 print("This agent is dead, you should discard its results, but...")
 
             # Remaining time
             print("\n*** Consumed time ***")
-            print(f"{phy.mind.TLIM - phy._rtime:.2f} of {phy.mind.TLIM:.2f}")
+            print(f"{ag.consumed:.2f} of {ag.tlim:.2f}")
 
             # Found victims
-            found = phy._get_found_victims()
-            self.__print_victims(found, "found", "e", ident=5)
+            self.__print_victims(ag.found, results.tri_count, "found", "e", ident=5)
 
             # Saved victims
-            saved = phy._get_saved_victims()
-            self.__print_victims(saved, "saved", "s", ident=5)
+            self.__print_victims(ag.saved, results.tri_count, "saved", "s", ident=5)
 
-    def print_acum_results(self):
+    def print_acum_results(self, results=None):
         """ Print found victims and saved victims by severity for all agents.
-        This is what actually happened in the environment"""
+        This is what actually happened in the environment
+        @param results: a RunResult; None computes it with get_results """
+
+        if results is None:
+            results = self.get_results()
 
+        total = results.tri_count
         print("\n\n*** ACUMULATED RESULTS - FOR ALL AGENTS ***\n")
         print(f" *** Numbers of Victims in the Environment ***")
-        print(f"   Green  = {self.tri.count(0):3d}")
-        print(f"   Yellow = {self.tri.count(1):3d}")
-        print(f"   Red    = {self.tri.count(2):3d}")
-        print(f"   Black  = {self.tri.count(3):3d}")
+        print(f"   Green  = {total[0]:3d}")
+        print(f"   Yellow = {total[1]:3d}")
+        print(f"   Red    = {total[2]:3d}")
+        print(f"   Black  = {total[3]:3d}")
         print(f"   --------------------------------------")
         print(f"   Total of victims    (V)  = {self.nb_of_victims:3d}")
         print(f"   Sum of all gravities(SG) = {self.sum_sobr:.2f}")
         print(f"   --------------------------------------")
         print(f"   CSV of nb. total of victims")
         print(f"   G,Y,R,B,SSOBR")
-        print(f"   {self.tri.count(0)},{self.tri.count(1)},{self.tri.count(2)} {self.tri.count(3)},{self.sum_sobr}")
+        print(f"   {total[0]},{total[1]},{total[2]} {total[3]},{self.sum_sobr}")
 
-        found = []
-        for index, agents in enumerate(self.found, start=0):
-            if agents:
-                found.append(index)
         print("")
         print(" *** FOUND victims by all explorer agents ***")
-        self.__print_victims(found, "found", "e", ident=5)
+        self.__print_victims(results.found, total, "found", "e", ident=5)
 
-        saved = []
-        for index, agents in enumerate(self.saved, start=0):
-            if agents:
-                saved.append(index)
         print("")
         print(" *** SAVED victims by all rescuer agents ***")
-        self.__print_victims(saved, "saved", "s", ident=5)
+        self.__print_victims(results.saved, total, "saved", "s", ident=5)
         print("\n *** END OF STATS ***")
@@ -0,0 +1,502 @@
+""" HIERARCHICAL PATHFINDING (HPA*)
+    Near-optimal paths on grids too large for A* over every cell (Botea,
+    Muller and Schaeffer, 2004). The grid is cut in square clusters. Where
+    two neighbouring clusters can be crossed, the free stretches of their
+    border are entrances, with transitions (pairs of facing cells) at both
+    ends of the long ones and every ENTRANCE_SPACING cells in between, and
+    one in the middle of the short ones. Agents also step diagonally, so
+    the diagonal steps across a border where no facing pair is free, and
+    across the corner shared by four clusters, are transitions too. The
+    transitions are the nodes of an abstract graph whose edges are the
+    steps across a border and the cheapest paths between two nodes inside
+    one cluster. A query searches the abstract graph and then refines each
+    of its edges into moves with an A* inside one cluster.
+
+    The clusters, their entrances and their edges are built when a query
+    first needs them, and set_cost only drops the ones the changed cell
+    belongs to, so a mind that learns the map step by step rebuilds a few
+    clusters at a time. Clusters where every cell has the multiplier
+    VS.OBST_NONE need no search: their costs are octile distances.
+
+    Every step from a cluster to another one is a transition or reaches
+    one through the free cells along an entrance, so the graph connects the
+    same cells as the grid: when its search does not reach the goal, there
+    is no path, and no search over the whole grid is ever made. Goals in
+    the cluster of the start or in a neighbouring one are searched first
+    inside those clusters and, when that misses or a path going out of them
+    may be cheaper, inside them and the ring of clusters around them. The
+    paths through the graph cross the borders at the transitions only, so
+    they may cost more than the best one (see search).
+
+    The interface is the one of GridPathfinder (set_cost, block, get_cost,
+    search, expansions), so a mind can use either one. """
+
+import heapq
+import numpy as np
+from .constants import VS
+from .pathfinding import GridPathfinder, INF, DELTAS
+
+# entrances at least this long get a transition at each end and every
+# ENTRANCE_SPACING cells in between, shorter ones a single transition in the
+# middle
+LONG_ENTRANCE = 6
+ENTRANCE_SPACING = 6
+
+
+class HierarchicalPathfinder:
+    def __init__(self, costs, cluster_size=16, cost_line=1.0, cost_diag=1.5):
+        """ @param costs: NumPy array (width, height) with the terrain
+        multiplier of each cell; VS.OBST_WALL or more, or inf, is a wall
+        @param cluster_size: side of the clusters, in cells
+        @param cost_line: base cost of a horizontal or vertical step
+        @param cost_diag: base cost of a diagonal step """
+        costs = np.array(costs, dtype=np.float64)
+        costs[costs >= VS.OBST_WALL] = INF
+        self.costs = costs
+        self.width, self.height = costs.shape
+        self.cluster_size = cluster_size
+        self.cost_line = cost_line
+        self.cost_diag = cost_diag
+        self.n_cx = -(-self.width // cluster_size)
+        self.n_cy = -(-self.height // cluster_size)
+
+        # number of cells of each cluster with a multiplier other than
+        # VS.OBST_NONE (walls included): 0 means the cluster is uniform
+        odd = np.zeros((self.n_cx * cluster_size, self.n_cy * cluster_size), dtype=np.int64)
+        odd[:self.width, :self.height] = costs != VS.OBST_NONE
+        self.__odd = odd.reshape(self.n_cx, cluster_size, self.n_cy, cluster_size).sum(axis=(1, 3)).tolist()
+        free = costs[costs != INF]
+        self.__min_factor = float(free.min()) if free.size else 1.0
+        # octile paths are the cheapest ones in a uniform cluster only if
+        # a diagonal step is not cheaper than a straight one
+        self.__octile_exact = cost_line <= cost_diag <= 2 * cost_line
+        self.__h_line = min(cost_line, cost_diag)
+        self.__h_diag = min(cost_diag, 2 * self.__h_line)
+
+        self.__clusters = {}   # (cx, cy) -> GridPathfinder of the cluster
+        self.__borders = {}    # border -> list of transitions (a, b, cost a->b, cost b->a)
+        self.__graphs = {}     # (cx, cy) -> dict node -> list of (node, cost)
+        self.expansions = 0    # abstract nodes and cells expanded by all the searches
+
+    @classmethod
+    def uniform(cls, width, height, factor=1.0, cluster_size=16, cost_line=1.0, cost_diag=1.5):
+        """ A grid where every cell has the same multiplier, e.g. the map of
+        a mind that knows nothing yet
+        @return a HierarchicalPathfinder """
+        return cls(np.full((width, height), factor), cluster_size, cost_line, cost_diag)
+
+    def cluster_of(self, x, y):
+        """ @return the (cx, cy) of the cluster of a cell """
+        return x // self.cluster_size, y // self.cluster_size
+
+    def cluster_bounds(self, cluster):
+        """ @return (x0, y0, x1, y1): the cells x0 <= x < x1, y0 <= y < y1
+        of the cluster """
+        cs = self.cluster_size
+        x0 = cluster[0] * cs
+        y0 = cluster[1] * cs
+        return x0, y0, min(x0 + cs, self.width), min(y0 + cs, self.height)
+
+    def get_cost(self, x, y):
+        """ @return the multiplier of the cell, inf for walls and for
+        positions out of the grid """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return float(self.costs[x, y])
+        return INF
+
+    def set_cost(self, x, y, factor):
+        """ Changes the multiplier of one cell of the grid and drops what
+        was built from it
+        @param factor: the new multiplier; VS.OBST_WALL or more, or inf,
+        makes it a wall """
+        if factor >= VS.OBST_WALL:
+            factor = INF
+        old = float(self.costs[x, y])
+        if old == factor:
+            return
+        cluster = self.cluster_of(x, y)
+        cx, cy = cluster
+        self.__odd[cx][cy] += int(factor != VS.OBST_NONE) - int(old != VS.OBST_NONE)
+        if factor < self.__min_factor:
+            self.__min_factor = factor
+        self.costs[x, y] = factor
+
+        x0, y0, x1, y1 = self.cluster_bounds(cluster)
+        pf = self.__clusters.get(cluster)
+        if pf is not None:
+            pf.set_cost(x - x0, y - y0, factor)
+        self.__graphs.pop(cluster, None)
+
+        # the borders and corners the cell is on: their transitions may
+        # change, and so the nodes of the cluster on the other side
+        sides = []
+        if x == x0:
+            sides.append((("v", cx - 1, cy), (cx - 1, cy)))
+            if y == y0:
+                sides.append((("d", cx - 1, cy - 1), (cx - 1, cy - 1)))
+            if y == y1 - 1:
+                sides.append((("a", cx - 1, cy), (cx - 1, cy + 1)))
+        if x == x1 - 1:
+            sides.append((("v", cx, cy), (cx + 1, cy)))
+            if y == y0:
+                sides.append((("a", cx, cy - 1), (cx + 1, cy - 1)))
+            if y == y1 - 1:
+                sides.append((("d", cx, cy), (cx + 1, cy + 1)))
+        if y == y0:
+            sides.append((("h", cx, cy - 1), (cx, cy - 1)))
+        if y == y1 - 1:
+            sides.append((("h", cx, cy), (cx, cy + 1)))
+        for border, other in sides:
+            if self.__borders.pop(border, None) is not None:
+                self.__graphs.pop(other, None)
+
+    def block(self, x, y):
+        """ Makes the cell (x, y) a wall; positions out of the grid already
+        are, so they are ignored """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.set_cost(x, y, INF)
+
+    def heuristic(self, a, b):
+        """ Octile distance with the cheapest multiplier of the grid
+        @return the estimate """
+        dx = abs(a[0] - b[0])
+        dy = abs(a[1] - b[1])
+        if dx < dy:
+            dx, dy = dy, dx
+        return (self.__h_diag * dy + self.__h_line * (dx - dy)) * self.__min_factor
+
+    def __octile(self, a, b):
+        """ Cost of the best path between two cells of a uniform cluster """
+        dx = abs(a[0] - b[0])
+        dy = abs(a[1] - b[1])
+        if dx < dy:
+            dx, dy = dy, dx
+        return (self.cost_diag * dy + self.cost_line * (dx - dy)) * VS.OBST_NONE
+
+    def __uniform(self, cluster):
+        return self.__octile_exact and self.__odd[cluster[0]][cluster[1]] == 0
+
+    def __cluster(self, cluster):
+        """ @return the GridPathfinder of a cluster, built on first use """
+        pf = self.__clusters.get(cluster)
+        if pf is None:
+            x0, y0, x1, y1 = self.cluster_bounds(cluster)
+            pf = GridPathfinder(self.costs[x0:x1, y0:y1], self.cost_line, self.cost_diag)
+            self.__clusters[cluster] = pf
+        return pf
+
+    def __border(self, border):
+        """ Transitions of a border between two clusters: ("v", cx, cy) is
+        the one between (cx, cy) and (cx + 1, cy), ("h", cx, cy) the one
+        between (cx, cy) and (cx, cy + 1); and of a corner: ("d", cx, cy)
+        is the diagonal step between (cx, cy) and (cx + 1, cy + 1), ("a",
+        cx, cy) the one between (cx, cy + 1) and (cx + 1, cy)
+        @return list of (a, b, cost a->b, cost b->a), a in the first
+        cluster and b in the second """
+        transitions = self.__borders.get(border)
+        if transitions is not None:
+            return transitions
+        kind, cx, cy = border
+        x0, y0, x1, y1 = self.cluster_bounds((cx, cy))
+        if kind == "d" or kind == "a":
+            if kind == "d":
+                a, b = (x1 - 1, y1 - 1), (x1, y1)
+            else:
+                a, b = (x1 - 1, y1), (x1, y1 - 1)
+            cost_a = float(self.costs[a])
+            cost_b = float(self.costs[b])
+            transitions = []
+            if cost_a != INF and cost_b != INF:
+                transitions.append((a, b, self.cost_diag * cost_b, self.cost_diag * cost_a))
+            self.__borders[border] = transitions
+            return transitions
+
+        if kind == "v":
+            side_a = self.costs[x1 - 1, y0:y1]
+            side_b = self.costs[x1, y0:y1]
+            def cells(i):
+                return (x1 - 1, y0 + i), (x1, y0 + i)
+        else:
+            side_a = self.costs[x0:x1, y1 - 1]
+            side_b = self.costs[x0:x1, y1]
+            def cells(i):
+                return (x0 + i, y1 - 1), (x0 + i, y1)
+
+        transitions = []
+        free = (side_a != INF) & (side_b != INF)
+        i = 0
+        size = len(free)
+        while i < size:
+            if not free[i]:
+                i += 1
+                continue
+            end = i
+            while end < size and free[end]:
+                end += 1
+            if end - i >= LONG_ENTRANCE:
+                picks = list(range(i, end - 1, ENTRANCE_SPACING)) + [end - 1]
+            else:
+                picks = ((i + end - 1) // 2,)
+            for k in picks:
+                a, b = cells(k)
+                transitions.append((a, b, self.cost_line * float(side_b[k]),
+                                    self.cost_line * float(side_a[k])))
+            i = end
+
+        # diagonal steps across the border between two positions where no
+        # facing pair is free: the only way across there
+        open_a = side_a != INF
+        open_b = side_b != INF
+        for k in range(size - 1):
+            if free[k] or free[k + 1]:
+                continue
+            if open_a[k] and open_b[k + 1]:
+                a, _ = cells(k)
+                _, b = cells(k + 1)
+                transitions.append((a, b, self.cost_diag * float(side_b[k + 1]),
+                                    self.cost_diag * float(side_a[k])))
+            if open_a[k + 1] and open_b[k]:
+                a, _ = cells(k + 1)
+                _, b = cells(k)
+                transitions.append((a, b, self.cost_diag * float(side_b[k]),
+                                    self.cost_diag * float(side_a[k + 1])))
+        self.__borders[border] = transitions
+        return transitions
+
+    def __graph(self, cluster):
+        """ Abstract edges from the nodes of a cluster, built on first use
+        @return dict node -> list of (node, cost) """
+        graph = self.__graphs.get(cluster)
+        if graph is not None:
+            return graph
+        cx, cy = cluster
+        graph = {}
+        left = cx > 0
+        right = cx + 1 < self.n_cx
+        up = cy > 0
+        down = cy + 1 < self.n_cy
+        # (border or corner, True if the cluster is its first one)
+        borders = []
+        if left:
+            borders.append((("v", cx - 1, cy), False))
+        if right:
+            borders.append((("v", cx, cy), True))
+        if up:
+            borders.append((("h", cx, cy - 1), False))
+        if down:
+            borders.append((("h", cx, cy), True))
+        if left and up:
+            borders.append((("d", cx - 1, cy - 1), False))
+        if right and down:
+            borders.append((("d", cx, cy), True))
+        if right and up:
+            borders.append((("a", cx, cy - 1), True))
+        if left and down:
+            borders.append((("a", cx - 1, cy), False))
+        for border, first in borders:
+            for a, b, cost_ab, cost_ba in self.__border(border):
+                if first:
+                    graph.setdefault(a, []).append((b, cost_ab))
+                else:
+                    graph.setdefault(b, []).append((a, cost_ba))
+
+        nodes = list(graph)
+        for node, costs in zip(nodes, self.__costs_from(cluster, nodes, nodes)):
+            edges = graph[node]
+            for other, cost in costs.items():
+                if other != node:
+                    edges.append((other, cost))
+        self.__graphs[cluster] = graph
+        return graph
+
+    def __costs_from(self, cluster, sources, targets, reverse=False):
+        """ Costs of the paths inside a cluster between each source and the
+        targets
+        @return one dict target -> cost per source, without the targets
+        that cannot be reached """
+        if self.__uniform(cluster):
+            return [{t: self.__octile(s, t) for t in targets} for s in sources]
+        pf = self.__cluster(cluster)
+        x0, y0, _, _ = self.cluster_bounds(cluster)
+        local = [(x - x0, y - y0) for x, y in targets]
+        result = []
+        expansions = pf.expansions
+        for x, y in sources:
+            found = pf.distances((x - x0, y - y0), local, reverse)
+            result.append({(lx + x0, ly + y0): cost for (lx, ly), cost in found.items()})
+        self.expansions += pf.expansions - expansions
+        return result
+
+    def __local_moves(self, cluster, a, b, jps):
+        """ Moves of the best path from a to b inside a cluster
+        @return a tuple (moves, cost), ([], inf) if there is none """
+        if self.__uniform(cluster):
+            dx = b[0] - a[0]
+            dy = b[1] - a[1]
+            sx = (dx > 0) - (dx < 0)
+            sy = (dy > 0) - (dy < 0)
+            diag = min(abs(dx), abs(dy))
+            moves = [(sx, sy)] * diag
+            if abs(dx) > diag:
+                moves += [(sx, 0)] * (abs(dx) - diag)
+            else:
+                moves += [(0, sy)] * (abs(dy) - diag)
+            return moves, self.__octile(a, b)
+        pf = self.__cluster(cluster)
+        x0, y0, _, _ = self.cluster_bounds(cluster)
+        expansions = pf.expansions
+        moves, cost = pf.search((a[0] - x0, a[1] - y0), (b[0] - x0, b[1] - y0), jps)
+        self.expansions += pf.expansions - expansions
+        if a != b and not moves:
+            return [], INF
+        return moves, cost
+
+    def __window(self, c_a, c_b, ring):
+        """ @return (x0, y0, x1, y1): the rectangle of two clusters (the
+        same one or neighbours) grown by ring clusters on each side """
+        cs = self.cluster_size
+        x0 = max(min(c_a[0], c_b[0]) - ring, 0) * cs
+        y0 = max(min(c_a[1], c_b[1]) - ring, 0) * cs
+        x1 = min((max(c_a[0], c_b[0]) + ring + 1) * cs, self.width)
+        y1 = min((max(c_a[1], c_b[1]) + ring + 1) * cs, self.height)
+        return x0, y0, x1, y1
+
+    def __window_moves(self, window, a, b, jps):
+        """ Moves of the best path from a to b inside a rectangle, with a
+        GridPathfinder made for the query
+        @return a tuple (moves, cost), ([], inf) if there is none """
+        x0, y0, x1, y1 = window
+        pf = GridPathfinder(self.costs[x0:x1, y0:y1], self.cost_line, self.cost_diag)
+        moves, cost = pf.search((a[0] - x0, a[1] - y0), (b[0] - x0, b[1] - y0), jps)
+        self.expansions += pf.expansions
+        return moves, cost
+
+    def __leave_bound(self, window, a, b):
+        """ Lower bound of the cost of the paths from a to b that leave a
+        rectangle: they go out and back through one of its sides
+        @return the bound, inf if the rectangle is the whole grid """
+        x0, y0, x1, y1 = window
+        bound = INF
+        if x0 > 0:
+            bound = min(bound, a[0] + b[0] - 2 * (x0 - 1))
+        if x1 < self.width:
+            bound = min(bound, 2 * x1 - a[0] - b[0])
+        if y0 > 0:
+            bound = min(bound, a[1] + b[1] - 2 * (y0 - 1))
+        if y1 < self.height:
+            bound = min(bound, 2 * y1 - a[1] - b[1])
+        return bound * self.__h_line * self.__min_factor
+
+    def search(self, start, goal, jps=False):
+        """ Path from start to goal through the abstract graph. The goals in
+        the cluster of start or in a neighbouring one are searched first
+        inside those clusters, then inside them and the clusters around them
+        (a bounded A*, at most 4 x 3 clusters), and through the graph only
+        when both miss. The paths through the graph may cost more than the
+        best ones: on random maps with walls and terrains, about 2% more on
+        average with clusters of 16 cells (at worst 1.2 times as much) and
+        4% with clusters of 4 to 11 cells (at worst 1.9 times as much)
+        @param start: (x, y) in the grid
+        @param goal: (x, y) in the grid
+        @param jps: True uses Jump Point Search in the searches inside the
+        clusters
+        @return a tuple (moves, cost): the list of (dx, dy) of the path and
+        its cost; ([], 0.0) if start is goal and ([], inf) if there is no
+        path: the graph connects the same cells as the grid """
+        if start == goal:
+            return [], 0.0
+        if self.get_cost(*goal) == INF:
+            return [], INF
+        c_start = self.cluster_of(*start)
+        c_goal = self.cluster_of(*goal)
+        if abs(c_start[0] - c_goal[0]) <= 1 and abs(c_start[1] - c_goal[1]) <= 1:
+            # same or neighbouring clusters: the transitions would force a
+            # detour on short paths, so search the clusters at once, and
+            # then with the clusters around them, unless no path going out
+            # of the clusters can be cheaper
+            window = self.__window(c_start, c_goal, 0)
+            if c_start == c_goal:
+                moves, cost = self.__local_moves(c_start, start, goal, jps)
+            else:
+                moves, cost = self.__window_moves(window, start, goal, jps)
+            if not moves or cost > self.__leave_bound(window, start, goal):
+                wider, wider_cost = self.__window_moves(self.__window(c_start, c_goal, 1),
+                                                        start, goal, jps)
+                if wider:
+                    moves, cost = wider, wider_cost
+            if moves:
+                return moves, cost
+
+        # start and goal join the graph with edges to the nodes of their
+        # clusters
+        start_nodes = list(self.__graph(c_start))
+        start_edges = list(self.__costs_from(c_start, [start], start_nodes)[0].items())
+        goal_nodes = list(self.__graph(c_goal))
+        goal_edges = self.__costs_from(c_goal, [goal], goal_nodes, reverse=True)[0]
+
+        # a start on a wall (search starts anywhere, as GridPathfinder's)
+        # is in no entrance: its steps into the neighbouring clusters join
+        # the graph through the cell they reach
+        steps_out = {}   # cell out of the cluster of start -> its edges
+        if self.get_cost(*start) == INF:
+            for dx, dy in DELTAS:
+                v = (start[0] + dx, start[1] + dy)
+                factor = self.get_cost(*v)
+                c_v = self.cluster_of(*v)
+                if factor == INF or c_v == c_start:
+                    continue
+                start_edges.append((v, (self.cost_diag if dx and dy else self.cost_line) * factor))
+                nodes = list(self.__graph(c_v))
+                steps_out[v] = list(self.__costs_from(c_v, [v], nodes)[0].items())
+
+        g = {start: 0.0}
+        parent = {}
+        closed = set()
+        h = self.heuristic(start, goal)
+        heap = [(h, h, start)]
+        found = False
+        while heap:
+            _, _, u = heapq.heappop(heap)
+            if u in closed:
+                continue
+            closed.add(u)
+            self.expansions += 1
+            if u == goal:
+                found = True
+                break
+            edges = self.__graph(self.cluster_of(*u)).get(u, [])
+            if u == start:
+                edges = edges + start_edges
+            elif u in steps_out:
+                edges = edges + steps_out[u]
+            if u in goal_edges:
+                edges = edges + [(goal, goal_edges[u])]
+            gu = g[u]
+            for v, cost in edges:
+                if v in closed:
+                    continue
+                ng = gu + cost
+                if ng >= g.get(v, INF):
+                    continue
+                g[v] = ng
+                parent[v] = u
+                h = self.heuristic(v, goal)
+                heapq.heappush(heap, (ng + h, h, v))
+
+        if not found:
+            return [], INF
+
+        nodes = [goal]
+        while nodes[-1] != start:
+            nodes.append(parent[nodes[-1]])
+        nodes.reverse()
+
+        # refinement: a step across a border, or a path inside a cluster
+        moves = []
+        for a, b in zip(nodes, nodes[1:]):
+            ca = self.cluster_of(*a)
+            if ca != self.cluster_of(*b):
+                moves.append((b[0] - a[0], b[1] - a[1]))
+            else:
+                moves += self.__local_moves(ca, a, b, jps)[0]
+        return moves, g[goal]
@@ -0,0 +1,94 @@
+""" METRICS
+    Incremental counters of found and saved victims. They are updated by
+    PhysAgent at the moment a reading of vital signals or a first aid
+    succeeds, so any statistic can be read in O(1) during or after a run. """
+
+
+class VictimTally:
+    """ A set of victims plus its counters per triage class (0 GRN, 1 YEL,
+    2 RED, 3 BLK) and the running sum of their survival probabilities """
+
+    def __init__(self, tri, sobr):
+        """ @param tri: positional list with the triage class of each victim
+        @param sobr: positional list with the survival prob. of each victim """
+        self.__tri = tri
+        self.__sobr = sobr
+        self.ids = set()            # ids of the victims in the tally
+        self.tri_count = [0, 0, 0, 0]  # number of victims per triage class
+        self.sum_sobr = 0.0         # sum of sobr of the victims
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, vic_id):
+        """ Adds a victim, ignoring repetitions
+        @return True if the victim was not in the tally """
+        if vic_id in self.ids:
+            return False
+
+        self.ids.add(vic_id)
+        self.tri_count[self.__tri[vic_id]] += 1
+        self.sum_sobr += self.__sobr[vic_id]
+        return True
+
+    def clear(self):
+        """ Removes all the victims """
+        self.ids.clear()
+        self.tri_count = [0, 0, 0, 0]
+        self.sum_sobr = 0.0
+
+    def weighted(self, total):
+        """ Number of victims weighted by triage class (3 for GRN, YEL and
+        RED, 1 for BLK) relative to the same value for all victims
+        @param total: the tally with all the victims of the environment
+        @return the weighted ratio (Veg or Vsg) """
+        c = self.tri_count
+        t = total.tri_count
+        den = 3*t[0] + 3*t[1] + 3*t[2] + t[3]
+        if den == 0:
+            return 0.0
+        return (3*c[0] + 3*c[1] + 3*c[2] + c[3]) / den
+
+
+class Metrics:
+    """ Found and saved victims per agent and for all agents """
+
+    def __init__(self, tri, sobr):
+        """ @param tri: positional list with the triage class of each victim
+        @param sobr: positional list with the survival prob. of each victim """
+        self.__tri = tri
+        self.__sobr = sobr
+
+        # all the victims of the environment
+        self.total = VictimTally(tri, sobr)
+        for v in range(len(tri)):
+            self.total.add(v)
+
+        self.found = VictimTally(tri, sobr)  # found by at least one agent
+        self.saved = VictimTally(tri, sobr)  # saved by at least one agent
+        self.found_by = {}  # physical agent -> VictimTally of found victims
+        self.saved_by = {}  # physical agent -> VictimTally of saved victims
+
+    def add_agent(self, phy):
+        """ Creates the (empty) tallies of a physical agent """
+        self.found_by[phy] = VictimTally(self.__tri, self.__sobr)
+        self.saved_by[phy] = VictimTally(self.__tri, self.__sobr)
+
+    def clear(self):
+        """ Forgets every found and saved victim, keeping the agents """
+        self.found.clear()
+        self.saved.clear()
+        for tally in self.found_by.values():
+            tally.clear()
+        for tally in self.saved_by.values():
+            tally.clear()
+
+    def add_found(self, phy, vic_id):
+        """ The agent phy successfully read the vital signals of vic_id """
+        self.found_by[phy].add(vic_id)
+        self.found.add(vic_id)
+
+    def add_saved(self, phy, vic_id):
+        """ The agent phy successfully delivered first aid to vic_id """
+        self.saved_by[phy].add(vic_id)
+        self.saved.add(vic_id)
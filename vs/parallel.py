@@ -0,0 +1,308 @@
+""" PARALLEL DELIBERATION
+    Runs the deliberate() calls of independent agents of one cycle in a
+    pool of worker processes (see Env(workers=...)). An agent is
+    independent while its mind says so (AbstAgent.deliberates_alone): its
+    next deliberate reads and writes only its own data and its own body, so
+    running it at the same time as other independent agents gives the same
+    result as running them one after the other.
+
+    Each worker process loads its own copy of the static environment
+    (obstacles, victims and vital signals, from the binary cache of the
+    folders, see vs/env_cache.py). The first time an agent is independent,
+    its mind is pickled once to a worker, which keeps it with a copy of the
+    body (RemoteBody). From then on each cycle only sends the indexes of the
+    agents to run, and the worker answers, per agent, what deliberate
+    returned, the new position and remaining time of the body, the effects
+    of its actions on the state shared by all the agents (visited cells,
+    found and saved victims, action log) as small tuples, and what it
+    printed. The environment applies them to the real bodies one agent at a
+    time in the order of the agents, so a parallel run prints and records
+    the same as a serial run with the same random draws (each agent has its
+    own generator, see Env.run).
+
+    When an agent stops being independent (e.g. the chief explorer starts
+    waiting for the others, or an explorer is done), the worker pickles its
+    mind back once and the state is loaded into the mind object of the main
+    process, so the other agents and the caller keep their references. """
+
+import io
+import pickle
+import multiprocessing
+import traceback
+from contextlib import redirect_stdout
+from .constants import VS
+from .physical_agent import PhysAgent
+from .profiler import Profiler
+
+# fields of a body copied to a worker with the mind and back with it
+BODY_FIELDS = ("x", "y", "x_base", "y_base", "_rtime", "_state", "_blocked_on",
+               "_plan", "_plan_next", "_plan_min_rtime", "_plan_result", "_plan_left")
+
+
+class _StatePickler(pickle.Pickler):
+    """ Pickles the state of a mind leaving out the mind itself, its body
+    and the environment: they are replaced by the ones on the other side """
+
+    def __init__(self, file, refs):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.refs = {id(obj): name for name, obj in refs.items()}
+
+    def persistent_id(self, obj):
+        return self.refs.get(id(obj))
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, file, refs):
+        super().__init__(file)
+        self.refs = refs
+
+    def persistent_load(self, pid):
+        return self.refs[pid]
+
+
+def dump_mind(mind, body, env):
+    """ @return the bytes of the state (__dict__) of a mind """
+    buf = io.BytesIO()
+    _StatePickler(buf, {"mind": mind, "body": body, "env": env}).dump(mind.__dict__)
+    return buf.getvalue()
+
+
+def load_mind(data, mind, body, env):
+    """ Replaces the state of mind by the one dumped by dump_mind """
+    state = _StateUnpickler(io.BytesIO(data), {"mind": mind, "body": body, "env": env}).load()
+    mind.__dict__.clear()
+    mind.__dict__.update(state)
+
+
+class _Recording:
+    """ Stands for the recorder of the main process in a worker: the records
+    of the actions go back to it as effects (see RemoteBody) """
+
+    def record(self, idx, op, dx, dy, result):
+        pass
+
+
+class RemoteBody(PhysAgent):
+    """ Copy of the body of an agent in a worker process. It acts on the
+    copy of the environment of the worker and keeps, in effects, what the
+    real body must apply to the shared state """
+
+    def __init__(self, env, idx):
+        # no PhysAgent.__init__: the fields come from the real body
+        self.env = env
+        self.mind = None
+        self._idx = idx
+        self.effects = []   # (name, args) of the side effects of the turn
+
+    def _share(self, effect, *args):
+        if getattr(effect, "__self__", None) is self:
+            # found and saved victims: a private method of the body
+            name = effect.__name__
+            if name.startswith("__"):
+                name = "_PhysAgent" + name
+            self.effects.append((name, args))
+        else:
+            # recorder.record(idx, op, dx, dy, result)
+            self.effects.append(("record", args[1:]))
+
+    def _walk(self, dx, dy):
+        result = super()._walk(dx, dy)
+        if result == VS.EXECUTED:
+            self.effects.append(("visit", (self.x, self.y)))
+        return result
+
+
+def _serve(conn, vict_folder, env_folder, use_cache, profile):
+    """ Main loop of a worker process: runs the turns of the agents it
+    keeps, as asked by ParallelDeliberation """
+    from .environment import Env
+
+    with redirect_stdout(io.StringIO()):
+        env = Env(vict_folder, env_folder, headless=True, profile=False,
+                  use_cache=use_cache, workers=0)
+    profiler = Profiler() if profile else None
+    bodies = {}   # index of the agent -> RemoteBody
+    planes = {}   # index of the agent -> its plane in env.visited, kept
+                  # for the next times the agent comes back to this worker
+
+    def give_back(idx):
+        body = bodies.pop(idx)
+        return (dump_mind(body.mind, body, env),
+                {field: getattr(body, field) for field in BODY_FIELDS})
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        try:
+            if message[0] == "return":
+                conn.send(("ok", [(idx, give_back(idx)) for idx in list(bodies)]))
+                continue
+
+            _, cycle, recording, turns = message
+            env.cycle = cycle
+            env.recorder = recording
+            answers = []
+            for idx, moved in turns:
+                if moved is not None:
+                    cls, data, fields = moved
+                    plane = planes.get(idx)
+                    if plane is None:
+                        plane = planes[idx] = env.visited.add_agent()
+                    body = RemoteBody(env, plane)
+                    for field, value in fields.items():
+                        setattr(body, field, value)
+                    body.mind = cls.__new__(cls)
+                    load_mind(data, body.mind, body, env)
+                    bodies[idx] = body
+                body = bodies[idx]
+
+                out = io.StringIO()
+                call = None
+                with redirect_stdout(out):
+                    if profiler is not None:
+                        more_actions_to_do, call = profiler.measure(cycle, body)
+                    elif body._plan is not None:
+                        body._plan_step()
+                        more_actions_to_do = True
+                    else:
+                        more_actions_to_do = body.mind.deliberate()
+
+                # the mind goes back to the main process when the agent will
+                # not run here anymore
+                back = None
+                if (not more_actions_to_do or body._end_of_time() or
+                        (body._plan is None and not body.mind.deliberates_alone())):
+                    back = give_back(idx)
+                answers.append((idx, more_actions_to_do, body.x, body.y, body._rtime,
+                                body.effects, out.getvalue(), call, back))
+                body.effects = []
+            conn.send(("ok", answers))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+class ParallelDeliberation:
+    def __init__(self, env, workers):
+        """ @param env: the environment whose agents deliberate
+        @param workers: number of worker processes """
+        self.env = env
+        self.workers = workers
+        self.__conns = []
+        self.__procs = []
+        self.__remote = {}   # PhysAgent -> index of the worker that keeps its mind
+        self.__next = 0      # worker of the next agent to be moved
+
+    def start(self):
+        """ Starts the worker processes """
+        env = self.env
+        for _ in range(self.workers):
+            conn, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(
+                target=_serve, daemon=True,
+                args=(child, env.vict_folder, env.env_folder, env.use_cache,
+                      env.profiler is not None))
+            proc.start()
+            child.close()
+            self.__conns.append(conn)
+            self.__procs.append(proc)
+
+    def stop(self):
+        """ Brings the minds still kept by the workers back to the main
+        process and stops the workers """
+        try:
+            for w, conn in enumerate(self.__conns):
+                if self.__procs[w].is_alive():
+                    conn.send(("return",))
+                    for idx, back in self.__receive(w):
+                        self.__take_back(self.env.agents[idx], back)
+        finally:
+            for conn, proc in zip(self.__conns, self.__procs):
+                if proc.is_alive():
+                    conn.send(None)
+                proc.join()
+                conn.close()
+            self.__conns = []
+            self.__procs = []
+            self.__remote.clear()
+
+    def is_remote(self, phy):
+        """ @return True if the mind of the agent is kept by a worker """
+        return phy in self.__remote
+
+    def takes(self, phy):
+        """ @return True if the next turn of the agent runs in a worker """
+        return phy in self.__remote or phy.mind.deliberates_alone()
+
+    def __receive(self, w):
+        status, answer = self.__conns[w].recv()
+        if status == "error":
+            raise RuntimeError(f"worker {w} failed:\n{answer}")
+        return answer
+
+    def __take_back(self, phy, back):
+        """ Loads the mind and the body sent back by a worker """
+        data, fields = back
+        load_mind(data, phy.mind, phy, self.env)
+        for field, value in fields.items():
+            setattr(phy, field, value)
+        self.__remote.pop(phy, None)
+
+    def run(self, agents, cycle):
+        """ Runs the turns of independent agents in the workers, then
+        applies their shared side effects and prints their output in the
+        order of agents
+        @param agents: list of PhysAgent
+        @param cycle: the current cycle
+        @return a generator of tuples (phy, what its deliberate returned),
+        in order; the effects of an agent are applied when it is yielded """
+        env = self.env
+        turns = [[] for _ in self.__conns]
+        for phy in agents:
+            moved = None
+            if phy not in self.__remote:
+                self.__remote[phy] = self.__next
+                self.__next = (self.__next + 1) % self.workers
+                fields = {field: getattr(phy, field) for field in BODY_FIELDS}
+                moved = (type(phy.mind), dump_mind(phy.mind, phy, env), fields)
+            turns[self.__remote[phy]].append((phy._idx, moved))
+
+        recording = None if env.recorder is None else _Recording()
+        busy = [w for w, batch in enumerate(turns) if batch]
+        for w in busy:
+            self.__conns[w].send(("turns", cycle, recording, turns[w]))
+        # every worker answers before an error is raised, so that no answer
+        # is left in the pipes
+        replies = [self.__conns[w].recv() for w in busy]
+        answers = {}
+        for w, (status, answer) in zip(busy, replies):
+            if status == "error":
+                raise RuntimeError(f"worker {w} failed:\n{answer}")
+            for turn in answer:
+                answers[turn[0]] = turn
+
+        profiler = env.profiler
+        recorder = env.recorder
+        visited = env.visited
+        dirty = env.dirty_cells
+        for phy in agents:
+            _, more_actions_to_do, x, y, rtime, effects, output, call, back = answers[phy._idx]
+            phy.x = x
+            phy.y = y
+            phy._rtime = rtime
+            for name, args in effects:
+                if name == "visit":
+                    if visited.mark(phy._idx, *args) and dirty is not None:
+                        dirty.add(args)
+                elif name == "record":
+                    if recorder is not None:
+                        recorder.record(phy._idx, *args)
+                else:
+                    getattr(phy, name)(*args)
+            if back is not None:
+                self.__take_back(phy, back)
+            if output:
+                print(output, end="")
+            if call is not None:
+                profiler.calls.append(call)
+            yield phy, more_actions_to_do
@@ -0,0 +1,566 @@
+""" PATHFINDING
+    A* over a grid of cells with a terrain multiplier per cell, for any
+    agent that plans walks (see AbstAgent.walk and walk_plan). The grid is
+    given as a NumPy array indexed by [x, y] like Env.obst, with the same
+    encoding: the multiplier of the base cost of a step into the cell, and
+    VS.OBST_WALL (or inf) for cells that cannot be entered. A mind builds
+    one from what it knows of the map and keeps it up to date with
+    set_cost as it learns.
+
+    Cells are flat integer ids over the grid padded with one wall on each
+    side, so the neighbours of any cell of the grid are valid ids and the
+    search never leaves the grid. g-scores, parents and the closed set are
+    lists allocated once and stamped with the number of the search that
+    wrote them, so a search does not clear nor allocate them. Python lists
+    and not NumPy arrays: reading one element of a list is several times
+    faster than reading one of an array.
+
+    search(..., jps=True) runs Jump Point Search (Harabor and Grastien,
+    2011): on cells of multiplier VS.OBST_NONE, the straight and diagonal
+    lines that an optimal path may follow are scanned without pushing
+    their cells, and only the cells where the path may turn (next to a
+    wall, at the goal) enter the open list. Cells near a passable cell of
+    another multiplier stop the scans and are expanded in every direction,
+    as by A*, so the search stays optimal on weighted maps and falls back
+    to A* where the terrain varies. JPS needs
+    cost_line <= cost_diag <= 2 * cost_line; otherwise jps=True runs A*.
+    As in JPS+, the end of the straight scan from each cell in each of the
+    4 straight directions is kept in tables, so a straight scan is one
+    lookup and a diagonal scan one lookup per cell. set_cost only marks the
+    rows and columns around the cell; they are recomputed, with NumPy, by
+    the next JPS search. """
+
+import heapq
+from array import array
+import numpy as np
+from .constants import VS
+
+INF = float("inf")
+
+# deltas of the moves, in the order of AbstAgent.AC_INCR
+DELTAS = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+
+
+class GridPathfinder:
+    def __init__(self, costs, cost_line=1.0, cost_diag=1.5):
+        """ @param costs: NumPy array (width, height) with the terrain
+        multiplier of each cell; VS.OBST_WALL or more, or inf, is a wall
+        @param cost_line: base cost of a horizontal or vertical step
+        @param cost_diag: base cost of a diagonal step """
+        costs = np.asarray(costs, dtype=np.float64)
+        self.width, self.height = costs.shape
+        self.cost_line = cost_line
+        self.cost_diag = cost_diag
+        self.__pad_h = self.height + 2
+
+        pad = np.full((self.width + 2, self.height + 2), INF)
+        pad[1:-1, 1:-1] = np.where(costs >= VS.OBST_WALL, INF, costs)
+        self.__cost = pad.ravel().tolist()
+        free = costs[costs < VS.OBST_WALL]
+        self.__min_factor = float(free.min()) if free.size else 1.0
+
+        self.__search = 0
+        self.__alloc_buffers()
+
+        # (id offset, base cost) of each move
+        self.__moves = [(dx * self.__pad_h + dy,
+                         cost_diag if dx != 0 and dy != 0 else cost_line)
+                        for dx, dy in DELTAS]
+
+        # cheapest base costs of a straight and of a diagonal displacement,
+        # for an admissible octile heuristic whatever the two costs are
+        self.__h_line = min(cost_line, cost_diag)
+        self.__h_diag = min(cost_diag, 2 * self.__h_line)
+
+        # cells with a passable cell of multiplier other than VS.OBST_NONE
+        # in their 3x3 neighbourhood: the scans of JPS stop there
+        odd = (pad != VS.OBST_NONE) & (pad != INF)
+        near = np.zeros((self.width + 4, self.height + 4), dtype=bool)
+        for dx in range(3):
+            for dy in range(3):
+                near[dx:dx + self.width + 2, dy:dy + self.height + 2] |= odd
+        self.__mixed = near[1:-1, 1:-1].ravel().tolist()
+        self.__around = [dx * self.__pad_h + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+        self.__jps = cost_line <= cost_diag <= 2 * cost_line
+
+        self.__alloc_scans()
+
+        self.expansions = 0   # cells expanded by all the searches
+
+    def __alloc_buffers(self):
+        """ Allocates the lists written by the searches """
+        n = len(self.__cost)
+        self.__g = [0.0] * n
+        self.__parent = [0] * n
+        self.__seen = [0] * n      # number of the search that set g and parent
+        self.__closed = [0] * n    # number of the search that expanded the cell
+        # padded x and y of every id, for the heuristic without a divmod
+        # (built so that equal coordinates share one int object)
+        self.__xs = [x for x in range(self.width + 2) for _ in range(self.__pad_h)]
+        self.__ys = list(range(self.__pad_h)) * (self.width + 2)
+
+    def __alloc_scans(self):
+        """ Allocates the tables of the straight scans, all to be computed """
+        n = len(self.__cost)
+        # for each cell, the x (rows) or y (columns) of the end of the
+        # straight scan towards +x, -x, +y and -y; lines to recompute
+        self.__scan_px = array("i", bytes(4 * n))
+        self.__scan_mx = array("i", bytes(4 * n))
+        self.__scan_py = array("i", bytes(4 * n))
+        self.__scan_my = array("i", bytes(4 * n))
+        self.__dirty_rows = set(range(1, self.height + 1))
+        self.__dirty_cols = set(range(1, self.width + 1))
+
+    def __getstate__(self):
+        # the buffers of the searches and the scan tables are not pickled
+        # but allocated and computed again: a mind moved to a worker process
+        # (see vs/parallel.py) carries only the map
+        state = self.__dict__.copy()
+        for name in ("__g", "__parent", "__seen", "__closed", "__xs", "__ys",
+                     "__scan_px", "__scan_mx", "__scan_py", "__scan_my",
+                     "__dirty_rows", "__dirty_cols"):
+            del state["_GridPathfinder" + name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__alloc_buffers()
+        self.__alloc_scans()
+
+    @classmethod
+    def uniform(cls, width, height, factor=1.0, cost_line=1.0, cost_diag=1.5):
+        """ A grid where every cell has the same multiplier, e.g. the map of
+        a mind that knows nothing yet
+        @return a GridPathfinder """
+        return cls(np.full((width, height), factor), cost_line, cost_diag)
+
+    def cell_id(self, x, y):
+        """ @return the flat id of the cell (x, y) """
+        return (x + 1) * self.__pad_h + (y + 1)
+
+    def cell_xy(self, cell):
+        """ @return the (x, y) of a flat id """
+        x, y = divmod(cell, self.__pad_h)
+        return x - 1, y - 1
+
+    def get_cost(self, x, y):
+        """ @return the multiplier of the cell, inf for walls and for
+        positions out of the grid """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.__cost[self.cell_id(x, y)]
+        return INF
+
+    def set_cost(self, x, y, factor):
+        """ Changes the multiplier of one cell of the grid
+        @param factor: the new multiplier; VS.OBST_WALL or more, or inf,
+        makes it a wall """
+        if factor >= VS.OBST_WALL:
+            factor = INF
+        elif factor < self.__min_factor:
+            self.__min_factor = factor
+        cell = self.cell_id(x, y)
+        self.__cost[cell] = factor
+        self.__update_mixed(cell)
+
+    def block(self, x, y):
+        """ Makes the cell (x, y) a wall; positions out of the grid already
+        are, so they are ignored (e.g. the VS.END of check_walls_and_lim) """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            cell = self.cell_id(x, y)
+            self.__cost[cell] = INF
+            self.__update_mixed(cell)
+
+    def __update_mixed(self, cell):
+        """ Recomputes the JPS stops around a cell whose multiplier changed
+        and marks the scan tables of their rows and columns """
+        cost = self.__cost
+        xs = self.__xs
+        ys = self.__ys
+        for m in (cell + offset for offset in self.__around):
+            x = xs[m]
+            y = ys[m]
+            if 1 <= x <= self.width and 1 <= y <= self.height:
+                self.__mixed[m] = any(cost[m + offset] != VS.OBST_NONE and cost[m + offset] != INF
+                                      for offset in self.__around)
+                self.__dirty_rows.add(y)
+                self.__dirty_cols.add(x)
+
+    def __refresh_scans(self):
+        """ Recomputes the scan tables of the marked rows and columns: all
+        at once if they are many, else line by line """
+        cost = self.__cost
+        pad_h = self.__pad_h
+        pad_w = self.width + 2
+        if len(self.__dirty_rows) + len(self.__dirty_cols) > (pad_w + pad_h) // 8:
+            grid = np.array(cost).reshape(pad_w, pad_h)
+            px, mx = self.__scan_lines(grid[:, :-2], grid[:, 1:-1], grid[:, 2:])
+            py, my = self.__scan_lines(grid[:-2, :].T, grid[1:-1, :].T, grid[2:, :].T)
+            for table, ends, lines in ((self.__scan_px, px, np.s_[:, 1:-1]),
+                                       (self.__scan_mx, mx, np.s_[:, 1:-1]),
+                                       (self.__scan_py, py.T, np.s_[1:-1, :]),
+                                       (self.__scan_my, my.T, np.s_[1:-1, :])):
+                full = np.zeros((pad_w, pad_h), dtype=np.int32)
+                full[lines] = ends
+                table[:] = array("i", full.tobytes())
+        else:
+            for y in self.__dirty_rows:
+                plus, minus = self.__scan_lines(np.array(cost[y - 1::pad_h]), np.array(cost[y::pad_h]),
+                                                np.array(cost[y + 1::pad_h]))
+                self.__scan_px[y::pad_h] = array("i", plus.tobytes())
+                self.__scan_mx[y::pad_h] = array("i", minus.tobytes())
+            for x in self.__dirty_cols:
+                start = x * pad_h
+                plus, minus = self.__scan_lines(np.array(cost[start - pad_h:start]),
+                                                np.array(cost[start:start + pad_h]),
+                                                np.array(cost[start + pad_h:start + 2 * pad_h]))
+                self.__scan_py[start:start + pad_h] = array("i", plus.tobytes())
+                self.__scan_my[start:start + pad_h] = array("i", minus.tobytes())
+        self.__dirty_rows.clear()
+        self.__dirty_cols.clear()
+
+    @staticmethod
+    def __scan_lines(side_a, line, side_b):
+        """ Ends of the straight scans along lines of the padded grid
+        @param side_a, line, side_b: arrays of multipliers, the lines along
+        the first axis, and the lines beside them on each side
+        @return two int32 arrays of the shape of line: the position, along
+        the line, of the first wall, varying terrain or forced neighbour
+        after each cell towards +1 and before it towards -1 """
+        a = side_a
+        c = line
+        b = side_b
+        size = len(c)
+        wall = c == INF
+        wall_a = a == INF
+        wall_b = b == INF
+        odd = (((a != VS.OBST_NONE) & ~wall_a) | ((c != VS.OBST_NONE) & ~wall) |
+               ((b != VS.OBST_NONE) & ~wall_b))
+        mixed = odd.copy()
+        mixed[1:] |= odd[:-1]
+        mixed[:-1] |= odd[1:]
+        stop = wall | mixed
+
+        # a wall beside the cell and a free cell beside the next one
+        ahead = np.zeros(c.shape, dtype=bool)
+        ahead[:-1] = (wall_a[:-1] & ~wall_a[1:]) | (wall_b[:-1] & ~wall_b[1:])
+        behind = np.zeros(c.shape, dtype=bool)
+        behind[1:] = (wall_a[1:] & ~wall_a[:-1]) | (wall_b[1:] & ~wall_b[:-1])
+
+        pos = np.arange(size, dtype=np.int32).reshape((size,) + (1,) * (c.ndim - 1))
+        first = np.minimum.accumulate(np.where(stop | ahead, pos, size)[::-1], axis=0)[::-1]
+        plus = np.full(c.shape, size, dtype=np.int32)
+        plus[:-1] = first[1:]
+        last = np.maximum.accumulate(np.where(stop | behind, pos, -1), axis=0)
+        minus = np.full(c.shape, -1, dtype=np.int32)
+        minus[1:] = last[:-1]
+        return np.ascontiguousarray(plus), np.ascontiguousarray(minus)
+
+    def heuristic(self, a, b):
+        """ Octile distance between two cells with the cheapest multiplier
+        of the grid (never more than the cost of the best path)
+        @return the estimate """
+        dx = abs(a[0] - b[0])
+        dy = abs(a[1] - b[1])
+        if dx < dy:
+            dx, dy = dy, dx
+        return (self.__h_diag * dy + self.__h_line * (dx - dy)) * self.__min_factor
+
+    def search(self, start, goal, jps=False):
+        """ A* from start to goal. Ties between equal f are broken in favour
+        of the cell nearest to the goal, then of the lowest id, so the
+        result does not depend on the order of the pushes
+        @param start: (x, y) in the grid
+        @param goal: (x, y) in the grid
+        @param jps: True prunes the search with Jump Point Search (see the
+        module doc); the cost of the path is the same
+        @return a tuple (moves, cost): the list of (dx, dy) of the path and
+        its cost; ([], 0.0) if start is goal and ([], inf) if the goal
+        cannot be reached """
+        if start == goal:
+            return [], 0.0
+        if self.get_cost(*goal) == INF:
+            return [], INF
+
+        cost = self.__cost
+        g = self.__g
+        parent = self.__parent
+        seen = self.__seen
+        closed = self.__closed
+        moves = self.__moves
+        xs = self.__xs
+        ys = self.__ys
+        pad_h = self.__pad_h
+        h_line = self.__h_line * self.__min_factor
+        h_diag = self.__h_diag * self.__min_factor
+        gx, gy = goal[0] + 1, goal[1] + 1
+        goal_id = gx * pad_h + gy
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        self.__search += 1
+        search = self.__search
+        start_id = self.cell_id(*start)
+        g[start_id] = 0.0
+        seen[start_id] = search
+        h = self.heuristic(start, goal)
+        heap = [(h, h, start_id)]
+        expansions = 0
+
+        if jps and self.__jps:
+            return self.__search_jps(heap, start_id, goal_id)
+
+        while heap:
+            _, _, u = heappop(heap)
+            if closed[u] == search:
+                continue
+            closed[u] = search
+            expansions += 1
+            if u == goal_id:
+                self.expansions += expansions
+                return self.__moves_to(start_id, goal_id), g[goal_id]
+            gu = g[u]
+            for offset, step in moves:
+                v = u + offset
+                c = cost[v]
+                if c == INF or closed[v] == search:
+                    continue
+                ng = gu + step * c
+                if seen[v] == search and ng >= g[v]:
+                    continue
+                seen[v] = search
+                g[v] = ng
+                parent[v] = u
+                dx = xs[v] - gx
+                if dx < 0:
+                    dx = -dx
+                dy = ys[v] - gy
+                if dy < 0:
+                    dy = -dy
+                if dx < dy:
+                    h = h_diag * dx + h_line * (dy - dx)
+                else:
+                    h = h_diag * dy + h_line * (dx - dy)
+                heappush(heap, (ng + h, h, v))
+
+        self.expansions += expansions
+        return [], INF
+
+    def distances(self, source, targets, reverse=False):
+        """ Dijkstra from one cell to several, stopping when all of them are
+        reached
+        @param source: (x, y) in the grid
+        @param targets: list of (x, y) in the grid
+        @param reverse: False for the costs of the paths from source to each
+        target, True for the costs of the paths from each target to source
+        @return a dict target -> cost, without the targets that cannot be
+        reached """
+        cost = self.__cost
+        g = self.__g
+        seen = self.__seen
+        closed = self.__closed
+        moves = self.__moves
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        self.__search += 1
+        search = self.__search
+        source_id = self.cell_id(*source)
+        wanted = {self.cell_id(*t): t for t in targets}
+        found = {}
+        if reverse and cost[source_id] == INF:
+            # nothing steps into a wall; forwards, as in search, the cost of
+            # the source itself does not count
+            return found
+        g[source_id] = 0.0
+        seen[source_id] = search
+        heap = [(0.0, source_id)]
+        expansions = 0
+
+        while heap and len(found) < len(wanted):
+            gu, u = heappop(heap)
+            if closed[u] == search:
+                continue
+            closed[u] = search
+            expansions += 1
+            if u in wanted:
+                found[wanted[u]] = gu
+            cu = cost[u]
+            for offset, step in moves:
+                v = u + offset
+                c = cost[v]
+                if c == INF or closed[v] == search:
+                    continue
+                # backwards, the step goes from v into u
+                ng = gu + step * (cu if reverse else c)
+                if seen[v] == search and ng >= g[v]:
+                    continue
+                seen[v] = search
+                g[v] = ng
+                heappush(heap, (ng, v))
+
+        self.expansions += expansions
+        return found
+
+    def __search_jps(self, heap, start_id, goal_id):
+        """ The loop of search with Jump Point Search; the start is already
+        in heap """
+        if self.__dirty_rows or self.__dirty_cols:
+            self.__refresh_scans()
+        cost = self.__cost
+        g = self.__g
+        parent = self.__parent
+        seen = self.__seen
+        closed = self.__closed
+        mixed = self.__mixed
+        xs = self.__xs
+        ys = self.__ys
+        pad_h = self.__pad_h
+        h_line = self.__h_line * self.__min_factor
+        h_diag = self.__h_diag * self.__min_factor
+        gx = xs[goal_id]
+        gy = ys[goal_id]
+        jump = self.__jump
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        search = self.__search
+        expansions = 0
+
+        while heap:
+            _, _, u = heappop(heap)
+            if closed[u] == search:
+                continue
+            closed[u] = search
+            expansions += 1
+            if u == goal_id:
+                self.expansions += expansions
+                return self.__moves_to(start_id, goal_id), g[goal_id]
+
+            if u == start_id or mixed[u]:
+                directions = DELTAS
+            else:
+                # the way in: only the natural and the forced neighbours
+                # of the last move can start an optimal continuation
+                dx = xs[u] - xs[parent[u]]
+                dx = (dx > 0) - (dx < 0)
+                dy = ys[u] - ys[parent[u]]
+                dy = (dy > 0) - (dy < 0)
+                directions = [(dx, dy)]
+                if dx and dy:
+                    directions.append((dx, 0))
+                    directions.append((0, dy))
+                    back = u - dx * pad_h
+                    if cost[back] == INF and cost[back + dy] != INF:
+                        directions.append((-dx, dy))
+                    if cost[u - dy] == INF and cost[u + dx * pad_h - dy] != INF:
+                        directions.append((dx, -dy))
+                elif dx:
+                    for side in (1, -1):
+                        if cost[u + side] == INF and cost[u + dx * pad_h + side] != INF:
+                            directions.append((dx, side))
+                else:
+                    for side in (1, -1):
+                        if cost[u + side * pad_h] == INF and cost[u + side * pad_h + dy] != INF:
+                            directions.append((side, dy))
+
+            gu = g[u]
+            for dx, dy in directions:
+                found = jump(u, dx, dy, goal_id)
+                if found is None:
+                    continue
+                v, way = found
+                if closed[v] == search:
+                    continue
+                ng = gu + way
+                if seen[v] == search and ng >= g[v]:
+                    continue
+                seen[v] = search
+                g[v] = ng
+                parent[v] = u
+                dx = xs[v] - gx
+                if dx < 0:
+                    dx = -dx
+                dy = ys[v] - gy
+                if dy < 0:
+                    dy = -dy
+                if dx < dy:
+                    h = h_diag * dx + h_line * (dy - dx)
+                else:
+                    h = h_diag * dy + h_line * (dx - dy)
+                heappush(heap, (ng + h, h, v))
+
+        self.expansions += expansions
+        return [], INF
+
+    def __jump(self, cell, dx, dy, goal_id):
+        """ Scans from cell in the direction (dx, dy) until the goal, a
+        cell where an optimal path may turn or a wall
+        @return a tuple (jump point, cost of the line up to it), or None if
+        the scan ends at a wall """
+        if dx == 0 or dy == 0:
+            return self.__straight(cell, dx, dy, goal_id)
+        cost = self.__cost
+        mixed = self.__mixed
+        pad_h = self.__pad_h
+        offset = dx * pad_h + dy
+        step = self.cost_diag
+        straight = self.__straight
+        way = 0.0
+        n = cell
+        while True:
+            n += offset
+            c = cost[n]
+            if c == INF:
+                return None
+            way += step * c
+            if n == goal_id or mixed[n]:
+                return n, way
+            back = n - dx * pad_h
+            if ((cost[back] == INF and cost[back + dy] != INF) or
+                    (cost[n - dy] == INF and cost[n + dx * pad_h - dy] != INF)):
+                return n, way
+            if straight(n, dx, 0, goal_id) is not None or straight(n, 0, dy, goal_id) is not None:
+                return n, way
+
+    def __straight(self, cell, dx, dy, goal_id):
+        """ __jump for the 4 straight directions, with the scan tables """
+        pad_h = self.__pad_h
+        x = self.__xs[cell]
+        y = self.__ys[cell]
+        gx = self.__xs[goal_id]
+        gy = self.__ys[goal_id]
+        if dy == 0:
+            end = self.__scan_px[cell] if dx > 0 else self.__scan_mx[cell]
+            if gy == y and (x < gx <= end or end <= gx < x):
+                end = gx
+            steps = end - x if dx > 0 else x - end
+            target = end * pad_h + y
+        else:
+            end = self.__scan_py[cell] if dy > 0 else self.__scan_my[cell]
+            if gx == x and (y < gy <= end or end <= gy < y):
+                end = gy
+            steps = end - y if dy > 0 else y - end
+            target = x * pad_h + end
+        c = self.__cost[target]
+        if c == INF:
+            return None
+        # the cells before the end have the multiplier VS.OBST_NONE
+        return target, self.cost_line * ((steps - 1) * VS.OBST_NONE + c)
+
+    def __moves_to(self, start_id, goal_id):
+        """ Follows the parents from the goal back to the start; with JPS
+        a parent may be several cells away, on a straight or diagonal line
+        @return the list of (dx, dy) from start to goal """
+        parent = self.__parent
+        xs = self.__xs
+        ys = self.__ys
+        moves = []
+        cell = goal_id
+        while cell != start_id:
+            prev = parent[cell]
+            dx = xs[cell] - xs[prev]
+            dy = ys[cell] - ys[prev]
+            n = max(abs(dx), abs(dy))
+            moves.extend([(dx // n, dy // n)] * n)
+            cell = prev
+        moves.reverse()
+        return moves
@@ -1,4 +1,9 @@
 from .constants import VS
+from . import action_log
+
+# neighbours checked by _check_walls_and_lim, clockwise from the one above
+WALL_DELTAS = ((0, -1), (1, -1), (1, 0), (1, 1),
+               (0, 1), (-1, 1), (-1, 0), (-1, -1))
 
 # Class PhysAgent
 """ It is the representation of an agent in the environment
@@ -22,6 +27,16 @@ class PhysAgent:
         self.y = y_base               # current y coordinate
         self._rtime = mind.TLIM       # current remaining time
         self._state = state           # -1=dead  0=successfully ended 1=alive
+        self._idx = 0                 # index of the agent in env.agents and
+                                      # of its plane in env.visited
+        self._blocked_on = None       # event the agent waits for; while it is
+                                      # not None, deliberate is not called
+        self._plan = None             # moves of the running plan (see
+                                      # AbstAgent.walk_plan), None if there is none
+        self._plan_next = 0           # index of the next move of the plan
+        self._plan_min_rtime = None   # the plan stops when _rtime gets below it
+        self._plan_result = None      # result of the last walk of the last plan
+        self._plan_left = []          # moves of the last plan never tried
 
     def _end_of_time(self):
         """ This protected method allows the enviroment to check if time limit
@@ -56,6 +71,22 @@ class PhysAgent:
         In every case, action's executing time is discounted from time limit
         """
 
+        result = self.__walk(dx, dy)
+        recorder = self.env.recorder
+        if recorder is not None:
+            self._share(recorder.record, self._idx, action_log.OP_WALK, dx, dy, result)
+        return result
+
+    def _share(self, effect, *args):
+        """ Applies a side effect on the state shared by all the agents (the
+        found and saved lists, the metrics, the recorder, the cells to be
+        repainted). The copy of the body in a worker process overrides it to
+        send the effect back to the environment (see vs/parallel.py) """
+        effect(*args)
+
+    def __walk(self, dx, dy):
+        """ Moves the body and discounts the time (see _walk) """
+
         # base time to be consumed
         if dx != 0 and dy != 0:   # diagonal
             base = self.mind.COST_DIAG
@@ -64,12 +95,12 @@ class PhysAgent:
 
         new_x = self.x + dx
         new_y = self.y + dy
+        env = self.env
 
-        if (new_x >= 0 and new_x < self.env.dic["GRID_WIDTH"] and
-            new_y >= 0 and new_y < self.env.dic["GRID_HEIGHT"] and
-                self.env.obst[new_x][new_y] != 100):
-            # print(f"{self.mind.NAME}: obstacle difficulty {self.env.obst[new_x][new_y]}")
-            self._rtime -= base * self.env.obst[new_x][new_y]
+        if (0 <= new_x < env.width and 0 <= new_y < env.height and
+                env.passable.item(new_x, new_y)):
+            # print(f"{self.mind.NAME}: obstacle difficulty {env.obst[new_x, new_y]}")
+            self._rtime -= base * env.obst.item(new_x, new_y)
 
             # agent is dead: not enough time
             if self._rtime < 0:
@@ -77,8 +108,10 @@ class PhysAgent:
             else:
                 self.x = new_x
                 self.y = new_y
-                if self not in self.env.visited[new_x][new_y]:
-                    self.env.visited[new_x][new_y].append(self)
+                if env.visited.mark(self._idx, new_x, new_y):
+                    dirty = env.dirty_cells
+                    if dirty is not None:
+                        self._share(dirty.add, (new_x, new_y))
                 return VS.EXECUTED
         else:
             # when the agent bumps, we penalize the agent subtracting only the
@@ -86,9 +119,41 @@ class PhysAgent:
             self._rtime -= base
             return VS.BUMPED
 
-    def _check_walls_and_lim(self):
+    def _start_plan(self, moves, min_rtime=None):
+        """ Protected method for starting a plan: walks the first move now
+        and leaves the others for the next cycles (see _plan_step)
+        @return: the result of the first walk """
+        if not moves:
+            raise ValueError("a plan needs at least one move")
+        self._plan = list(moves)
+        self._plan_next = 0
+        self._plan_min_rtime = min_rtime
+        return self._plan_step()
+
+    def _plan_step(self):
+        """ Protected method for walking the next move of the plan. The plan
+        ends after its last move, after a walk that is not VS.EXECUTED or when
+        the remaining time gets below the minimum given to _start_plan.
+        @return: the result of the walk """
+        plan = self._plan
+        i = self._plan_next
+        dx, dy = plan[i]
+        result = self._walk(dx, dy)
+        i += 1
+        self._plan_next = i
+        self._plan_result = result
+
+        if (result != VS.EXECUTED or i == len(plan) or
+                (self._plan_min_rtime is not None and self._rtime < self._plan_min_rtime)):
+            self._plan_left = plan[i:]
+            self._plan = None
+        return result
+
+    def _check_walls_and_lim(self, out=None):
         """ Protected method for checking walls and the grid limits in the
         neighborhood of the current position of the agent.
+        @param out: optional buffer with eight positions (e.g. a row of a
+        numpy array) that is overwritten and returned instead of a new list
         @returns a vector of eight integers indexed in a clockwise manner.
         The first position in the vector is above the current position of the
         agent, the second is in the upper right diagonal direction, the third
@@ -99,20 +164,24 @@ class PhysAgent:
         - END means the end of the grid (value = 2)
         """
 
-        delta = [(0, -1), (1, -1), (1, 0), (1, 1),
-                 (0, 1), (-1, 1), (-1, 0), (-1, -1)]
-        obstacles = [VS.CLEAR] * 8
+        obstacles = [VS.CLEAR] * 8 if out is None else out
         i = 0
 
-        for d in delta:
+        width = self.env.width
+        height = self.env.height
+        passable = self.env.passable
+
+        for d in WALL_DELTAS:
             new_x = self.x + d[0]
             new_y = self.y + d[1]
 
-            if (new_x < 0 or new_x >= self.env.dic["GRID_WIDTH"] or
-                new_y < 0 or new_y >= self.env.dic["GRID_HEIGHT"]):
+            if (new_x < 0 or new_x >= width or
+                new_y < 0 or new_y >= height):
                 obstacles[i] = VS.END
-            elif self.env.obst[new_x][new_y] == 100:
+            elif not passable.item(new_x, new_y):
                 obstacles[i] = VS.WALL
+            elif out is not None:
+                obstacles[i] = VS.CLEAR
 
             i += 1
 
@@ -128,12 +197,7 @@ class PhysAgent:
         victims.txt and vital_signals.txt or VS.NO_VICTIMif there is no victim
         at the current position of the agent"""
 
-        vic_id = VS.NO_VICTIM
-
-        if (self.x, self.y) in self.env.victims:
-            vic_id = self.env.victims.index((self.x, self.y))
-
-        return vic_id
+        return self.env.victim_index.get((self.x, self.y), VS.NO_VICTIM)
 
     def _read_vital_signals(self):
         """ Protected method for reading the vital signals and marking a victim
@@ -146,6 +210,17 @@ class PhysAgent:
         - an empty list if theres is no victim at the current agent's position.
         """
 
+        result = self.__read_vital_signals()
+        recorder = self.env.recorder
+        if recorder is not None:
+            self._share(recorder.record, self._idx, action_log.OP_READ, 0, 0,
+                        action_log.encode_read(result))
+        return result
+
+    def __read_vital_signals(self):
+        """ Reads the signals and marks the victim as found (see
+        _read_vital_signals) """
+
         # Consume time
         self._rtime -= self.mind.COST_READ
 
@@ -160,7 +235,7 @@ class PhysAgent:
 
         # Mark the victim as found by this agent.
         # More than one agent can found the same victim, so it's a list
-        self.env.found[vic_id].append(self)
+        self._share(self.__mark_found, vic_id, (self.x, self.y))
         # remove the last two elements: label and value of severity
         return self.env.signals[vic_id][:-2]
 
@@ -174,6 +249,17 @@ class PhysAgent:
         - True when the first aid is succesfully delivered
         - False when there is no victim at the current position of the agent"""
 
+        result = self.__first_aid()
+        recorder = self.env.recorder
+        if recorder is not None:
+            self._share(recorder.record, self._idx, action_log.OP_FIRST_AID, 0, 0,
+                        action_log.encode_first_aid(result))
+        return result
+
+    def __first_aid(self):
+        """ Drops the package and marks the victim as saved (see
+        _first_aid) """
+
         # Consume time
         self._rtime -= self.mind.COST_FIRST_AID
 
@@ -189,35 +275,35 @@ class PhysAgent:
         # Mark the victim as found by this agent.
         # More than one agent can drop a first-aid package to the same victim,
         # so it's a list
-        self.env.saved[vic_id].append(self)
+        self._share(self.__mark_saved, vic_id, (self.x, self.y))
         return True
 
+    def __mark_found(self, vic_id, pos):
+        """ Records that this agent found vic_id (see _share) """
+        self.env.found[vic_id].append(self)
+        self.env.metrics.add_found(self, vic_id)
+        dirty = self.env.dirty_cells
+        if dirty is not None:
+            dirty.add(pos)
+
+    def __mark_saved(self, vic_id, pos):
+        """ Records that this agent saved vic_id (see _share) """
+        self.env.saved[vic_id].append(self)
+        self.env.metrics.add_saved(self, vic_id)
+        dirty = self.env.dirty_cells
+        if dirty is not None:
+            dirty.add(pos)
+
     def _get_found_victims(self):
         """ Protected method for returning the number of found victims by the
         agent.
         @returns a list with the id number of the found victims """
 
-        victims = []
-
-        v = 0
-        for finders in self.env.found:
-            if self in finders:
-                victims.append(v)
-            v = v + 1
-
-        return victims
+        return sorted(self.env.metrics.found_by[self].ids)
 
     def _get_saved_victims(self):
         """ Protected method for returning the number of saved victims by the
         agent.
         @returns a list with the id number of the saved victims """
 
-        victims = []
-
-        v = 0
-        for rescuers in self.env.saved:
-            if self in rescuers:
-                victims.append(v)
-            v = v + 1
-
-        return victims
+        return sorted(self.env.metrics.saved_by[self].ids)
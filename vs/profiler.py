@@ -0,0 +1,120 @@
+""" PROFILER
+    Opt-in instrumentation of the engine. When enabled, Env.run runs the
+    turns of the agents through Profiler.deliberate, which records the wall
+    time of every turn, the phase of the agent when it was called and how
+    many A* nodes the agent expanded. A turn is a deliberate() call or, for
+    an agent following a walk plan (AbstAgent.walk_plan), the move of the
+    plan the simulator walks instead; it is recorded under the phase of the
+    mind, so the returns and backtracks walked as plans are in the summary.
+    At the end of the run it prints a summary and can dump the raw per-turn
+    data as CSV.
+
+    The phase is read from the mind's 'state' (explorers) or
+    'internal_state' (rescuers) attribute; the expansions from its
+    'astar_expansions' counter, when the mind has one. """
+
+import csv
+import time
+
+
+class Profiler:
+    RAW_FIELDS = ["cycle", "agent", "phase", "seconds", "expansions"]
+
+    def __init__(self):
+        self.calls = []       # raw data: (cycle, agent, phase, seconds, expansions)
+        self.cycle_times = []  # wall time of each cycle (s)
+        self.cycles = 0
+        self.wall_time = 0.0
+
+    @staticmethod
+    def phase_of(mind):
+        """ @return the name of the phase the agent is in """
+        phase = getattr(mind, "state", None)
+        if not isinstance(phase, str):
+            phase = getattr(mind, "internal_state", "")
+        return phase
+
+    def deliberate(self, cycle, phy):
+        """ Runs the turn of phy measuring it
+        @return what deliberate returns, True for a move of a plan """
+        more_actions_to_do, call = self.measure(cycle, phy)
+        self.calls.append(call)
+        return more_actions_to_do
+
+    def measure(self, cycle, phy):
+        """ Runs the turn of phy measuring it, without recording the call
+        (the calls made in worker processes are recorded later, in agent
+        order)
+        @return a tuple (what deliberate returns, the raw data of the call) """
+        mind = phy.mind
+        phase = self.phase_of(mind)
+        expansions = getattr(mind, "astar_expansions", 0)
+
+        start = time.perf_counter()
+        if phy._plan is not None:
+            # the simulator walks the next move of the plan
+            phy._plan_step()
+            more_actions_to_do = True
+        else:
+            more_actions_to_do = mind.deliberate()
+        seconds = time.perf_counter() - start
+
+        expansions = getattr(mind, "astar_expansions", 0) - expansions
+        return more_actions_to_do, (cycle, mind.NAME, phase, seconds, expansions)
+
+    def end_cycle(self, seconds):
+        """ Records the wall time of a whole cycle """
+        self.cycle_times.append(seconds)
+        self.cycles += 1
+        self.wall_time += seconds
+
+    def cycles_per_second(self):
+        return self.cycles / self.wall_time if self.wall_time > 0 else 0.0
+
+    def __group(self, key):
+        """ Sums calls, seconds, max seconds and expansions by key """
+        groups = {}
+        for call in self.calls:
+            g = groups.setdefault(key(call), [0, 0.0, 0.0, 0])
+            g[0] += 1
+            g[1] += call[3]
+            g[2] = max(g[2], call[3])
+            g[3] += call[4]
+        return groups
+
+    def summary(self):
+        """ @return a dict with the aggregated data per agent and per phase """
+        def table(groups):
+            return {k: {"calls": n, "seconds": s, "max_seconds": m, "expansions": e}
+                    for k, (n, s, m, e) in groups.items()}
+
+        return {"cycles": self.cycles, "wall_time": self.wall_time,
+                "cycles_per_second": self.cycles_per_second(),
+                "agents": table(self.__group(lambda c: c[1])),
+                "phases": table(self.__group(lambda c: (c[1], c[2])))}
+
+    def print_summary(self):
+        """ Prints the time spent per agent and per agent/phase """
+        print("\n*** PROFILE ***")
+        print(f"   cycles = {self.cycles}  wall time = {self.wall_time:.3f}s  "
+              f"cycles/s = {self.cycles_per_second():.1f}")
+        if self.cycle_times:
+            print(f"   slowest cycle = {1000*max(self.cycle_times):.2f} ms")
+
+        header = f"   {'agent':<14} {'phase':<20} {'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'A* exp':>9}"
+        print(header)
+        print("   " + "-" * (len(header) - 3))
+        for name, (n, s, m, e) in sorted(self.__group(lambda c: c[1]).items(),
+                                         key=lambda item: -item[1][1]):
+            print(f"   {name:<14} {'(all)':<20} {n:7d} {s:9.3f} {1000*s/n:9.3f} {1000*m:9.3f} {e:9d}")
+
+        for (name, phase), (n, s, m, e) in sorted(self.__group(lambda c: (c[1], c[2])).items(),
+                                                  key=lambda item: -item[1][1]):
+            print(f"   {name:<14} {phase:<20} {n:7d} {s:9.3f} {1000*s/n:9.3f} {1000*m:9.3f} {e:9d}")
+
+    def write_raw(self, path):
+        """ Dumps one row per turn as CSV """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.RAW_FIELDS)
+            writer.writerows(self.calls)
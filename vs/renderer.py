@@ -0,0 +1,224 @@
+""" RENDERER
+    Draws the environment in a pygame window. The grid and the obstacles
+    never change, so they are rendered once into a background surface. After
+    the first frame only the dirty cells are repainted: the cells visited by
+    PhysAgent._walk, the cells of found/saved victims and the cells an agent
+    left or entered. """
+
+import math
+import colorsys
+import numpy as np
+import pygame
+from .constants import VS
+
+
+class Renderer:
+    # configuration for obstacles coloring
+    # h,  s,   lc, ld:
+    # 13, 100, 100, 65 red tonalities
+    # 275,100, 100, 65 purple
+    # 90, 35,  100, 40 green tonaliies
+    #  0,  0,  100, 50 gray tonnalitites
+    HUE = 0                # Not relevant for grayscale; 0=Red, 120=green, 240=blue till 360
+    SATURATION = 0         # 40 = Red  0 = Grayscale
+    LIGHTNESS_CLEAR = 100  # 100 = White
+    LIGHTNESS_DARK = 40    # 0 = Black
+
+    def __init__(self, env):
+        """ Opens the window and draws the first frame
+        @param env: the environment to be drawn """
+        self.env = env
+        pygame.init()
+
+        # Create the font object
+        self.font = pygame.font.SysFont(None, 24)
+
+        # Create the window
+        self.screen = pygame.display.set_mode((env.dic["WINDOW_WIDTH"],
+                                               env.dic["WINDOW_HEIGHT"]))
+
+        # Set cell width and height
+        self.cell_w = env.dic["WINDOW_WIDTH"]/env.dic["GRID_WIDTH"]
+        self.cell_h = env.dic["WINDOW_HEIGHT"]/env.dic["GRID_HEIGHT"]
+
+        # victims by cell: more than one victim may share the same cell
+        self.victims_at = {}
+        for v, pos in enumerate(env.victims):
+            self.victims_at.setdefault(pos, []).append(v)
+
+        self.agent_cells = {}  # phy -> cell where its marker was drawn
+        self.background = self.__render_background()
+
+        # from now on the environment and the agents report the changed cells
+        env.dirty_cells = set()
+        self.draw_all()
+
+    def close(self):
+        """ Stops reporting dirty cells and closes the window """
+        self.env.dirty_cells = None
+        pygame.quit()
+
+    def quit_requested(self):
+        """ Handles the window events
+        @return True if the user closed the window """
+        quit = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit = True
+        return quit
+
+    def __obst_color(self, obst, max_obst):
+        """ @return the RGB color for an obstacle value """
+        if obst == VS.OBST_WALL:
+            return VS.BLACK
+        if obst == VS.OBST_NONE:
+            return VS.WHITE
+
+        perc = obst/max_obst
+        lightness = (1 - perc) * self.LIGHTNESS_CLEAR + perc * self.LIGHTNESS_DARK
+
+        # convert HSL color to RGB
+        rgb_color = colorsys.hls_to_rgb(self.HUE / 360.0, lightness / 100.0,
+                                        self.SATURATION / 100.0)
+
+        # Convert RGB values to integers in the range [0, 255]
+        return tuple(int(c * 255) for c in rgb_color)
+
+    def __render_background(self):
+        """ Renders the grid lines and the obstacles in a surface. Each
+        distinct obstacle value is converted to a color only once. """
+        env = self.env
+        cell_w = self.cell_w
+        cell_h = self.cell_h
+        background = pygame.Surface(self.screen.get_size())
+        background.fill(VS.WHITE)
+
+        colors = {}
+        max_obst = env.max_obst
+        obst_cols = env.obst.tolist()   # plain floats, faster than numpy items
+        for x in range(env.dic["GRID_WIDTH"]):
+            for y in range(env.dic["GRID_HEIGHT"]):
+                rect = pygame.Rect(x * cell_w, y * cell_h, cell_w, cell_h)
+                pygame.draw.rect(background, (230, 230, 230), rect, 1)
+
+                obst = obst_cols[x][y]
+                rgb_int = colors.get(obst)
+                if rgb_int is None:
+                    rgb_int = colors[obst] = self.__obst_color(obst, max_obst)
+
+                obst_rect = pygame.Rect(x * cell_w + 1, y * cell_h + 1, cell_w - 2, cell_h - 2)
+                pygame.draw.rect(background, rgb_int, obst_rect)
+
+        return background.convert()
+
+    def __cell_rect(self, cell):
+        """ @return the pixels of a cell: from floor(x*cell_w) up to
+        floor((x+1)*cell_w), so adjacent cells tile without overlapping """
+        x, y = cell
+        left = math.floor(x * self.cell_w)
+        top = math.floor(y * self.cell_h)
+        return pygame.Rect(left, top, math.floor((x + 1) * self.cell_w) - left,
+                           math.floor((y + 1) * self.cell_h) - top)
+
+    def __paint_cell(self, cell, agents_at):
+        """ Repaints one cell over the cached background: trace marks, base,
+        victims and agents, in this order.
+        @return the repainted rectangle """
+        env = self.env
+        cell_w = self.cell_w
+        cell_h = self.cell_h
+        x, y = cell
+        rect = self.__cell_rect(cell)
+        self.screen.blit(self.background, rect, rect)
+
+        # Trace: plot a dot for each agent who has visited a cell
+        visitors = env.visited.visitors(x, y)
+        if visitors:
+            nb_of_rects = math.ceil(math.sqrt(len(env.agents)))
+            mark_radius = min(cell_w/nb_of_rects, cell_h/nb_of_rects) / 2
+            v = 0
+            for i in range(nb_of_rects):
+                for j in range(nb_of_rects):
+                    if v < len(visitors):
+                        trace_color = env.agents[visitors[v]].mind.TRACE_COLOR
+                        xc = x * cell_w + mark_radius * (i+1)
+                        yc = y * cell_h + mark_radius * (j+1)
+                        pygame.draw.circle(self.screen, trace_color,
+                                           (xc, yc), 0.7*mark_radius)
+                        v += 1
+
+        # Draw a marker at the base
+        if x == env.dic["BASE"][0] and y == env.dic["BASE"][1]:
+            base_rect = pygame.Rect(x * cell_w, y * cell_h, cell_w, cell_h)
+            pygame.draw.rect(self.screen, VS.CYAN, base_rect, 4)
+
+        # Draw the victims
+        for v in self.victims_at.get(cell, ()):
+            victim_rect = pygame.Rect(x * cell_w + 1, y * cell_h + 1,
+                                      cell_w - 1, cell_h - 1)
+            pygame.draw.ellipse(self.screen, VS.VIC_COLOR_LIST[env.tri[v]], victim_rect)
+            if env.saved[v] != []:
+                pygame.draw.ellipse(self.screen, VS.BLUE, victim_rect, 3)
+            elif env.found[v] != []:
+                pygame.draw.ellipse(self.screen, VS.PINK, victim_rect, 3)
+
+        # Draw the physical agents
+        for phy in agents_at.get(cell, ()):
+            p_x1 = x * cell_w + 0.2 * cell_w
+            p_x2 = x * cell_w + cell_w/2
+            p_x3 = x * cell_w + 0.8 * cell_w
+            p_y1 = y * cell_h + cell_h/2
+            p_y2 = y * cell_h + 0.2 * cell_h
+            p_y3 = y * cell_h + 0.8 * cell_h
+
+            triangle = [(p_x1, p_y1), (p_x2, p_y2),
+                        (p_x3, p_y1), (p_x2, p_y3)]
+            pygame.draw.polygon(self.screen, phy.mind.COLOR, triangle)
+
+        return rect
+
+    def __agents_at(self, dirty):
+        """ Updates the cells where the ACTIVE agents are drawn, adding to
+        dirty the cells left or entered by an agent marker.
+        @return a dict cell -> list of agents drawn in that cell """
+        agents_at = {}
+        agent_cells = self.agent_cells
+        for phy in self.env.agents:
+            cell = (phy.x, phy.y) if phy._state == VS.ACTIVE else None
+            old = agent_cells.get(phy)
+            if old != cell:
+                if old is not None:
+                    dirty.add(old)
+                if cell is not None:
+                    dirty.add(cell)
+                agent_cells[phy] = cell
+            if cell is not None:
+                agents_at.setdefault(cell, []).append(phy)
+        return agents_at
+
+    def draw_all(self):
+        """ Draws the whole window """
+        env = self.env
+        self.screen.blit(self.background, (0, 0))
+        cells = set()
+        agents_at = self.__agents_at(cells)
+        cells.update(self.victims_at)
+        cells.add((env.dic["BASE"][0], env.dic["BASE"][1]))
+        xs, ys = np.nonzero(env.visited.visited_by_any())
+        cells.update(zip(xs.tolist(), ys.tolist()))
+
+        for cell in cells:
+            self.__paint_cell(cell, agents_at)
+
+        env.dirty_cells.clear()
+        pygame.display.update()
+
+    def draw(self):
+        """ Repaints only the cells changed since the last frame """
+        dirty = self.env.dirty_cells
+        agents_at = self.__agents_at(dirty)
+
+        if dirty:
+            rects = [self.__paint_cell(cell, agents_at) for cell in dirty]
+            dirty.clear()
+            pygame.display.update(rects)
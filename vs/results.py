@@ -0,0 +1,149 @@
+""" RESULTS
+    Structured outcome of a simulation run, per agent and for all agents.
+    It is built from the incremental counters of vs/metrics.py, returned by
+    Env.run/Env.get_results and can be written as JSON or CSV, so batch
+    scripts do not have to scrape the printed statistics. """
+
+import csv
+import json
+from .constants import VS
+
+TRI_LABELS = ("green", "yellow", "red", "black")
+
+
+class VictimStats:
+    """ Statistics of a group of victims (found or saved) """
+
+    def __init__(self, tally, total, sum_sobr_all):
+        """ @param tally: the VictimTally of the group
+        @param total: the VictimTally with all the victims
+        @param sum_sobr_all: sum of sobr of all victims (Env.sum_sobr) """
+        self.ids = sorted(tally.ids)            # victim ids, ascending
+        self.tri_count = list(tally.tri_count)  # victims per triage class
+        self.count = len(self.ids)              # number of victims (Ve or Vs)
+        self.weighted = tally.weighted(total)   # Veg or Vsg
+        self.sum_sobr = tally.sum_sobr          # sum of sobr of the victims
+        # share of the sum of sobr of all victims
+        self.pct_sobr = tally.sum_sobr / sum_sobr_all if sum_sobr_all else 0.0
+
+    def __len__(self):
+        return self.count
+
+    def to_dict(self):
+        return {"ids": list(self.ids), "tri_count": list(self.tri_count),
+                "count": self.count, "weighted": self.weighted,
+                "sum_sobr": self.sum_sobr, "pct_sobr": self.pct_sobr}
+
+    def to_row(self, sub):
+        """ Flat columns V<sub>0..V<sub>3, V<sub>, V<sub>g, sobr_<sub> and
+        pct_sobr_<sub> (sub is 'e' for found and 's' for saved) """
+        row = {f"V{sub}{k}": self.tri_count[k] for k in range(4)}
+        row[f"V{sub}"] = self.count
+        row[f"V{sub}g"] = self.weighted
+        row[f"sobr_{sub}"] = self.sum_sobr
+        row[f"pct_sobr_{sub}"] = self.pct_sobr
+        return row
+
+
+class AgentResult:
+    """ Final situation of one physical agent """
+
+    def __init__(self, phy):
+        """ Takes a snapshot of a physical agent
+        @param phy: the PhysAgent at the end of the run """
+        env = phy.env
+        metrics = env.metrics
+        self.name = phy.mind.NAME      # name of the agent (from its config file)
+        self.state = phy._state        # VS.ENDED, VS.DEAD, VS.IDLE...
+        self.tlim = phy.mind.TLIM      # time limit of the agent
+        self.rtime = phy._rtime        # remaining battery time
+        self.consumed = phy.mind.TLIM - phy._rtime  # consumed time
+        self.found = VictimStats(metrics.found_by[phy], metrics.total, env.sum_sobr)
+        self.saved = VictimStats(metrics.saved_by[phy], metrics.total, env.sum_sobr)
+        self.coverage = env.visited.coverage(phy._idx)  # visited cells
+
+    def to_dict(self):
+        return {"name": self.name, "state": self.state, "tlim": self.tlim,
+                "rtime": self.rtime, "consumed": self.consumed,
+                "found": self.found.to_dict(), "saved": self.saved.to_dict(),
+                "coverage": self.coverage}
+
+    def to_row(self):
+        row = {"agent": self.name, "state": self.state, "tlim": self.tlim,
+               "consumed": self.consumed, "coverage": self.coverage}
+        row.update(self.found.to_row("e"))
+        row.update(self.saved.to_row("s"))
+        return row
+
+
+class RunResult:
+    """ Outcome of a run: how many cycles were executed, how long it took
+    and the final situation of every agent and victim """
+
+    # columns of write_csv
+    CSV_FIELDS = (["agent", "state", "tlim", "consumed", "coverage"] +
+                  [f"Ve{k}" for k in range(4)] + ["Ve", "Veg", "sobr_e", "pct_sobr_e"] +
+                  [f"Vs{k}" for k in range(4)] + ["Vs", "Vsg", "sobr_s", "pct_sobr_s"] +
+                  ["cycles", "wall_time"])
+
+    def __init__(self, env, cycles, wall_time, headless):
+        """ @param env: the environment at the end of the run
+        @param cycles: number of executed reasoning cycles
+        @param wall_time: elapsed time of the main loop in seconds
+        @param headless: True if the run did not open a window """
+        metrics = env.metrics
+        self.cycles = cycles
+        self.wall_time = wall_time
+        self.headless = headless
+        self.nb_of_victims = env.nb_of_victims
+        # victims of the environment per triage class and their sum of sobr
+        self.tri_count = list(metrics.total.tri_count)
+        self.sum_sobr = env.sum_sobr
+        self.agents = [AgentResult(phy) for phy in env.agents]
+        # victims found/saved by at least one agent
+        self.found = VictimStats(metrics.found, metrics.total, env.sum_sobr)
+        self.saved = VictimStats(metrics.saved, metrics.total, env.sum_sobr)
+        # cells visited by at least one agent
+        self.coverage = env.visited.coverage()
+
+    def all_ended(self):
+        """ @return True if every agent successfully ended at the base """
+        return all(ag.state == VS.ENDED for ag in self.agents)
+
+    def consumed(self):
+        """ @return the time consumed by all the agents together """
+        return sum(ag.consumed for ag in self.agents)
+
+    def to_dict(self):
+        return {"cycles": self.cycles, "wall_time": self.wall_time,
+                "headless": self.headless,
+                "nb_of_victims": self.nb_of_victims,
+                "tri_count": dict(zip(TRI_LABELS, self.tri_count)),
+                "sum_sobr": self.sum_sobr,
+                "found": self.found.to_dict(), "saved": self.saved.to_dict(),
+                "coverage": self.coverage,
+                "agents": [ag.to_dict() for ag in self.agents]}
+
+    def to_row(self):
+        """ Aggregate of all agents as one flat row (agent = 'ALL') """
+        row = {"agent": "ALL", "state": "", "tlim": "",
+               "consumed": self.consumed(), "coverage": self.coverage}
+        row.update(self.found.to_row("e"))
+        row.update(self.saved.to_row("s"))
+        row["cycles"] = self.cycles
+        row["wall_time"] = self.wall_time
+        return row
+
+    def write_json(self, path):
+        """ Writes the whole result as a JSON document """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_csv(self, path):
+        """ Writes one row per agent followed by the aggregate row """
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.CSV_FIELDS, restval="")
+            writer.writeheader()
+            for ag in self.agents:
+                writer.writerow(ag.to_row())
+            writer.writerow(self.to_row())
@@ -0,0 +1,152 @@
+""" STEP ENVIRONMENT
+    Gymnasium-style adapter over Env and PhysAgent: reset(seed) and
+    step(actions) instead of run() and deliberate(), so a policy (e.g. a
+    learned exploration policy) drives the agents of the exact simulator.
+    Each step is one reasoning cycle: every ACTIVE agent executes its
+    action, then the time limit and termination rules of Env.run apply.
+
+    It never opens a window. reset() does not read any file (see
+    Env.reset), and the environment itself is loaded from the binary cache
+    (see vs/env_cache.py), so millions of steps spend their time in the
+    simulator only. The observation, reward and termination arrays are
+    allocated once and overwritten by every reset/step: copy them to keep
+    them.
+
+    Observation of each agent, float32 (OBS_SIZE,):
+      [0:8]  check_walls_and_lim: VS.CLEAR, VS.WALL or VS.END for each
+             direction of AbstAgent.AC_INCR
+      [8]    1 if there is a victim at the agent's position, otherwise 0
+      [9]    remaining time / TLIM """
+
+import random
+import numpy as np
+from .abstract_agent import AbstAgent
+from .constants import VS
+
+# actions: 0 to 7 walk in the direction of AbstAgent.AC_INCR
+READ = 8        # read the vital signals of the victim at the position
+FIRST_AID = 9   # drop a first aid package to the victim at the position
+FINISH = 10     # no more actions: ENDED at the base, DEAD elsewhere
+N_ACTIONS = 11
+
+OBS_SIZE = 10
+
+
+class PolicyMind:
+    """ Mind of an agent driven by StepEnv.step: it has the attributes the
+    PhysAgent reads (name, costs, colors), but it never deliberates """
+
+    ROLE = "policy"
+
+    def __init__(self, name, tlim, cost_line, cost_diag, cost_read, cost_first_aid):
+        self.NAME = name
+        self.TLIM = tlim
+        self.COST_LINE = cost_line
+        self.COST_DIAG = cost_diag
+        self.COST_READ = cost_read
+        self.COST_FIRST_AID = cost_first_aid
+        self.COLOR = (0, 0, 255)
+        self.TRACE_COLOR = (0, 0, 255)
+
+
+class StepEnv:
+    def __init__(self, env, n_agents=1, tlim=1000.0, cost_line=1.0, cost_diag=1.5,
+                 cost_read=2.0, cost_first_aid=1.0, max_cycles=None):
+        """ @param env: an Env without agents; the adapter adds its own
+        @param n_agents: number of agents driven by the policy, named
+        POLICY_1, POLICY_2...
+        @param tlim, cost_*: the agents' parameters (as in the agents'
+        config files)
+        @param max_cycles: optional limit of cycles of an episode; when it
+        is reached, step reports truncated """
+        if env.agents:
+            raise ValueError("StepEnv requires an environment without agents")
+        self.env = env
+        self.n_agents = n_agents
+        self.max_cycles = max_cycles
+        self.bodies = [env.add_agent(PolicyMind(f"POLICY_{i + 1}", tlim, cost_line, cost_diag,
+                                                cost_read, cost_first_aid), VS.ACTIVE)
+                       for i in range(n_agents)]
+
+        # buffers returned by reset and step
+        self.obs = np.zeros((n_agents, OBS_SIZE), dtype=np.float32)
+        self.rewards = np.zeros(n_agents, dtype=np.float32)
+        self.terminated = np.zeros(n_agents, dtype=bool)
+        # views of the rows of obs, created once so that observing an agent
+        # writes into the buffer without allocating
+        self.obs_rows = list(self.obs)
+        self.walls_rows = [row[:8] for row in self.obs]
+
+    def reset(self, seed=None):
+        """ Starts a new episode: agents ACTIVE at the base with full battery,
+        no visited cells and no found or saved victims
+        @param seed: seeds random and numpy.random, as Env.run does
+        @return a tuple (obs, info) """
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        self.env.reset(VS.ACTIVE)
+        self.rewards.fill(0.0)
+        self.terminated.fill(False)
+        for i, phy in enumerate(self.bodies):
+            self.__observe(i, phy)
+        return self.obs, {"cycle": 0}
+
+    def __observe(self, i, phy):
+        """ Writes the observation of agent i into self.obs """
+        obs = self.obs_rows[i]
+        phy._check_walls_and_lim(self.walls_rows[i])
+        obs[8] = phy._check_for_victim() != VS.NO_VICTIM
+        obs[9] = phy._rtime / phy.mind.TLIM
+
+    def step(self, actions):
+        """ Executes one reasoning cycle
+        @param actions: one action per agent (0-7 walk, READ, FIRST_AID or
+        FINISH); the actions of agents that are no longer ACTIVE are ignored
+        @return a tuple (obs, rewards, terminated, truncated, info): rewards
+        is 1 for an agent that found a victim no agent had found before;
+        terminated tells, per agent, if it is no longer ACTIVE; truncated is
+        True when max_cycles was reached """
+        env = self.env
+        found = env.metrics.found
+        rewards = self.rewards
+        rewards.fill(0.0)
+        for i, phy in enumerate(self.bodies):
+            if phy._state != VS.ACTIVE:
+                continue
+
+            action = actions[i]
+            if not 0 <= action < N_ACTIONS:
+                raise ValueError(f"invalid action {action} for {phy.mind.NAME}")
+            more_actions_to_do = True
+            if action < READ:
+                dx, dy = AbstAgent.AC_INCR[action]
+                phy._walk(dx, dy)
+            elif action == READ:
+                before = len(found)
+                phy._read_vital_signals()
+                rewards[i] = len(found) - before
+            elif action == FIRST_AID:
+                phy._first_aid()
+            else:
+                more_actions_to_do = False
+
+            # the same rules of Env.run
+            if phy._end_of_time():
+                phy._state = VS.DEAD
+            elif not more_actions_to_do:
+                phy._state = VS.ENDED if phy._at_base() else VS.DEAD
+            self.terminated[i] = phy._state != VS.ACTIVE
+            self.__observe(i, phy)
+
+        env.cycle += 1
+        truncated = self.max_cycles is not None and env.cycle >= self.max_cycles
+        return self.obs, rewards, self.terminated, truncated, {"cycle": env.cycle}
+
+    def done(self):
+        """ @return True when no agent is ACTIVE """
+        return bool(self.terminated.all())
+
+    def get_results(self):
+        """ @return the RunResult of the episode so far (see Env.get_results) """
+        return self.env.get_results()
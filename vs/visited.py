@@ -0,0 +1,86 @@
+""" VISITED MAP
+    Records which agents have been in each cell of the grid. Each agent has
+    its own bit-plane: one bit per cell, packed 8 cells per byte along the
+    y axis. A 2000x2000 grid costs 500 KB per agent. A plane with the union
+    of all the agents and the number of visited cells (per agent and in the
+    union) are kept up to date by mark, so coverage does not scan the
+    planes. """
+
+import numpy as np
+
+
+class VisitedMap:
+    def __init__(self, width, height):
+        """ @param width: number of columns of the grid (x axis)
+        @param height: number of rows of the grid (y axis) """
+        self.width = width
+        self.height = height
+        self.__row_bytes = (height + 7) >> 3
+        self.planes = []   # one uint8 array (width, ceil(height/8)) per agent
+        self.counts = []   # number of cells visited by each agent
+        self.__any = np.zeros((width, self.__row_bytes), dtype=np.uint8)
+        self.__any_count = 0
+
+    def add_agent(self):
+        """ Allocates an empty bit-plane for a new agent
+        @return the index of the agent's plane """
+        self.planes.append(np.zeros((self.width, self.__row_bytes), dtype=np.uint8))
+        self.counts.append(0)
+        return len(self.planes) - 1
+
+    def clear(self):
+        """ Forgets every visit, keeping the planes of the agents """
+        for plane in self.planes:
+            plane.fill(0)
+        self.__any.fill(0)
+        self.counts = [0] * len(self.planes)
+        self.__any_count = 0
+
+    def mark(self, idx, x, y):
+        """ Marks the cell (x, y) as visited by agent idx
+        @return True if the agent had not visited the cell before """
+        plane = self.planes[idx]
+        byte = y >> 3
+        bit = 1 << (y & 7)
+        value = plane.item(x, byte)
+        if value & bit:
+            return False
+
+        plane[x, byte] = value | bit
+        self.counts[idx] += 1
+        value = self.__any.item(x, byte)
+        if not value & bit:
+            self.__any[x, byte] = value | bit
+            self.__any_count += 1
+        return True
+
+    def is_visited(self, idx, x, y):
+        """ @return True if the agent idx has been in the cell (x, y) """
+        return bool(self.planes[idx].item(x, y >> 3) & (1 << (y & 7)))
+
+    def visitors(self, x, y):
+        """ @return the indexes of the agents that have been in (x, y) """
+        byte = y >> 3
+        bit = 1 << (y & 7)
+        return [idx for idx, plane in enumerate(self.planes)
+                if plane.item(x, byte) & bit]
+
+    def __unpack(self, plane):
+        return np.unpackbits(plane, axis=1, count=self.height,
+                             bitorder="little").astype(bool)
+
+    def visited_by(self, idx):
+        """ @return a (width, height) bool array of the cells visited by idx """
+        return self.__unpack(self.planes[idx])
+
+    def visited_by_any(self):
+        """ @return a (width, height) bool array of the cells visited by at
+        least one agent """
+        return self.__unpack(self.__any)
+
+    def coverage(self, idx=None):
+        """ @param idx: an agent index, or None for all the agents together
+        @return the number of visited cells """
+        if idx is None:
+            return self.__any_count
+        return self.counts[idx]